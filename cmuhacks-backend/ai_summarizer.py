@@ -1,10 +1,18 @@
+import json
 import os
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, SystemMessage
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+import text_chunking
+from embedding_model import encode
+from llm_cache import cached_invoke, cached_batch, cached_stream
+from llm_retry import LLM_MAX_ATTEMPTS
 
 # --- Configuration ---
 # Make sure to set your GOOGLE_API_KEY environment variable.
@@ -14,138 +22,209 @@ import time
 # --- LLM Definition ---
 # Note: The requested 'gemini-2.5-flash' is not yet available.
 # This script uses 'gemini-1.5-flash', the latest available flash model from Google.
-llm = ChatGoogleGenerativeAI(temperature=0.7, model="gemini-2.0-flash")
-# A model with zero temperature is used for deterministic verification checks.
-fast_llm = ChatGoogleGenerativeAI(temperature=0, model="gemini-2.0-flash")
+# Retries are handled by llm_retry (backoff, circuit breaker), so the client makes a single attempt.
+llm = ChatGoogleGenerativeAI(temperature=0.7, model="gemini-2.0-flash", max_retries=1)
+# A model with zero temperature for deterministic calls: verification checks, and the
+# map/reduce, definition and glossary steps whose responses are cached (see llm_cache).
+fast_llm = ChatGoogleGenerativeAI(temperature=0, model="gemini-2.0-flash", max_retries=1)
 
 
 # --- Agent 1: The Summarizer ---
 TOKEN_LIMIT = 30000
 # A smaller limit for individual chunks to ensure the map-reduce process is efficient.
 CHUNK_TOKEN_LIMIT = 7000
+# Returned by summarize_and_verify_paper when no summary passed verification.
+SUMMARY_FAILED = "Could not generate a verified summary. Please try again."
+
+# --- Verification input ---
+# What verify_reflection checks the summary against:
+#   'full'      - the whole original paper, every attempt;
+#   'condensed' - the text the summary was generated from (the map-reduce output
+#                 for papers over TOKEN_LIMIT, the full text otherwise);
+#   'retrieved' - the chunks of the original paper most similar to the summary.
+VERIFY_MODE = os.environ.get("VERIFY_MODE", "condensed")
+# Retrieval granularity and budget for 'retrieved' mode.
+VERIFY_CHUNK_TOKENS = int(os.environ.get("VERIFY_CHUNK_TOKENS", "800"))
+VERIFY_RETRIEVED_TOKENS = int(os.environ.get("VERIFY_RETRIEVED_TOKENS", "6000"))
 
 def count_tokens(text: str, llm_instance: ChatGoogleGenerativeAI) -> int:
     """Counts the number of tokens in a string for a given Gemini model."""
     return llm_instance.get_num_tokens(text)
 
-def chunk_text(text: str, token_limit: int, llm_instance: ChatGoogleGenerativeAI) -> list[str]:
-    """Splits text into chunks that are under the token limit."""
+def chunk_text(text: str, token_limit: int) -> list[str]:
+    """Splits text into chunks that are under the token limit (see text_chunking.chunk_text)."""
     print(f"  -> Text is long. Chunking into pieces smaller than {token_limit} tokens...")
-    paragraphs = text.split('\n\n')
-    chunks = []
-    current_chunk = ""
-    for para in paragraphs:
-        if count_tokens(current_chunk + para + "\n\n", llm_instance) <= token_limit:
-            current_chunk += para + "\n\n"
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = para + "\n\n"
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    chunks = text_chunking.chunk_text(text, token_limit)
     print(f"  -> Split text into {len(chunks)} chunks.")
     return chunks
 
+# Map step: summarize each chunk of a long paper on its own.
+MAP_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert academic summarizer. Summarize the following section of a research paper, extracting all key points, methods, and findings."),
+    ("human", "Here is the section:\n---\n{chunk}\n---")
+])
+# Reduce step: combine the chunk summaries into one summary of the paper.
+REDUCE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert academic editor. You have been given several summaries from different sections of the same research paper. Your task is to synthesize these into a single, comprehensive, and coherent summary of the entire paper. Ensure the final summary flows logically and captures the overarching narrative and key results of the research."),
+    ("human", "Here are the summaries of the paper's sections:\n---\n{combined_summaries}\n---")
+])
+CHUNK_SUMMARY_SEPARATOR = "\n\n---\n\n"
+
 def map_reduce_summary(text_chunks: list[str], llm_instance: ChatGoogleGenerativeAI) -> str:
     """
     Summarizes a list of text chunks (map step) and then combines those
     summaries into a final summary (reduce step).
     """
     # MAP step: Summarize each chunk individually
-    map_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert academic summarizer. Summarize the following section of a research paper, extracting all key points, methods, and findings."),
-        ("human", "Here is the section:\n---\n{chunk}\n---")
-    ])
-    map_chain = map_prompt | llm_instance | StrOutputParser()
     print("  -> Summarizing individual chunks (Map step)...")
-    chunk_summaries = map_chain.batch([{"chunk": chunk} for chunk in text_chunks])
+    chunk_summaries = cached_batch(MAP_PROMPT, llm_instance, [{"chunk": chunk} for chunk in text_chunks])
+    for chunk_summary in chunk_summaries:
+        if isinstance(chunk_summary, Exception):
+            raise chunk_summary
     print("  -> Finished summarizing chunks.")
 
     # REDUCE step: Combine the summaries into one
-    combined_summary_text = "\n\n---\n\n".join(chunk_summaries)
-    reduce_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert academic editor. You have been given several summaries from different sections of the same research paper. Your task is to synthesize these into a single, comprehensive, and coherent summary of the entire paper. Ensure the final summary flows logically and captures the overarching narrative and key results of the research."),
-        ("human", "Here are the summaries of the paper's sections:\n---\n{combined_summaries}\n---")
-    ])
-    reduce_chain = reduce_prompt | llm_instance | StrOutputParser()
     print("  -> Combining chunk summaries (Reduce step)...")
-    final_summary = reduce_chain.invoke({"combined_summaries": combined_summary_text})
+    final_summary = cached_invoke(REDUCE_PROMPT, llm_instance, {"combined_summaries": CHUNK_SUMMARY_SEPARATOR.join(chunk_summaries)})
     print("  -> Finished combining summaries.")
     return final_summary
 
 
+def condense_papers(paper_texts: list[str], llm_instance: ChatGoogleGenerativeAI = fast_llm) -> list[str]:
+    """
+    Returns the text each paper should be summarized from: the paper itself when it
+    fits in TOKEN_LIMIT, its map-reduce summary otherwise.
+
+    The map step of every long paper goes out as one batch, and so do the reduce
+    steps, so a category of papers costs two rounds of concurrent requests instead
+    of two per paper.
+
+    A paper whose map or reduce step failed gets the exception instead of a text;
+    the other papers are unaffected.
+    """
+    long_papers = [i for i, text in enumerate(paper_texts) if count_tokens(text, llm_instance) > TOKEN_LIMIT]
+    if not long_papers:
+        return list(paper_texts)
+    print(f"{len(long_papers)} of {len(paper_texts)} papers exceed the token limit. Map-reducing them together...")
+    chunks = [(i, chunk) for i in long_papers for chunk in chunk_text(paper_texts[i], CHUNK_TOKEN_LIMIT)]
+    chunk_summaries = cached_batch(MAP_PROMPT, llm_instance, [{"chunk": chunk} for _, chunk in chunks])
+    by_paper = {i: [] for i in long_papers}
+    condensed = list(paper_texts)
+    for (i, _), chunk_summary in zip(chunks, chunk_summaries):
+        if isinstance(chunk_summary, Exception):
+            condensed[i] = chunk_summary
+        by_paper[i].append(chunk_summary)
+    mapped = [i for i in long_papers if not isinstance(condensed[i], Exception)]
+    reduced = cached_batch(REDUCE_PROMPT, llm_instance,
+                           [{"combined_summaries": CHUNK_SUMMARY_SEPARATOR.join(by_paper[i])} for i in mapped])
+    for i, summary in zip(mapped, reduced):
+        condensed[i] = summary
+    failed = sum(isinstance(condensed[i], Exception) for i in long_papers)
+    print(f"✅ Pre-summarized {len(long_papers) - failed} papers from {len(chunks)} chunks ({failed} failed).")
+    return condensed
+
+
 # --- Agent 1: The Summarizer ---
 def generate_summary(paper_text: str, feedback: str = "") -> str:
     """
     Generates a four-paragraph summary of the paper.
     Optionally includes feedback from verifier agents to improve the summary.
     """
-    try:
-        feedback_instruction = (
-            "Please regenerate the summary based on the following feedback:\n"
-            f"--- FEEDBACK ---\n{feedback}\n--- END FEEDBACK ---"
-            if feedback
-            else "You are generating the first draft."
+    feedback_instruction = (
+        "Please regenerate the summary based on the following feedback:\n"
+        f"--- FEEDBACK ---\n{feedback}\n--- END FEEDBACK ---"
+        if feedback
+        else "You are generating the first draft."
+    )
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You are an expert academic summarizer. Your task is to create a four-paragraph summary of a research paper. "
+         "The summary must focus on the key points and most interesting results. "
+         "Crucially, it must be written in a way that is clear and engaging for an average person with a slight interest in the topic. "
+         "Avoid jargon where possible, and explain necessary technical terms simply."
+        ),
+        ("human",
+         f"{feedback_instruction}\n\n"
+         "Here is the paper text:\n"
+         "--- PAPER TEXT ---\n{paper_text}\n--- END PAPER TEXT ---"
         )
+    ])
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are an expert academic summarizer. Your task is to create a four-paragraph summary of a research paper. "
-             "The summary must focus on the key points and most interesting results. "
-             "Crucially, it must be written in a way that is clear and engaging for an average person with a slight interest in the topic. "
-             "Avoid jargon where possible, and explain necessary technical terms simply."
-            ),
-            ("human",
-             f"{feedback_instruction}\n\n"
-             "Here is the paper text:\n"
-             "--- PAPER TEXT ---\n{paper_text}\n--- END PAPER TEXT ---"
-            )
-        ])
-
-        summarizer_chain = prompt | llm | StrOutputParser()
-        print("✍️  Generating summary...")
-        summary = summarizer_chain.invoke({"paper_text": paper_text})
-    except Exception as e:
-        print(f'An error occurred: {e}. Extending time and retrying...')
-        time.sleep(40)
-        summary = generate_summary(paper_text, feedback)
+    print("✍️  Generating summary...")
+    # Never cached: a summary regenerated after failed verification must be a new sample.
+    summary = cached_invoke(prompt, llm, {"paper_text": paper_text}, cache=False)
 
     return summary
-def define_unclear_terms(term_text: str) -> str:
+# Finds the key term in a highlighted snippet and defines it.
+DEFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an expert science communicator who specializes in making complex topics easy to understand. "
+     "Your task is to analyze a short piece of text, identify the single most important technical term or piece of jargon that a non-expert would likely not understand, and then provide a very clear and simple definition for that term. "
+     "Directly provide the definition without mentioning the term itself, as if you are seamlessly explaining it."),
+    ("human",
+     "Please identify the main technical term or phrase in the following text and provide an easy-to-understand definition for it.\n\n"
+     "--- TEXT ---\n{text}\n--- END TEXT ---")
+])
+
+def define_unclear_terms(term_text: str, max_attempts: int = LLM_MAX_ATTEMPTS) -> str:
     """
     Identifies the most significant technical term in a given text snippet
     and generates a simple, easy-to-understand definition for it.
 
     Args:
         term_text: A snippet of text containing jargon or a technical term.
+        max_attempts: LLM attempts before giving up (lower it when a user is waiting).
 
     Returns:
         A string containing a simple definition of the identified term.
     """
     print(f"🤔 Identifying and defining unclear term(s) in snippet: '{term_text[:70]}...'")
+    # Run the LangChain chain (or reuse the stored definition for this exact snippet)
+    definition = cached_invoke(DEFINE_PROMPT, fast_llm, {"text": term_text}, max_attempts=max_attempts)
+    print(" -> Definition generated.")
+    return definition
+
+
+def stream_unclear_terms(term_text: str, max_attempts: int = LLM_MAX_ATTEMPTS):
+    """
+    Streaming version of define_unclear_terms: yields the definition in pieces as
+    Gemini produces them. Failures before the first piece are retried as usual.
+    """
+    print(f"🤔 Streaming a definition for snippet: '{term_text[:70]}...'")
+    yield from cached_stream(DEFINE_PROMPT, fast_llm, {"text": term_text}, max_attempts=max_attempts)
+
+
+def extract_glossary(text: str, max_terms: int = 15) -> list[tuple[str, str]]:
+    """
+    Picks the technical terms of a text that a non-expert would likely not understand
+    and defines each one, in a single call.
+
+    Returns:
+        A list of (term, definition) pairs; empty if the response could not be parsed.
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You are an expert science communicator who specializes in making complex topics easy to understand. "
+         "Your task is to find the technical terms and pieces of jargon in a text that a non-expert would likely not understand, and to give a very clear and simple definition for each. "
+         "Write each definition without mentioning the term itself, as if you are seamlessly explaining it. "
+         "Respond with only a JSON array of objects with the keys \"term\" (exactly as it appears in the text) and \"definition\"."),
+        ("human",
+         "List up to {max_terms} such terms, most important first.\n\n"
+         "--- TEXT ---\n{text}\n--- END TEXT ---")
+    ])
+    print(f"📚 Extracting glossary ({max_terms} terms max)...")
+    response = cached_invoke(prompt, fast_llm, {"text": text, "max_terms": max_terms})
+    # Models often wrap JSON in a ```json fence.
+    match = re.search(r"\[.*\]", response, re.DOTALL)
     try:
-        # This prompt asks the LLM to both find the key term and define it.
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are an expert science communicator who specializes in making complex topics easy to understand. "
-             "Your task is to analyze a short piece of text, identify the single most important technical term or piece of jargon that a non-expert would likely not understand, and then provide a very clear and simple definition for that term. "
-             "Directly provide the definition without mentioning the term itself, as if you are seamlessly explaining it."),
-            ("human",
-             "Please identify the main technical term or phrase in the following text and provide an easy-to-understand definition for it.\n\n"
-             "--- TEXT ---\n{text}\n--- END TEXT ---")
-        ])
-
-        # Create and invoke the LangChain chain
-        define_chain = prompt | llm | StrOutputParser()
-        definition = define_chain.invoke({"text": term_text})
-        print(" -> Definition generated.")
-        return definition
-
-    except Exception as e:
-        # Handle potential API errors and retry after a delay
-        print(f'An error occurred while defining the term: {e}. Retrying after a delay...')
-        time.sleep(30)
-        return define_unclear_terms(term_text)
- 
+        entries = json.loads(match.group(0)) if match else []
+    except json.JSONDecodeError:
+        print(" -> Could not parse the glossary response.")
+        return []
+    return [(entry["term"], entry["definition"]) for entry in entries[:max_terms]
+            if isinstance(entry, dict) and entry.get("term") and entry.get("definition")]
+
 
 # --- Agent 2a: Content Reflection Verifier ---
 def verify_reflection(paper_text: str, summary: str) -> str:
@@ -153,27 +232,22 @@ def verify_reflection(paper_text: str, summary: str) -> str:
     Verifies that the summary accurately reflects the paper's content.
     Returns 'OK' or a string with feedback for improvement.
     """
-    try:
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a verification agent. Your task is to determine if a given summary accurately reflects the key points, findings, and conclusions of the original research paper. "
-             "If the summary is accurate and covers the essential aspects, respond with 'OK'. "
-             "If the summary is inaccurate, misses key points, or misrepresents the findings, provide specific, constructive feedback on what needs to be changed to improve its accuracy. "
-             "Do not be overly critical of minor omissions; focus on major discrepancies or missing core concepts."
-            ),
-            ("human",
-             "--- ORIGINAL PAPER ---\n{paper_text}\n\n"
-             "--- SUMMARY ---\n{summary}\n\n"
-             "Does the summary accurately reflect the paper's content? If yes, say 'OK'. Otherwise, provide feedback."
-            )
-        ])
-        verifier_chain = prompt | fast_llm | StrOutputParser()
-        print("🔍  Verifying content reflection...")
-        result = verifier_chain.invoke({"paper_text": paper_text, "summary": summary})
-    except Exception as e:
-        print(f'An error occurred: {e}. Extending time and retrying...')
-        time.sleep(40)
-        result = verify_reflection(paper_text, summary)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You are a verification agent. Your task is to determine if a given summary accurately reflects the key points, findings, and conclusions of the original research paper. "
+         "If the summary is accurate and covers the essential aspects, respond with 'OK'. "
+         "If the summary is inaccurate, misses key points, or misrepresents the findings, provide specific, constructive feedback on what needs to be changed to improve its accuracy. "
+         "Do not be overly critical of minor omissions; focus on major discrepancies or missing core concepts."
+        ),
+        ("human",
+         "--- ORIGINAL PAPER ---\n{paper_text}\n\n"
+         "--- SUMMARY ---\n{summary}\n\n"
+         "Does the summary accurately reflect the paper's content? If yes, say 'OK'. Otherwise, provide feedback."
+        )
+    ])
+    print("🔍  Verifying content reflection...")
+    # Verdicts are not cached, so a retried paper is judged afresh.
+    result = cached_invoke(prompt, fast_llm, {"paper_text": paper_text, "summary": summary}, cache=False)
     return result
 
 
@@ -183,47 +257,125 @@ def verify_readability(summary: str) -> str:
     Verifies that the summary is readable for a layperson.
     Returns 'OK' or a string with feedback for improvement.
     """
-    try:
-        prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a verification agent focused on readability. Your task is to assess if a summary is easily understandable for an average person with a slight interest in the topic. "
-             "The language should be clear, engaging, and largely free of unexplained jargon. "
-             "If the summary meets this standard, respond with 'OK'. "
-             "If the summary is too technical, uses dense jargon without explanation, or is otherwise difficult to read for a non-expert, provide specific feedback on how to make it more accessible."
-            ),
-            ("human",
-             "--- SUMMARY ---\n{summary}\n\n"
-             "Is this summary written in a way that an average person with a slight interest in the topic can understand it? If yes, say 'OK'. Otherwise, provide feedback."
-            )
-        ])
-        verifier_chain = prompt | fast_llm | StrOutputParser()
-        print("🧐  Verifying readability...")
-        result = verifier_chain.invoke({"summary": summary})
-    except Exception as e:
-        print(f'An error occurred: {e}. Extending time and retrying...')
-        time.sleep(40)
-        result = verify_readability(summary)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You are a verification agent focused on readability. Your task is to assess if a summary is easily understandable for an average person with a slight interest in the topic. "
+         "The language should be clear, engaging, and largely free of unexplained jargon. "
+         "If the summary meets this standard, respond with 'OK'. "
+         "If the summary is too technical, uses dense jargon without explanation, or is otherwise difficult to read for a non-expert, provide specific feedback on how to make it more accessible."
+        ),
+        ("human",
+         "--- SUMMARY ---\n{summary}\n\n"
+         "Is this summary written in a way that an average person with a slight interest in the topic can understand it? If yes, say 'OK'. Otherwise, provide feedback."
+        )
+    ])
+    print("🧐  Verifying readability...")
+    result = cached_invoke(prompt, fast_llm, {"summary": summary}, cache=False)
     return result
 
 
+# --- Running both verifiers ---
+def run_verifiers(paper_text: str, summary: str) -> dict:
+    """
+    Runs the reflection and readability verifiers concurrently.
+
+    Returns as soon as either verifier gives feedback, since the summary will be
+    regenerated anyway; the other check finishes in the background and its answer
+    is discarded.
+
+    Returns:
+        A dict with the 'reflection' and/or 'readability' results that finished.
+        Both keys are present whenever every check returned 'OK'.
+    """
+    pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        futures = {
+            pool.submit(verify_reflection, paper_text, summary): "reflection",
+            pool.submit(verify_readability, summary): "readability",
+        }
+        results = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+            if any("OK" not in result for result in results.values()):
+                break
+        return results
+    finally:
+        pool.shutdown(wait=False)
+
+
+class ChunkRetriever:
+    """
+    Picks the chunks of a paper most relevant to a summary, for 'retrieved'
+    verification. Chunks are embedded once per paper and reused on every attempt.
+    """
+
+    def __init__(self, paper_text: str, chunk_tokens: int = VERIFY_CHUNK_TOKENS):
+        self.chunks = text_chunking.chunk_text(paper_text, chunk_tokens)
+        self.tokens = [text_chunking.estimate_tokens(chunk) for chunk in self.chunks]
+        self.embeddings = self._normalized(encode(self.chunks))
+
+    @staticmethod
+    def _normalized(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def retrieve(self, summary: str, token_budget: int = VERIFY_RETRIEVED_TOKENS) -> str:
+        """
+        Returns the chunks that best match any paragraph of the summary, up to
+        `token_budget` tokens, in their original order.
+        """
+        paragraphs = [p for p in summary.split('\n') if p.strip()] or [summary]
+        # Score each chunk by its best cosine similarity to any summary paragraph.
+        scores = (self.embeddings @ self._normalized(encode(paragraphs)).T).max(axis=1)
+        chosen, used = [], 0
+        for i in np.argsort(-scores):
+            if used + self.tokens[i] > token_budget:
+                continue
+            chosen.append(i)
+            used += self.tokens[i]
+        return "\n\n[...]\n\n".join(self.chunks[i] for i in sorted(chosen))
+
+
 # --- Main Application Logic (UPDATED) ---
-def summarize_and_verify_paper(paper_text: str, max_retries: int = 3):
+def summarize_and_verify_paper(paper_text: str, max_retries: int = 3, verify_mode: str = VERIFY_MODE,
+                               condensed_text: str = None):
     """
     Orchestrates the summarization and verification process,
     handling long papers by pre-summarizing them.
+
+    Args:
+        verify_mode: 'full', 'condensed' or 'retrieved'; see VERIFY_MODE.
+        condensed_text: The paper's entry from condense_papers, when the caller has
+            already pre-summarized a batch of papers; skips the per-paper map-reduce.
+
+    Raises:
+        llm_retry.LLMUnavailableError: Gemini kept failing (see llm_retry).
     """
+    if verify_mode not in ("full", "condensed", "retrieved"):
+        raise ValueError(f"Unknown verification mode: {verify_mode}")
     # Pre-process the text if it's too long
     paper_text_for_summary = paper_text
-    total_tokens = count_tokens(paper_text, llm)
-    print(f"Total tokens in original paper: {total_tokens}")
-
-    if total_tokens > TOKEN_LIMIT:
-        print("Paper exceeds token limit. Starting map-reduce pre-summarization process...")
-        chunks = chunk_text(paper_text, CHUNK_TOKEN_LIMIT, llm)
-        paper_text_for_summary = map_reduce_summary(chunks, llm)
-        print("\n✅ Pre-summarization complete. Starting main summarization and verification loop.")
+    if condensed_text is not None:
+        paper_text_for_summary = condensed_text
+        print("Using the batch pre-summarized text.")
     else:
-        print("Paper is within token limit. Proceeding directly to summarization.")
+        total_tokens = count_tokens(paper_text, llm)
+        print(f"Total tokens in original paper: {total_tokens}")
+        if total_tokens > TOKEN_LIMIT:
+            print("Paper exceeds token limit. Starting map-reduce pre-summarization process...")
+            chunks = chunk_text(paper_text, CHUNK_TOKEN_LIMIT)
+            paper_text_for_summary = map_reduce_summary(chunks, fast_llm)
+            print("\n✅ Pre-summarization complete. Starting main summarization and verification loop.")
+        else:
+            print("Paper is within token limit. Proceeding directly to summarization.")
+
+    retriever = ChunkRetriever(paper_text) if verify_mode == "retrieved" else None
+    full_tokens = text_chunking.estimate_tokens(paper_text)
+    verify_tokens = 0
+    verify_calls = 0
 
     current_summary = ""
     feedback = ""
@@ -236,21 +388,34 @@ def summarize_and_verify_paper(paper_text: str, max_retries: int = 3):
         # 1. Generate summary using the (potentially pre-summarized) text
         current_summary = generate_summary(paper_text_for_summary, feedback)
 
-        # 2. Verify summary against the ORIGINAL, full paper text
-        reflection_result = verify_reflection(paper_text, current_summary)
-        readability_result = verify_readability(current_summary)
-
-        print(f"   - Reflection Check: {'OK' if 'OK' in reflection_result else 'Feedback Received'}")
-        print(f"   - Readability Check: {'OK' if 'OK' in readability_result else 'Feedback Received'}")
+        # 2. Verify summary against the paper (both checks at once)
+        if verify_mode == "full":
+            reference_text = paper_text
+        elif verify_mode == "condensed":
+            reference_text = paper_text_for_summary
+        else:
+            reference_text = retriever.retrieve(current_summary)
+        verify_tokens += text_chunking.estimate_tokens(reference_text)
+        verify_calls += 1
+        verify_start = time.perf_counter()
+        results = run_verifiers(reference_text, current_summary)
+        reflection_result = results.get("reflection")
+        readability_result = results.get("readability")
+
+        for name, result in (("Reflection", reflection_result), ("Readability", readability_result)):
+            status = "Skipped" if result is None else "OK" if "OK" in result else "Feedback Received"
+            print(f"   - {name} Check: {status}")
+        print(f"   - Verification took {time.perf_counter() - verify_start:.1f}s")
 
         # 3. Check verification results
-        if "OK" in reflection_result and "OK" in readability_result:
+        if all(result is not None and "OK" in result for result in (reflection_result, readability_result)):
             print("\n✅ Summary approved by all verifiers!")
 
             # Final check for paragraph count
             paragraphs = [p for p in current_summary.split('\n') if p.strip()]
             if len(paragraphs) == 4:
                 print("📄 Final check passed: Summary has four paragraphs.")
+                _report_verification_savings(verify_mode, verify_calls, verify_tokens, full_tokens)
                 return current_summary
             else:
                 feedback = f"The content is good, but the summary must have exactly four paragraphs. The last version had {len(paragraphs)}."
@@ -259,15 +424,24 @@ def summarize_and_verify_paper(paper_text: str, max_retries: int = 3):
 
         # 4. Collect feedback for regeneration
         feedback_parts = []
-        if "OK" not in reflection_result:
+        if reflection_result is not None and "OK" not in reflection_result:
             feedback_parts.append(f"Content Reflection Feedback: {reflection_result}")
-        if "OK" not in readability_result:
+        if readability_result is not None and "OK" not in readability_result:
             feedback_parts.append(f"Readability Feedback: {readability_result}")
         feedback = "\n".join(feedback_parts)
         print("🔄 Verification failed. Regenerating summary with new feedback...")
 
     print(f"\n❌ Failed to generate a satisfactory summary after {max_retries} attempts.")
-    return "Could not generate a verified summary. Please try again."
+    _report_verification_savings(verify_mode, verify_calls, verify_tokens, full_tokens)
+    return SUMMARY_FAILED
+
+
+def _report_verification_savings(verify_mode: str, calls: int, tokens: int, full_tokens: int):
+    """Prints how many paper tokens the reflection checks sent, against sending the full paper every time."""
+    baseline = calls * full_tokens
+    saved = baseline - tokens
+    print(f"📉 Verification input ({verify_mode}): ~{tokens} paper tokens over {calls} attempt(s), "
+          f"~{saved} fewer than full text ({saved / baseline if baseline else 0:.0%} saved).")
 
 
 # if __name__ == '__main__':
@@ -0,0 +1,73 @@
+import random
+import sys
+import time
+
+from text_chunking import chunk_text, estimate_tokens, _encoding
+
+# A dense two-column arXiv page holds roughly this many words.
+WORDS_PER_PAGE = 550
+CHUNK_TOKEN_LIMIT = 7000
+VOCABULARY = ("we propose a novel transformer based method for learning sparse representations of "
+              "graph structured data and evaluate it on standard benchmarks where results show "
+              "consistent improvements over strong baselines in accuracy latency and memory").split()
+
+
+def synthetic_paper(pages: int, seed: int = 0) -> str:
+    """Paragraphs of 3-12 sentences, plus a few huge 'paragraphs' like the tables PyMuPDF emits."""
+    rng = random.Random(seed)
+    words_left = pages * WORDS_PER_PAGE
+    paragraphs = []
+    while words_left > 0:
+        if rng.random() < 0.03:
+            # An extracted table or reference list: no blank lines, thousands of words.
+            size = rng.randint(3000, 9000)
+            paragraphs.append("\n".join(" ".join(rng.choices(VOCABULARY, k=8)) for _ in range(size // 8)))
+        else:
+            sentences = [" ".join(rng.choices(VOCABULARY, k=rng.randint(8, 30))).capitalize() + "."
+                         for _ in range(rng.randint(3, 12))]
+            paragraphs.append(" ".join(sentences))
+            size = sum(len(sentence.split()) for sentence in sentences)
+        words_left -= size
+    return "\n\n".join(paragraphs)
+
+
+def legacy_chunk_text(text: str, token_limit: int, count_tokens) -> list:
+    """The previous ai_summarizer.chunk_text: re-counts the whole growing chunk for every paragraph."""
+    chunks = []
+    current_chunk = ""
+    for para in text.split('\n\n'):
+        if count_tokens(current_chunk + para + "\n\n") <= token_limit:
+            current_chunk += para + "\n\n"
+        else:
+            chunks.append(current_chunk.strip())
+            current_chunk = para + "\n\n"
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def run(name: str, fn):
+    calls = {"count": 0, "chars": 0}
+
+    def counting_estimator(text):
+        calls["count"] += 1
+        calls["chars"] += len(text)
+        return estimate_tokens(text)
+
+    start = time.perf_counter()
+    chunks = fn(counting_estimator)
+    seconds = time.perf_counter() - start
+    largest = max(estimate_tokens(chunk) for chunk in chunks)
+    print(f"  {name:<8} {seconds * 1000:9.1f} ms  {len(chunks):4d} chunks  largest {largest:6d} tokens  "
+          f"{calls['count']:6d} token counts over {calls['chars'] / 1e6:8.1f}M chars")
+
+
+if __name__ == '__main__':
+    # Usage: python bench_chunking.py [pages ...]
+    pages_list = [int(arg) for arg in sys.argv[1:]] or [10, 50, 100]
+    print(f"Token estimator: {'tiktoken cl100k_base' if _encoding() is not None else 'characters / 4'}")
+    for pages in pages_list:
+        text = synthetic_paper(pages)
+        print(f"{pages} pages, {len(text) / 1e6:.2f}M chars, ~{estimate_tokens(text)} tokens:")
+        run("legacy", lambda count: legacy_chunk_text(text, CHUNK_TOKEN_LIMIT, count))
+        run("linear", lambda count: chunk_text(text, CHUNK_TOKEN_LIMIT, count))
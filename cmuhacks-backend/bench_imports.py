@@ -0,0 +1,69 @@
+import os
+import re
+import subprocess
+import sys
+
+# Modules whose import cost we track. flask_app is what a web worker pays at
+# boot; the rest are loaded on demand (or by the ingestion jobs only).
+MODULES = [
+    "flask_app",
+    "database_handler",
+    "embedding_model",
+    "ai_summarizer",
+    "daily_update_papers",
+    "sentence_transformers",
+]
+# How many of the most expensive transitive imports to list per module.
+TOP_N = 10
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str):
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        (total_seconds, [(cumulative_seconds, name), ...] for its top-level imports), or
+        (None, error message) if the import failed.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=here, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+        return None, last_line
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+            entries.append((cumulative_us / 1e6, indent, name))
+    root = next((i for i, (_, _, name) in enumerate(entries) if name == module), None)
+    if root is None:
+        return 0.0, []
+    total, root_indent, _ = entries[root]
+    # importtime prints a module's imports just before the module itself, one
+    # indentation level deeper; walk back over that block to find its direct imports.
+    children = []
+    for seconds, indent, name in reversed(entries[:root]):
+        if indent <= root_indent:
+            break
+        if indent == root_indent + 2:
+            children.append((seconds, name))
+    return total, sorted(children, reverse=True)[:TOP_N]
+
+
+if __name__ == '__main__':
+    # Usage: python bench_imports.py [module ...]
+    modules = sys.argv[1:] or MODULES
+    for module in modules:
+        total, detail = measure(module)
+        if total is None:
+            print(f"{module:<24} failed: {detail}")
+            continue
+        print(f"{module:<24} {total * 1000:9.1f} ms")
+        for seconds, name in detail:
+            print(f"    {name:<36} {seconds * 1000:9.1f} ms")
@@ -0,0 +1,64 @@
+import sys
+import time
+
+import numpy as np
+
+from interaction_events import EMBEDDING_DIM, EVENT_WEIGHTS, PROFILE_DECAY, normalize_rows
+from profile_recompute import compute_profiles, copy_payload
+
+NUM_PAPERS = 20_000
+EVENTS_PER_USER = 30
+LIKE_FRACTION = 0.2
+# Users timed with the per-user loop; the result is extrapolated to all users.
+LOOP_SAMPLE = 2_000
+
+
+def synthetic_history(num_users: int, seed: int = 0):
+    """Events grouped by user in log order, with a varying number of events per user."""
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(EVENTS_PER_USER, num_users)
+    user_rows = np.repeat(np.arange(num_users), counts)
+    paper_rows = rng.integers(0, NUM_PAPERS, len(user_rows))
+    weights = np.where(rng.random(len(user_rows)) < LIKE_FRACTION, EVENT_WEIGHTS["like"], EVENT_WEIGHTS["read"])
+    return user_rows, paper_rows, weights.astype(np.float32)
+
+
+def loop_profiles(user_rows, paper_rows, weights, paper_vectors, users):
+    """One user at a time, folding each event as update_user does."""
+    profiles = {}
+    for user in users:
+        profile = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for i in np.flatnonzero(user_rows == user):
+            profile = PROFILE_DECAY * profile + weights[i] * paper_vectors[paper_rows[i]]
+            profile = profile / np.linalg.norm(profile)
+        profiles[user] = profile
+    return profiles
+
+
+def timed(name: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {name:<22} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+if __name__ == '__main__':
+    # Usage: python bench_profiles.py [users]
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = np.random.default_rng(1)
+    paper_vectors = normalize_rows(rng.standard_normal((NUM_PAPERS, EMBEDDING_DIM)).astype(np.float32))
+    user_rows, paper_rows, weights = synthetic_history(num_users)
+    print(f"{num_users} users, {len(user_rows)} events, {NUM_PAPERS} papers x {EMBEDDING_DIM} dims:")
+
+    start = time.perf_counter()
+    profiles = timed("fold + normalize", lambda: compute_profiles(user_rows, paper_rows, weights, num_users, paper_vectors))
+    timed("COPY payload", lambda: copy_payload(np.arange(num_users), profiles))
+    print(f"  {'batch total':<22} {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    sample = np.arange(min(LOOP_SAMPLE, num_users))
+    loop_start = time.perf_counter()
+    expected = loop_profiles(user_rows, paper_rows, weights, paper_vectors, sample)
+    loop_seconds = (time.perf_counter() - loop_start) * num_users / len(sample)
+    print(f"  {'per-user loop (est.)':<22} {loop_seconds * 1000:9.1f} ms")
+    error = max(np.abs(profiles[user] - expected[user]).max() for user in sample)
+    print(f"  max difference from the loop on {len(sample)} users: {error:.2e}")
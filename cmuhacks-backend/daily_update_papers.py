@@ -1,26 +1,104 @@
 import arxiv
 import datetime
 import math
-import time
-import fitz
-import requests
 import os
-from ai_summarizer import summarize_and_verify_paper
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ai_summarizer import summarize_and_verify_paper, condense_papers, SUMMARY_FAILED
+import ingestion_ledger
+from semantic_scholar import get_author_profiles
+from pdf_pipeline import stream_paper_texts
 RECENT_DAYS=3
 ALPHA=1
 BETA=2
 PAPERS_PER_CAT=15
+# Upper bound on papers being summarized at once, shared by every category
+# processed in this process (the LLM quota is global, not per category).
+INGEST_LLM_CONCURRENCY=int(os.environ.get("INGEST_LLM_CONCURRENCY", "2"))
+summary_slots=threading.BoundedSemaphore(INGEST_LLM_CONCURRENCY)
+# arXiv asks for one request every few seconds per client; share one client and serialize searches.
+arxiv_client=arxiv.Client()
+arxiv_lock=threading.Lock()
 pdf_dir = "arxiv_pdfs"
 if not os.path.exists(pdf_dir):
     os.makedirs(pdf_dir)
+def summarize_with_budget(paper_text, condensed_text=None):
+    """Summarizes one paper while holding a slot of the process-wide LLM budget."""
+    with summary_slots:
+        return summarize_and_verify_paper(paper_text, condensed_text=condensed_text)
+def embedding_text(paper):
+    """The text a paper is embedded from: its title and abstract."""
+    return paper.title+" "+paper.summary
 def get_recent_top(subject):
-    recent_papers=fetch_recent(subject)
+    """
+    Fetches, filters and summarizes the recent top papers of an arXiv category.
+
+    Papers already recorded in the ingestion ledger are dropped right after the
+    fetch, so only new or updated papers go through the prestige lookup, the PDF
+    download and LLM summarization. The caller records the inserted papers as 'done'.
+
+    Returns:
+        Five aligned lists: embedding texts (title + abstract), titles, PDF links,
+        summaries and arXiv entry ids.
+    """
+    return process_recent_papers(fetch_recent(subject))
+def process_recent_papers(recent_papers, on_summary=None):
+    """
+    Runs everything after the arXiv fetch for one batch of papers: ledger filtering,
+    prestige cutoff, PDF extraction and summarization. Returns the same lists as get_recent_top.
+
+    Long papers are pre-summarized together (see ai_summarizer.condense_papers), then
+    up to INGEST_LLM_CONCURRENCY papers are summarized and verified at once.
+
+    Args:
+        on_summary: Optional callback(paper, summary), called as soon as each paper's
+            summary is ready, so the caller can store it without waiting for the batch.
+    """
+    recent_papers=ingestion_ledger.filter_new_papers(recent_papers)
+    if not recent_papers:
+        return [], [], [], [], []
     filtered_papers, texts=get_top_papers_from_authors(recent_papers)
-    summaries=[summarize_and_verify_paper(paper) for paper in texts]
-    
-    return [paper.title+" "+paper.summary for paper in filtered_papers], [paper.title for paper in filtered_papers], [paper.pdf_url for paper in filtered_papers], summaries
+
+    # A new arXiv version with identical text doesn't need another summary.
+    hashes=[ingestion_ledger.content_hash(text) for text in texts]
+    unchanged=ingestion_ledger.unchanged_papers(filtered_papers, texts)
+    ingestion_ledger.record([filtered_papers[i].entry_id for i in unchanged], 'done', [hashes[i] for i in unchanged])
+    keep=[i for i in range(len(filtered_papers)) if i not in unchanged]
+    filtered_papers, texts, hashes=[filtered_papers[i] for i in keep], [texts[i] for i in keep], [hashes[i] for i in keep]
+    ingestion_ledger.record([paper.entry_id for paper in filtered_papers], 'pending', hashes)
+
+    condensed=condense_papers(texts)
+    # Papers whose pre-summarization failed are marked failed; the others go on.
+    failed=[i for i, text in enumerate(condensed) if isinstance(text, Exception)]
+    for i in failed:
+        print(f"   ❌ Pre-summarization failed for {filtered_papers[i].entry_id}: {condensed[i]}")
+    ingestion_ledger.record([filtered_papers[i].entry_id for i in failed], 'failed')
+    keep=[i for i in range(len(filtered_papers)) if i not in failed]
+    filtered_papers, texts, condensed=[filtered_papers[i] for i in keep], [texts[i] for i in keep], [condensed[i] for i in keep]
+    summaries=[SUMMARY_FAILED]*len(texts)
+    with ThreadPoolExecutor(max_workers=INGEST_LLM_CONCURRENCY) as pool:
+        futures={pool.submit(summarize_with_budget, text, condensed_text): i for i, (text, condensed_text) in enumerate(zip(texts, condensed))}
+        for future in as_completed(futures):
+            i=futures[future]
+            try:
+                summaries[i]=future.result()
+            except Exception as e:
+                print(f"   ❌ Summarization failed for {filtered_papers[i].entry_id}: {e}")
+            if summaries[i]==SUMMARY_FAILED:
+                ingestion_ledger.record([filtered_papers[i].entry_id], 'failed')
+            elif on_summary is not None:
+                try:
+                    on_summary(filtered_papers[i], summaries[i])
+                except Exception as e:
+                    # One paper failing to store must not abort the rest of the batch.
+                    print(f"   ❌ Storing failed for {filtered_papers[i].entry_id}: {e}")
+                    ingestion_ledger.record([filtered_papers[i].entry_id], 'failed')
+    keep=[i for i in range(len(filtered_papers)) if summaries[i]!=SUMMARY_FAILED]
+    filtered_papers, summaries=[filtered_papers[i] for i in keep], [summaries[i] for i in keep]
+
+    return [embedding_text(paper) for paper in filtered_papers], [paper.title for paper in filtered_papers], [paper.pdf_url for paper in filtered_papers], summaries, [paper.entry_id for paper in filtered_papers]
 def fetch_recent(subject):
-    client = arxiv.Client()
+    client = arxiv_client
     # 2. Calculate the start date and format it for the API query.
     start_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=RECENT_DAYS)
     start_date_str = start_date.strftime('%Y%m%d000000') # Format: YYYYMMDDHHMMSS
@@ -41,7 +119,8 @@ def fetch_recent(subject):
     # 4. Use the client to execute the search and get the results.
     # This is the corrected line: client.results(search)
     papers_found = False
-    papers=list(client.results(search))
+    with arxiv_lock:
+        papers=list(client.results(search))
     for result in papers:
         papers_found = True
         print(f"📄 Title: {result.title}")
@@ -56,105 +135,56 @@ def fetch_recent(subject):
     return papers
 def compute_author_prestige(h_index, citation_total):
     return ALPHA*h_index+BETA*math.log(citation_total+1)
+def prestige_authors(paper):
+    """The authors whose record counts towards a paper's prestige: the first and the last."""
+    authors=list(paper.authors)
+    return [authors[i].name for i in range(len(authors)) if i==0 or i==len(authors)-1]
 def get_top_papers_from_authors(recent_articles):
      stats=[]
      print(len(list(recent_articles)))
+     # Look every distinct author up once, concurrently and through the persistent cache.
+     names=[name for paper in recent_articles for name in prestige_authors(paper)]
+     print(f"   👤 Querying for {len(set(names))} authors")
+     profiles=get_author_profiles(names)
      for paper in recent_articles:
         h_indices=[]
         citationses=[]
-        authors=list(paper.authors)
-        for i in range(len(authors)):
-            if(i>0 and i<len(authors)-1):
-                continue
-            author=authors[i]
-            author_name = author.name
-            print(f"   👤 Querying for author: {author_name}")
-
-            try:
-                # --- Construct the API Request ---
-                # We will use the author search endpoint.
-                # API Docs: https://www.semanticscholar.org/product/api
-                api_url = 'https://api.semanticscholar.org/graph/v1/author/search'
-                
-                # Define the query parameters
-                params = {
-                    'query': author_name,
-                    # Request the fields we care about
-                    'fields': 'name,hIndex,citationCount,url'
-                }
-                
-                # Make the GET request
-                response = requests.get(api_url, params=params)
-                response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-                data = response.json()
-                # --- Process the Response ---
-                # The API returns a list of potential authors. We'll take the first one.
-                # This is a "best guess" as names can be ambiguous.
-                if data.get('data') and len(data['data']) > 0:
-                    author_profile = data['data'][0]
-                    
-                    # Safely get the values, providing 'N/A' as a default
-                    s2_name = author_profile.get('name', 'N/A')
-                    h_index = author_profile.get('hIndex', 'N/A')
-                    citations = author_profile.get('citationCount', 'N/A')
-                    profile_url = author_profile.get('url', 'N/A')
-                    h_indices.append(h_index)
-                    citationses.append(citations)
-                    
-                    print(f"     ✅ Found Profile: {s2_name}")
-                    print(f"        H-Index: {h_index}")
-                    print(f"        Total Citations: {citations}")
-                    print(f"        Profile URL: {profile_url}\n")
-                else:
-                    print(f"     ❌ Could not find a Semantic Scholar profile for {author_name}.\n")
-            except requests.exceptions.RequestException as e:
-                print(f"     ❗️ An error occurred while calling the API for {author_name}: {e}\n")
-            except Exception as e:
-                print(f"     ❗️ An unexpected error occurred for {author_name}: {e}\n")
-            time.sleep(1) 
+        for author_name in prestige_authors(paper):
+            author_profile=profiles.get(author_name)
+            if author_profile:
+                h_indices.append(author_profile.get('hIndex') or 0)
+                citationses.append(author_profile.get('citationCount') or 0)
+                print(f"     ✅ Found Profile: {author_profile.get('name', 'N/A')}")
+                print(f"        H-Index: {author_profile.get('hIndex', 'N/A')}")
+                print(f"        Total Citations: {author_profile.get('citationCount', 'N/A')}")
+                print(f"        Profile URL: {author_profile.get('url', 'N/A')}\n")
+            else:
+                print(f"     ❌ Could not find a Semantic Scholar profile for {author_name}.\n")
         if(len(h_indices)==0 or len(citationses)==0):
                 stats.append((0, 0))
                 continue;
         stats.append((max(h_indices), max(citationses)))
      print(stats)
      computed_stats=[compute_author_prestige(s[0], s[1]) for s in stats]
-     computed_stats.sort()
-     print(max(-50, (-1*len(computed_stats))+1))
-     cutoff=computed_stats[max(-50, (-1*len(computed_stats))+1)]
-     filtered_papers=[]
-     texts=[]
-     for i in range(len(recent_articles)):
-         if(computed_stats[i]>=cutoff):
-             paper=recent_articles[i]
-             try:
-                # --- Print Paper Metadata ---
-                print(f"📄 Title: {paper.title}")
-                print(f"   ID: {paper.entry_id}")
-                # Get the first author
-                first_author = paper.authors[0]
-                print(f"   Author: {first_author}")
-                
-                # --- Download the PDF ---
-                # The download function saves the file and returns the path.
-                pdf_path = paper.download_pdf(dirpath=pdf_dir)
-                print(f"   ✅ PDF downloaded to: {pdf_path}")
-
-                # --- 3. Extract Full Text from the PDF ---
-                doc = fitz.open(pdf_path) # Open the PDF file.
-                
-                # Join the text from all pages into a single string.
-                full_paper_text = "".join(page.get_text("text") for page in doc)
-                
-                # Append the extracted full text to the 'texts' list.
-                texts.append(full_paper_text)
-                filtered_papers.append(paper)
-                
-                print(f"   ✔️ Full text extracted ({len(full_paper_text)} chars) and appended.")
-                
-                doc.close() # Close the document.
-             except Exception as e:
-                print(f"   ❌ An error occurred for paper {paper.entry_id}: {e}")
+     # Kept on the result so it is stored with the paper and used when re-ranking recommendations.
+     for paper, prestige in zip(recent_articles, computed_stats):
+        paper.author_prestige=prestige
+     # Sort a copy: computed_stats[i] must stay aligned with recent_articles[i] below.
+     sorted_stats=sorted(computed_stats)
+     print(max(-50, (-1*len(sorted_stats))+1))
+     cutoff=sorted_stats[max(-50, (-1*len(sorted_stats))+1)]
+     selected=[recent_articles[i] for i in range(len(recent_articles)) if computed_stats[i]>=cutoff]
+     ingestion_ledger.record([recent_articles[i].entry_id for i in range(len(recent_articles)) if computed_stats[i]<cutoff], 'skipped')
+     for paper in selected:
+        print(f"📄 Title: {paper.title}")
+        print(f"   ID: {paper.entry_id}")
+     # Download PDFs concurrently and extract their text in a process pool.
+     results={}
+     for index, full_paper_text in stream_paper_texts(selected, pdf_dir):
+        results[index]=full_paper_text
+        print(f"   ✔️ Full text extracted ({len(full_paper_text)} chars) for {selected[index].entry_id}.")
+     # Keep the original (prestige-filtered) order for the caller.
+     filtered_papers=[selected[i] for i in sorted(results)]
+     texts=[results[i] for i in sorted(results)]
+     ingestion_ledger.record([selected[i].entry_id for i in range(len(selected)) if i not in results], 'failed')
      return filtered_papers, texts
-
-            # Be a good API citizen: add a small delay between requests
\ No newline at end of file
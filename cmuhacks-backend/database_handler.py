@@ -1,25 +1,30 @@
-import psycopg2
-from pgvector.psycopg2 import register_vector
 import numpy as np
 import os
-from sentence_transformers import SentenceTransformer
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-print("Model loaded.")
+import json
+import base64
+from psycopg2.extras import execute_values
+from db_pool import get_pool
+from paper_cache import paper_rows
+from schema import HNSW_EF_SEARCH, apply_search_settings
+from vector_index import get_local_index
+from embedding_model import encode
+from interaction_events import normalize_rows
+from reranker import RERANK_CANDIDATES, FEATURE_COLUMNS, category_bits, paper_features, rerank_rows, timed_stage
+
+# Largest hnsw.ef_search pgvector accepts.
+HNSW_MAX_EF_SEARCH = 1000
+# Largest ivfflat.probes pgvector accepts (its maximum number of lists).
+IVFFLAT_MAX_PROBES = 32768
 
 def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            dbname="postgres",
-            user=os.environ["DB_USERNAME"],
-            password=os.environ["DB_PASSWORD"],
-            host="paper-database.c5wk0s4e80wd.us-east-2.rds.amazonaws.com",
-            port="5432" # Default port
-        )
-        return conn
-    except Exception as e:
-        print(f"Error connecting to the database: {e}")
-        # Gradio can't handle exceptions well during app startup, so we raise it
-        # to make it clear in the logs that the connection failed.
+    """
+    Checks a connection out of the process-wide pool (see db_pool.py).
+
+    Use it as a context manager: the connection is committed on success, rolled
+    back on error and handed back to the pool when the block exits. pgvector's
+    type adapter is already registered on every pooled connection.
+    """
+    return get_pool().connection()
 def add_user_to_db(username, password, email):
     """
     Adds a new user to the 'users' table with a hashed password.
@@ -32,33 +37,26 @@ def add_user_to_db(username, password, email):
     Returns:
         The user_id of the newly created user, or None if an error occurred.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
 
-        # It's crucial to hash passwords before storing them for security.
-       # hashed_password = hashlib.sha256(password.encode()).hexdigest()
+            # It's crucial to hash passwords before storing them for security.
+           # hashed_password = hashlib.sha256(password.encode()).hexdigest()
 
-        # Assuming user_id is the same as the username for simplicity.
-        # The embedding is not set upon creation and will be NULL by default if the column allows it.
-        cur.execute(
-            "INSERT INTO users (username, password, email) VALUES (%s, %s, %s, %s)",
-            (username, password, email)
-        )
-
-        conn.commit()
-        cur.close()
+            # Assuming user_id is the same as the username for simplicity.
+            # The embedding is not set upon creation and will be NULL by default if the column allows it.
+            cur.execute(
+                "INSERT INTO users (username, password, email) VALUES (%s, %s, %s, %s)",
+                (username, password, email)
+            )
+            cur.close()
+        # The pooled connection commits on exit and rolls back on error.
         print(f"User '{username}' added successfully.")
         return username
     except Exception as e:
-        if conn:
-            conn.rollback()  # Roll back the transaction on error
         print(f"An error occurred in add_user_to_db: {e}")
         return None
-    finally:
-        if conn is not None:
-            conn.close()
 def get_user_vector(user_id):
     """
     Retrieves the embedding vector for a specific user from the 'users' table.
@@ -69,15 +67,12 @@ def get_user_vector(user_id):
     Returns:
         A numpy array representing the user's embedding vector, or None if the user is not found.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        register_vector(conn)
-        cur = conn.cursor()
-        cur.execute("SELECT embedding FROM users WHERE id = %s", (user_id,))
-        result = cur.fetchone()
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT embedding FROM users WHERE id = %s", (user_id,))
+                result = cur.fetchone()
         print(result)
-        cur.close()
         if result:
             print(result[0])
             return result[0]
@@ -87,10 +82,6 @@ def get_user_vector(user_id):
     except Exception as e:
         print(f"An error occurred in get_user_vector: {e}")
         return None
-    finally:
-        print('did the finally lol')
-        if conn is not None:
-            conn.close()
 
 def get_article_vector(article_id):
     """
@@ -102,15 +93,11 @@ def get_article_vector(article_id):
     Returns:
         A numpy array representing the article's embedding vector, or None if the article is not found.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        register_vector(conn)
-        cur.execute("SELECT embedding FROM papers WHERE id = %s", (article_id,))
-        result = cur.fetchone()
-        print(type(result[0]))
-        cur.close()
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT embedding FROM papers WHERE id = %s", (article_id,))
+                result = cur.fetchone()
         if result:
             return result[0]
         else:
@@ -119,9 +106,37 @@ def get_article_vector(article_id):
     except Exception as e:
         print(f"An error occurred in get_article_vector: {e}")
         return None
-    finally:
-        if conn is not None:
-            conn.close()
+
+def _get_paper_row(article_id):
+    """
+    Returns (title, html_string, arxiv_link) for a paper, served from the
+    in-process paper cache when possible. Rows only change when add_paper(s)
+    writes them, which invalidates them here; other processes see the new
+    version once their cached copy expires.
+    """
+    key = str(article_id)
+    row = paper_rows.get(key)
+    if row is not None:
+        return row
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT title, html_string, arxiv_link FROM papers WHERE id = %s", (article_id,))
+            row = cur.fetchone()
+    if row is not None:
+        row = tuple(row)
+        paper_rows.put(key, row)
+    return row
+
+
+def invalidate_paper(article_id):
+    """Drops a paper from the in-process paper cache after it is inserted or overwritten."""
+    paper_rows.invalidate(str(article_id))
+
+
+def get_paper_cache_stats():
+    """Returns hit/miss counters and occupancy of the paper cache, for monitoring."""
+    return paper_rows.stats()
+
 
 def get_paper_body(article_id):
     """
@@ -131,267 +146,348 @@ def get_paper_body(article_id):
         article_id: The ID of the article whose HTML body is to be retrieved.
 
     Returns:
-        A string containing the HTML content of the paper, or None if the article is not found.
+        A (html_string, arxiv_link) tuple for the paper, or None if the article is not found.
     """
-    conn = None
     print('running')
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT html_string, arxiv_link FROM papers WHERE id = %s", (article_id,))
-        result = cur.fetchone()
-        print(result)
-        cur.close()
+        result = _get_paper_row(article_id)
         if result:
-            return result
+            return result[1], result[2]
         else:
             print(f"No paper body found with article_id: {article_id}")
             return None
     except Exception as e:
         print(f"An error occurred in get_paper_body: {e}")
         return None
-    finally:
-        if conn is not None:
-            conn.close()
 def get_paper_title(article_id):
     """
-    Retrieves the HTML content for a specific article from the 'papers' table.
+    Retrieves the title of a specific article from the 'papers' table.
 
     Args:
-        article_id: The ID of the article whose HTML body is to be retrieved.
+        article_id: The ID of the article whose title is to be retrieved.
 
     Returns:
-        A string containing the HTML content of the paper, or None if the article is not found.
+        A string containing the title of the paper, or None if the article is not found.
     """
-    conn = None
     print('running')
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT title FROM papers WHERE id = %s", (article_id,))
-        result = cur.fetchone()
-        print(result)
-        cur.close()
+        result = _get_paper_row(article_id)
         if result:
             return result[0]
         else:
             print(f"No paper body found with article_id: {article_id}")
             return None
     except Exception as e:
-        print(f"An error occurred in get_paper_body: {e}")
+        print(f"An error occurred in get_paper_title: {e}")
         return None
-    finally:
-        if conn is not None:
-            conn.close()
 def get_early_paper_summary(article_id):
     """
-    Retrieves the HTML content for a specific article from the 'papers' table.
+    Retrieves the opening of the summary for a specific article from the 'papers' table.
 
     Args:
-        article_id: The ID of the article whose HTML body is to be retrieved.
+        article_id: The ID of the article whose summary is to be retrieved.
 
     Returns:
-        A string containing the HTML content of the paper, or None if the article is not found.
+        A string containing the first ~120 characters of the summary, or None if the article is not found.
     """
-    conn = None
     print('running')
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT html_string FROM papers WHERE id = %s", (article_id,))
-        result = cur.fetchone()
-        print(result)
-        cur.close()
+        result = _get_paper_row(article_id)
         if result:
-            return result[0][3:120]+'...'
+            return result[1][3:120]+'...'
         else:
             print(f"No paper body found with article_id: {article_id}")
             return None
     except Exception as e:
-        print(f"An error occurred in get_paper_body: {e}")
+        print(f"An error occurred in get_early_paper_summary: {e}")
         return None
-    finally:
-        if conn is not None:
-            conn.close()
 def get_complete_paper_summary(article_id):
     """
-    Retrieves the HTML content for a specific article from the 'papers' table.
+    Retrieves the title and HTML content for a specific article from the 'papers' table.
 
     Args:
         article_id: The ID of the article whose HTML body is to be retrieved.
 
     Returns:
-        A string containing the HTML content of the paper, or None if the article is not found.
+        A (title, html_string) tuple for the paper, or None if the article is not found.
     """
-    conn = None
     print('running')
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT title, html_string FROM papers WHERE id = %s", (article_id,))
-        result = cur.fetchone()
-        print(result)
-        cur.close()
+        result = _get_paper_row(article_id)
         if result:
-            print("%%%%%%%%%%%%%%%%%%%%%%%%%%%%%RESULTPRINTING%%%%%%%%%%%%%%%%%%%%%%%%%%%")
-            print(result)
-            print("%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%")
-            return result
+            return result[0], result[1]
         else:
             print(f"No paper body found with article_id: {article_id}")
             return None
     except Exception as e:
-        print(f"An error occurred in get_paper_body: {e}")
+        print(f"An error occurred in get_complete_paper_summary: {e}")
         return None
-    finally:
-        if conn is not None:
-            conn.close()
-def add_paper(title: str, title_real, paper_body: str):
+# Columns that bulk readers may request, mapped to the SQL that produces them.
+# 'early_summary' mirrors get_early_paper_summary (strip the leading '<p>',
+# keep the next 117 characters) so the trimming happens inside Postgres and the
+# full html_string never leaves the database for feed pages.
+PAPER_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "html_string": "html_string",
+    "arxiv_link": "arxiv_link",
+    "liked_count": "liked_count",
+    "early_summary": "substr(html_string, 4, 117) || '...'",
+}
+FEED_FIELDS = ["id", "title", "early_summary", "arxiv_link"]
+
+
+def _paper_select_list(fields: list):
+    """Returns (SELECT list, column names) for the requested paper fields, with id always first."""
+    unknown = [f for f in fields if f not in PAPER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown paper field(s): {unknown}")
+    fields = ["id"] + [f for f in fields if f != "id"]
+    return ", ".join(f"{PAPER_FIELDS[f]} AS {f}" for f in fields), fields
+
+
+def get_papers(ids: list, fields: list = FEED_FIELDS):
+    """
+    Retrieves several papers from the 'papers' table in a single query.
+
+    Args:
+        ids: The IDs of the papers to retrieve.
+        fields: Names from PAPER_FIELDS to include for each paper. 'id' is always included.
+
+    Returns:
+        A list of dicts (one per found paper) in the same order as `ids`, or None if an error occurred.
+    """
+    if not ids:
+        return []
+    try:
+        select_list, fields = _paper_select_list(fields)
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT {select_list} FROM papers WHERE id = ANY(%s)", (list(ids),))
+                rows = cur.fetchall()
+        by_id = {row[0]: dict(zip(fields, row)) for row in rows}
+        return [by_id[i] for i in ids if i in by_id]
+    except Exception as e:
+        print(f"An error occurred in get_papers: {e}")
+        return None
+
+
+def add_paper(title: str, title_real, paper_body: str, arxiv_link: str = None, categories: list = None):
     """
     Generates an embedding for a paper title and stores it in the database.
+    `categories` are the paper's arXiv categories (e.g. ['cs.LG']), stored as bits over reranker.CATEGORY_VOCABULARY.
+    For more than one paper, prefer add_papers, which batches the encoding and the insert.
     """
     if not title:
         return "Error: Paper title cannot be empty."
     
     # Generate the embedding
-    embedding = model.encode(title)
+    embedding = encode(title)
     print(embedding.shape)
-    # For demo, generate a random category vector (e.g., for 10 categories)
-    num_categories = 10
-    categories = np.random.randint(0, 2, num_categories).tolist()
+    categories = category_bits(categories)
 
     # Store in the database
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO papers (title, html_string, arxiv_link, liked_count, embedding, categories) VALUES (%s, %s, %s, %s, %s, %s)",
-                (title_real, paper_body, arxiv_link, 0, embedding.tolist(), categories)
-            )
-            conn.commit()
-        conn.close()
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO papers (title, html_string, arxiv_link, liked_count, embedding, categories) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
+                    (title_real, paper_body, arxiv_link, 0, embedding.tolist(), categories)
+                )
+                paper_id = cur.fetchone()[0]
+        invalidate_paper(paper_id)
+        local_index = get_local_index()
+        if local_index is not None:
+            local_index.add(paper_id, embedding)
         return f"Successfully added paper: '{title}'"
     except Exception as e:
         print(e)
         return f"Error adding paper to DB: {e}"
 
-def update_user(id, current, new, gamma: float = 0.8):
+def add_papers(papers: list):
     """
-    Calculates a time-weighted average of a user's read history vectors.
-    Input `history` is a list of vectors (as lists or np.arrays).
-    The list is assumed to be ordered from OLDEST to NEWEST.
+    Embeds and stores many papers at once.
+
+    All embedding texts are encoded in one batched SentenceTransformer call and
+    every row is written with a single multi-row statement inside one transaction,
+    so either the whole batch lands or none of it does.
+
+    Papers with a 'paper_id' (a new arXiv version of a paper that is already
+    stored) overwrite that row in place, keeping its id and likes; the others
+    are inserted.
+
+    Args:
+        papers: A list of dicts with keys 'embedding_text' (the text to embed, e.g.
+            title + abstract), 'title', 'paper_body' and optionally 'arxiv_link',
+            'categories' (arXiv categories), 'published' (datetime), 'author_prestige'
+            and 'paper_id'.
+
+    Returns:
+        The list of paper IDs, in the same order as `papers`, or an error string.
     """
-    # if not history or not isinstance(history, list):
-    #     return "Error: History must be a non-empty list of vectors."
-        
-    # Convert all vectors to numpy arrays
-    # history_vectors = [np.array(vec) for vec, like_status in history]
-    
-    # if not history_vectors:
-    #     return "Error: No valid vectors found in history."
-        
-    # Simple time-weighted average (exponential decay)
-    # The most recent item has the highest weight.
-    # current_vector = np.zeros_like(history_vectors[0], dtype=np.float32)
-    # for vec in history_vectors:
-    #     current_vector = (1 - gamma) * current_vector + gamma * vec
-        
+    papers = [p for p in papers if p.get('embedding_text')]
+    if not papers:
+        return []
+
+    embeddings = encode([p['embedding_text'] for p in papers], batch_size=64)
+    print(f"Encoded {len(papers)} papers: {embeddings.shape}")
+    rows = [
+        (p['title'], p['paper_body'], p.get('arxiv_link'), embedding.tolist(),
+         category_bits(p.get('categories')), p.get('published'), p.get('author_prestige'))
+        for p, embedding in zip(papers, embeddings)
+    ]
+    paper_ids = [p.get('paper_id') for p in papers]
+    updates = [i for i, paper_id in enumerate(paper_ids) if paper_id is not None]
 
     try:
-        finalv=(np.array(current)*0.8+np.array(new)).tolist()
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE users SET embedding = %s WHERE id = %s", (finalv, id)
-            )
-            conn.commit()
-        conn.close()
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                if updates:
+                    updated = execute_values(
+                        cur,
+                        """UPDATE papers SET title = data.title, html_string = data.html_string,
+                               arxiv_link = data.arxiv_link, embedding = data.embedding, categories = data.categories,
+                               published_at = data.published_at, author_prestige = data.author_prestige,
+                               embedding_updated_at = now()
+                           FROM (VALUES %s) AS data (id, title, html_string, arxiv_link, embedding, categories,
+                                                     published_at, author_prestige)
+                           WHERE papers.id = data.id RETURNING papers.id""",
+                        [(paper_ids[i],) + rows[i] for i in updates],
+                        template="(%s, %s, %s, %s, %s::vector, %s::integer[], %s::timestamptz, %s::real)",
+                        page_size=len(updates),
+                        fetch=True,
+                    )
+                    # A row deleted since it was ingested is inserted again.
+                    still_stored = {row[0] for row in updated}
+                    for i in updates:
+                        if paper_ids[i] not in still_stored:
+                            paper_ids[i] = None
+                inserts = [i for i, paper_id in enumerate(paper_ids) if paper_id is None]
+                if inserts:
+                    results = execute_values(
+                        cur,
+                        "INSERT INTO papers (title, html_string, arxiv_link, liked_count, embedding, categories, published_at, author_prestige) VALUES %s RETURNING id",
+                        [rows[i][:3] + (0,) + rows[i][3:] for i in inserts],
+                        page_size=len(inserts),
+                        fetch=True,
+                    )
+                    for i, row in zip(inserts, results):
+                        paper_ids[i] = row[0]
+    except Exception as e:
+        print(e)
+        return f"Error adding papers to DB: {e}"
+
+    local_index = get_local_index()
+    for paper_id, embedding in zip(paper_ids, embeddings):
+        invalidate_paper(paper_id)
+        if local_index is not None:
+            local_index.add(paper_id, embedding)
+    print(f"Successfully stored {len(paper_ids)} papers ({len(updates)} new versions of stored papers).")
+    return paper_ids
+
+def update_user(id, current, new, gamma: float = 0.8):
+    """
+    Folds one paper into a user's profile: `gamma * current + new`, scaled back to
+    unit length like every profile (see interaction_events.PROFILE_DECAY). The web app
+    records interactions through interaction_events instead; profile_recompute
+    rebuilds every profile from the full history.
+    """
+    try:
+        finalv = gamma * np.array(current, dtype=np.float32) + np.array(new, dtype=np.float32)
+        finalv = normalize_rows(finalv[None, :])[0].tolist()
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE users SET embedding = %s WHERE id = %s", (finalv, id)
+                )
     except Exception as e:
         print(e)
         return f"Error adding paper to DB: {e}"
     return finalv
 
 
-def recommend(user_embedding: list, category_preferences: list, top_n: int = 5):
+def recommend(user_embedding: list, category_preferences: list, top_n: int = 5, ef_search: int = None, probes: int = None):
     """
-    Recommends papers by finding the nearest neighbors in the vector DB.
+    Recommends papers by finding the nearest neighbors in the vector DB, re-ranking
+    the nearest RERANK_CANDIDATES of them (see reranker.rerank_rows) and keeping the top `top_n`.
+    `ef_search` / `probes` tune the ANN index for this query (see schema.apply_search_settings).
     """
     try:
         user_vec = np.array(user_embedding)
     except:
         return "ERRORROROR"
-    try:
-        conn = get_db_connection()
-        register_vector(conn) # Register the vector type handler
-        with conn.cursor() as cur:
-            # Query for the closest papers using cosine distance (<=>)
-            # This is the core pgvector operation.
-            cur.execute(
-                "SELECT id FROM papers ORDER BY embedding <=> %s LIMIT %s",
-                (user_vec, top_n)
-            )
-            results = cur.fetchall()
-        conn.close()
-        
-        # TODO: Add re-ranking based on category_preferences
-        # For example, you could fetch more results (e.g., 50) and then
-        # re-rank them based on how well their categories match the user's preferences.
-        
-        recommended_titles = [row[0] for row in results]
-        return recommended_titles
-    except Exception as e:
-        return f"Error during recommendation: {e}"
+    pool_size = max(RERANK_CANDIDATES, top_n)
+    local_index = get_local_index()
+    if local_index is not None:
+        candidates = _local_candidates(local_index, user_vec, pool_size)
+    else:
+        try:
+            with timed_stage("candidates"):
+                with get_db_connection() as conn:
+                    with conn.cursor() as cur:
+                        _apply_candidate_settings(cur, pool_size, ef_search, probes)
+                        # Query for the closest papers using cosine distance (<=>)
+                        # This is the core pgvector operation.
+                        cur.execute(
+                            f"SELECT id, embedding <=> %s AS distance, {FEATURE_COLUMNS} FROM papers "
+                            "ORDER BY embedding <=> %s LIMIT %s",
+                            (user_vec, user_vec, pool_size)
+                        )
+                        candidates = _nearest_first(cur.fetchall(), 1)
+        except Exception as e:
+            return f"Error during recommendation: {e}"
+    return [row[0] for row in rerank_rows(candidates, category_preferences)[:top_n]]
 def recommend_random(user_embedding: list, category_preferences: list, top_n: int = 10):
     """
-    Recommends papers by finding the nearest neighbors in the vector DB.
+    Recommends papers from a random sample of RERANK_CANDIDATES papers, keeping the
+    `top_n` that score best against the user's embedding and category preferences.
     """
     try:
-        user_vec = np.array(user_embedding)
-    except:
-        pass
+        user_vec = np.array(user_embedding, dtype=np.float32) if user_embedding is not None else None
+    except Exception:
+        user_vec = None
     try:
-        conn = get_db_connection()
-        register_vector(conn) # Register the vector type handler
-        print('safe')
-        with conn.cursor() as cur:
-            # Query for the closest papers using cosine distance (<=>)
-            # This is the core pgvector operation.
-            cur.execute(
-                "SELECT id FROM papers ORDER BY RANDOM() LIMIT %s",
-                (top_n,)
-            )
-            print('safe')
-            results = cur.fetchall()
-            print(results)
-        conn.close()
-        
-        # TODO: Add re-ranking based on category_preferences
-        # For example, you could fetch more results (e.g., 50) and then
-        # re-rank them based on how well their categories match the user's preferences.
-        
-        recommended_titles = [row[0] for row in results]
-        return recommended_titles
+        with timed_stage("candidates"):
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    # Without a user embedding the distance is NULL and only the other features count.
+                    cur.execute(
+                        f"SELECT id, embedding <=> %s::vector AS distance, {FEATURE_COLUMNS} FROM papers "
+                        "ORDER BY RANDOM() LIMIT %s",
+                        (user_vec, max(RERANK_CANDIDATES, top_n))
+                    )
+                    candidates = cur.fetchall()
+        return [row[0] for row in rerank_rows(candidates, category_preferences)[:top_n]]
     except Exception as e:
         print(e)
         return f"Error during recommendation: {e}"
-def recommend_page(user_embedding: list, category_preferences: list, start_index: int, end_index: int):
+def recommend_page(user_embedding: list, category_preferences: list, start_index: int, end_index: int, fields: list = None,
+                   ef_search: int = None, probes: int = None):
     """
     Recommends papers by finding the nearest neighbors in the vector DB,
     supporting pagination with a start and end index.
+
+    Candidates are re-ranked in consecutive blocks of RERANK_CANDIDATES nearest
+    neighbours, so every page is cut from the same re-ranked order.
     
     Args:
         user_embedding: The vector embedding of the user's preferences.
-        category_preferences: A list of preferred categories for future re-ranking.
+        category_preferences: Preferred categories, used to re-rank candidates (see reranker.preference_vector).
         start_index: The starting index (offset) of the papers to retrieve.
         end_index: The ending index of the papers to retrieve.
+        fields: Optional names from PAPER_FIELDS. When given, the page is hydrated
+            in the same query and a list of dicts is returned instead of IDs.
+        ef_search: Optional HNSW search breadth for this query.
+        probes: Optional number of IVFFlat lists to scan for this query.
         
     Returns:
-        A list of recommended paper IDs or a dictionary with an error message.
+        A list of recommended paper IDs (or paper dicts when `fields` is given),
+        or a dictionary with an error message.
     """
     # 1. Validate inputs and calculate pagination
     if not isinstance(start_index, int) or not isinstance(end_index, int) or start_index < 0 or end_index <= start_index:
         print('cringecringe')
-        return {"error": "Invalid start or end index provided."}
+        return {"error": "Invalid start or end index provided.", "kind": "invalid_request"}
         
     limit = end_index - start_index
     offset = start_index
@@ -402,26 +498,258 @@ def recommend_page(user_embedding: list, category_preferences: list, start_index
         print('oops')
         return {"error": "Invalid user embedding format."}
 
+    local_index = get_local_index()
+    if local_index is not None:
+        return _local_page(local_index, user_vec, limit, offset=offset, fields=fields,
+                           category_preferences=category_preferences)[0]
+    return _nearest_page("%s", (user_vec,), limit, offset, fields, ef_search, probes, category_preferences)
+
+
+def recommend_page_for_user(user_id, category_preferences: list, start_index: int, end_index: int, fields: list = None,
+                            ef_search: int = None, probes: int = None):
+    """
+    Same as recommend_page, but looks the user's embedding up inside the query
+    (a subselect on users.embedding) so the vector never round-trips through Python.
+
+    Args:
+        user_id: The ID of the user to recommend papers for.
+        category_preferences: Preferred categories, used to re-rank candidates (see reranker.preference_vector).
+        start_index: The starting index (offset) of the papers to retrieve.
+        end_index: The ending index of the papers to retrieve.
+        fields: Optional names from PAPER_FIELDS to hydrate in the same query.
+        ef_search: Optional HNSW search breadth for this query.
+        probes: Optional number of IVFFlat lists to scan for this query.
+
+    Returns:
+        A list of recommended paper IDs (or paper dicts when `fields` is given),
+        or a dictionary with an error message and its "kind" ('invalid_request',
+        'unknown_user' or 'database').
+    """
+    if not isinstance(start_index, int) or not isinstance(end_index, int) or start_index < 0 or end_index <= start_index:
+        return {"error": "Invalid start or end index provided.", "kind": "invalid_request"}
+    local_index = get_local_index()
+    if local_index is not None:
+        user_vec = get_user_vector(user_id)
+        if user_vec is None:
+            return {"error": f"No embedding found for user {user_id}", "kind": "unknown_user"}
+        return _local_page(local_index, user_vec, end_index - start_index, offset=start_index, fields=fields,
+                           category_preferences=category_preferences)[0]
+    return _nearest_page("(SELECT embedding FROM users WHERE id = %s)", (user_id,),
+                         end_index - start_index, start_index, fields, ef_search, probes, category_preferences)
+
+
+def encode_feed_cursor(distance: float, paper_ids: list) -> str:
+    """
+    Encodes the position after a feed page as an opaque cursor string: the distance of
+    the farthest paper returned and the ids of every paper returned at that distance.
+    """
+    raw = json.dumps({"d": distance, "i": list(paper_ids)}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_feed_cursor(cursor: str):
+    """
+    Decodes a cursor produced by encode_feed_cursor.
+
+    Returns:
+        A (distance, ids) tuple. Raises ValueError if the cursor is malformed.
+    """
     try:
-        conn = get_db_connection()
-        register_vector(conn)
-        with conn.cursor() as cur:
-            # 2. Update the SQL query to include OFFSET for pagination
-            sql_query = "SELECT id FROM papers ORDER BY embedding <=> %s LIMIT %s OFFSET %s"
-            
-            # 3. Pass the new limit and offset parameters to the query
-            query_params = (user_vec, limit, offset)
-            
-            cur.execute(sql_query, query_params)
-            results = cur.fetchall()
-        conn.close()
-        
-        # The re-ranking logic based on category_preferences would go here
-        
-        recommended_ids = [row[0] for row in results]
-        print(recommended_ids)
-        return recommended_ids
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        ids = data["i"] if isinstance(data["i"], list) else [data["i"]]
+        return float(data["d"]), [int(paper_id) for paper_id in ids]
+    except Exception as e:
+        raise ValueError(f"Invalid feed cursor: {e}")
+
+
+def next_feed_position(hits: list, after: tuple = None):
+    """
+    The (distance, ids) keyset position after a page of (paper_id, distance) hits in
+    distance order: the last distance, plus every id already returned at it.
+    """
+    distance = hits[-1][1]
+    seen = [paper_id for paper_id, hit_distance in hits if hit_distance == distance]
+    if after is not None and after[0] == distance:
+        seen = list(after[1]) + seen
+    return distance, seen
+
+
+def _feed_query(select_list: str, user_id, batch_size: int, after: tuple = None):
+    """
+    The (sql, params) of one keyset feed page. It orders by distance alone so the ANN
+    index can serve it; ties at the cursor distance are told apart by the ids it carries.
+    """
+    query_vec_sql = "(SELECT embedding FROM users WHERE id = %s)"
+    sql_query = f"SELECT {select_list}, embedding <=> {query_vec_sql} AS distance, {FEATURE_COLUMNS} FROM papers"
+    query_params = [user_id]
+    if after is not None:
+        sql_query += f" WHERE embedding <=> {query_vec_sql} >= %s AND NOT (id = ANY(%s))"
+        query_params += [user_id, after[0], list(after[1])]
+    sql_query += f" ORDER BY embedding <=> {query_vec_sql} LIMIT %s"
+    query_params += [user_id, batch_size]
+    return sql_query, query_params
+
+
+def recommend_feed_after(user_id, category_preferences: list, batch_size: int, cursor: str = None, fields: list = None,
+                         ef_search: int = None, probes: int = None):
+    """
+    Cursor-based (keyset) variant of recommend_page_for_user.
+
+    Papers are ordered by cosine distance to the user's embedding. Instead of an
+    OFFSET, each page resumes at the distance of the last paper of the previous page,
+    skipping the papers already returned at that distance, so deep pages cost the same
+    as the first one and papers inserted between requests can't shift or duplicate results.
+    With an HNSW index, pages past the first ef_search candidates need
+    schema.HNSW_ITERATIVE_SCAN.
+
+    Each page is re-ranked on its own: the cursor must stay the farthest paper
+    returned, so there is no over-fetching beyond the page.
+
+    Args:
+        user_id: The ID of the user to recommend papers for.
+        category_preferences: Preferred categories, used to re-rank each page (see reranker.preference_vector).
+        batch_size: The number of papers to return.
+        cursor: The `next_cursor` returned with the previous page, or None for the first page.
+        fields: Optional names from PAPER_FIELDS to hydrate in the same query.
+        ef_search: Optional HNSW search breadth for this query.
+        probes: Optional number of IVFFlat lists to scan for this query.
+
+    Returns:
+        A (results, next_cursor) tuple, where results is a list of paper IDs (or paper
+        dicts when `fields` is given) and next_cursor is None once the feed is exhausted.
+        On failure, a dictionary with an error message and its "kind" ('invalid_request',
+        'invalid_cursor', 'unknown_user' or 'database') is returned instead.
+    """
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        return {"error": "Invalid batch size provided.", "kind": "invalid_request"}
+    try:
+        after = decode_feed_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return {"error": str(e), "kind": "invalid_cursor"}
+
+    local_index = get_local_index()
+    if local_index is not None:
+        user_vec = get_user_vector(user_id)
+        if user_vec is None:
+            return {"error": f"No embedding found for user {user_id}", "kind": "unknown_user"}
+        results, last = _local_page(local_index, user_vec, batch_size, after=after, fields=fields,
+                                    category_preferences=category_preferences)
+        if isinstance(results, dict):
+            return results
+        next_cursor = encode_feed_cursor(*last) if last and len(results) == batch_size else None
+        return results, next_cursor
+
+    try:
+        select_list, columns = _paper_select_list(fields or ["id"])
+        sql_query, query_params = _feed_query(select_list, user_id, batch_size, after)
+        with timed_stage("candidates"):
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    # Approximate iterative scans may return rows out of order, which would skip papers here.
+                    apply_search_settings(cur, ef_search, probes, strict_order=True)
+                    cur.execute(sql_query, query_params)
+                    results = _nearest_first(cur.fetchall(), len(columns))
+    except Exception as e:
+        return {"error": f"Error during recommendation: {e}", "kind": "database"}
+
+    next_cursor = None
+    if len(results) == batch_size:
+        hits = [(row[0], row[len(columns)]) for row in results]
+        next_cursor = encode_feed_cursor(*next_feed_position(hits, after))
+    results = rerank_rows(results, category_preferences, RERANK_CANDIDATES)
+    if fields:
+        return [dict(zip(columns, row)) for row in results], next_cursor
+    return [row[0] for row in results], next_cursor
+
+
+def _nearest_first(rows: list, distance_column: int) -> list:
+    """
+    Candidate rows in (distance, id) order, the order LocalVectorIndex.search uses.
+    pgvector can only order by distance, so ties come back in index order otherwise.
+    """
+    return sorted(rows, key=lambda row: (row[distance_column], row[0]))
+
+
+def _apply_candidate_settings(cur, candidates: int, ef_search: int = None, probes: int = None):
+    """apply_search_settings, with the HNSW search breadth raised to cover `candidates` rows."""
+    # An HNSW scan returns at most ef_search rows (1000 at most), whatever the LIMIT.
+    apply_search_settings(cur, min(HNSW_MAX_EF_SEARCH, max(ef_search or HNSW_EF_SEARCH, candidates)), probes)
+
+
+def _rerank_window(offset: int, limit: int):
+    """(start, rows) of the RERANK_CANDIDATES-sized blocks that cover an offset page."""
+    start = offset // RERANK_CANDIDATES * RERANK_CANDIDATES
+    end = -(-(offset + limit) // RERANK_CANDIDATES) * RERANK_CANDIDATES
+    return start, end - start
+
+
+def _local_candidates(local_index, user_vec, limit: int, offset: int = 0, after: tuple = None):
+    """Nearest papers from the in-process index as (id, distance, *features) rows, like the pgvector queries."""
+    with timed_stage("candidates"):
+        hits = local_index.search(user_vec, limit, offset=offset, after=after)
+    with timed_stage("features"):
+        features = paper_features([paper_id for paper_id, _ in hits])
+    return [(paper_id, distance) + tuple(features.get(paper_id, (None, None, None))) for paper_id, distance in hits]
+
+
+def _local_page(local_index, user_vec, limit: int, offset: int = 0, after: tuple = None, fields: list = None,
+                category_preferences: list = None):
+    """
+    Serves a recommendation page from the in-process vector index instead of pgvector.
+
+    Returns:
+        (results, last) where results matches what _nearest_page returns and last is
+        the keyset position after the candidates fetched (see next_feed_position), or
+        None if there were none.
+    """
+    if after is None:
+        block_start, block_rows = _rerank_window(offset, limit)
+        candidates = _local_candidates(local_index, user_vec, block_rows, offset=block_start)
+        page = rerank_rows(candidates, category_preferences, RERANK_CANDIDATES)[offset - block_start:][:limit]
+    else:
+        candidates = _local_candidates(local_index, user_vec, limit, after=after)
+        page = rerank_rows(candidates, category_preferences, RERANK_CANDIDATES)
+    # Candidates come in distance order, so the cursor follows the last one wherever re-ranking put it.
+    last = next_feed_position([row[:2] for row in candidates], after) if candidates else None
+    ids = [row[0] for row in page]
+    if fields:
+        papers = get_papers(ids, fields)
+        if papers is None:
+            return {"error": "Error hydrating recommended papers.", "kind": "database"}, None
+        return papers, last
+    return ids, last
+
+
+def _nearest_page(query_vec_sql: str, query_vec_params: tuple, limit: int, offset: int, fields: list = None,
+                  ef_search: int = None, probes: int = None, category_preferences: list = None):
+    """
+    Runs the paginated nearest-neighbour query shared by the recommend_page variants.
+    `query_vec_sql` is the SQL expression that yields the query vector.
+
+    The RERANK_CANDIDATES-sized blocks covering the page are fetched in (distance, id)
+    order like the local index returns them, re-ranked block by block, and the page
+    is cut out of them.
+    """
+    try:
+        select_list, columns = _paper_select_list(fields or ["id"])
+        block_start, block_rows = _rerank_window(offset, limit)
+        with timed_stage("candidates"):
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    sql_query = (f"SELECT {select_list}, embedding <=> {query_vec_sql} AS distance, {FEATURE_COLUMNS} "
+                                 f"FROM papers ORDER BY embedding <=> {query_vec_sql} LIMIT %s OFFSET %s")
+                    query_params = query_vec_params * 2 + (block_rows, block_start)
+
+                    _apply_candidate_settings(cur, block_start + block_rows, ef_search, probes)
+                    cur.execute(sql_query, query_params)
+                    results = _nearest_first(cur.fetchall(), len(columns))
+
+        page = rerank_rows(results, category_preferences, RERANK_CANDIDATES)[offset - block_start:][:limit]
+        if fields:
+            # zip stops at the requested columns, dropping the distance and features.
+            return [dict(zip(columns, row)) for row in page]
+        return [row[0] for row in page]
         
     except Exception as e:
         # Return a structured error for easier handling on the frontend
-        return {"error": f"Error during recommendation: {e}"}
+        return {"error": f"Error during recommendation: {e}", "kind": "database"}
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from pgvector.psycopg2 import register_vector
+
+# --- Configuration ---
+# All of these can be overridden through the environment so that gunicorn
+# workers and the ingestion jobs can be sized independently.
+DB_HOST = os.environ.get("DB_HOST", "paper-database.c5wk0s4e80wd.us-east-2.rds.amazonaws.com")
+DB_PORT = os.environ.get("DB_PORT", "5432")
+DB_NAME = os.environ.get("DB_NAME", "postgres")
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+# Seconds a caller waits for a free connection before giving up.
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get("DB_POOL_CHECKOUT_TIMEOUT", "10"))
+# Connections idle for longer than this are closed instead of reused.
+POOL_IDLE_TIMEOUT = float(os.environ.get("DB_POOL_IDLE_TIMEOUT", "300"))
+# Connections idle for longer than this are pinged with `SELECT 1` before reuse.
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of psycopg2 connections.
+
+    Every connection has pgvector's type adapter registered exactly once, when it
+    is opened. Idle connections are health-checked before reuse and evicted once
+    they have been idle longer than `idle_timeout`.
+    """
+
+    def __init__(self, connect_kwargs: dict, max_size: int = POOL_MAX_SIZE,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT,
+                 health_check_after: float = POOL_HEALTH_CHECK_AFTER,
+                 checkout_timeout: float = POOL_CHECKOUT_TIMEOUT):
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        # Stack of (connection, last_used_monotonic); most recently used on top.
+        self._idle = []
+        self._lock = threading.Lock()
+        # Bounds the number of connections checked out at once. A slot is taken in
+        # getconn and given back in putconn; idle connections don't hold one.
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._pid = os.getpid()
+        self.stats = {"opened": 0, "reused": 0, "evicted": 0, "failed_health_checks": 0}
+
+    def _open(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        register_vector(conn)
+        # register_vector runs a catalog query; don't leave a transaction open.
+        conn.commit()
+        self._count("opened")
+        return conn
+
+    def _count(self, stat: str):
+        # Checkouts run on many threads at once; `+=` on a dict entry is not atomic.
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _check_fork(self):
+        # Connections must never be shared across a fork (e.g. gunicorn preload).
+        if os.getpid() != self._pid:
+            with self._lock:
+                self._idle = []
+                self._slots = threading.BoundedSemaphore(self.max_size)
+                self._pid = os.getpid()
+
+    def evict_idle(self):
+        """Closes every idle connection that has exceeded the idle timeout."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            keep = []
+            for conn, last_used in self._idle:
+                if now - last_used > self.idle_timeout:
+                    expired.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+        # Idle connections hold no slot (putconn released it), so closing them frees nothing.
+        for conn in expired:
+            self._close_quietly(conn)
+            self._count("evicted")
+
+    def getconn(self):
+        """
+        Checks a connection out of the pool, opening a new one if needed.
+
+        Returns:
+            A live psycopg2 connection with no open transaction.
+        """
+        self._check_fork()
+        self.evict_idle()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolExhaustedError(f"No database connection available after {self.checkout_timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._open()
+                conn, last_used = entry
+                if time.monotonic() - last_used < self.health_check_after and not conn.closed:
+                    self._count("reused")
+                    return conn
+                if self._is_healthy(conn):
+                    self._count("reused")
+                    return conn
+                self._count("failed_health_checks")
+                self._close_quietly(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, discard: bool = False):
+        """
+        Returns a connection to the pool. Broken or discarded connections are closed.
+        """
+        if os.getpid() != self._pid:
+            self._close_quietly(conn)
+            return
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection that is still inside a transaction.
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or conn.closed:
+            self._close_quietly(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    def closeall(self):
+        """Closes every idle connection. Checked-out connections are closed on return."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection, commits on success,
+        rolls back on error and always returns the connection to the pool.
+        """
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception as e:
+            # A dropped connection can't be trusted again, even if rollback works.
+            if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                discard = True
+            elif not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool({
+                    "dbname": DB_NAME,
+                    "user": os.environ["DB_USERNAME"],
+                    "password": os.environ["DB_PASSWORD"],
+                    "host": DB_HOST,
+                    "port": DB_PORT,
+                })
+    return _pool
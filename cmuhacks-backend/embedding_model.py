@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# --- Configuration ---
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+# When set (e.g. "http://127.0.0.1:5050"), texts are encoded by the shared
+# embedding_server.py process instead of loading the model in this one.
+EMBEDDING_SERVICE_URL = os.environ.get("EMBEDDING_SERVICE_URL")
+EMBEDDING_SERVICE_TIMEOUT = float(os.environ.get("EMBEDDING_SERVICE_TIMEOUT", "60"))
+
+_model = None
+_model_lock = threading.Lock()
+# Seconds spent importing sentence_transformers and loading the weights, once loaded.
+cold_start_seconds = None
+
+
+def get_model():
+    """
+    Returns the SentenceTransformer model, loading it on first use.
+    Loading happens once per process, even if several threads ask at the same time.
+    """
+    global _model, cold_start_seconds
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                start = time.perf_counter()
+                # Imported here so processes that never encode don't pay for torch.
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME)
+                cold_start_seconds = time.perf_counter() - start
+                print(f"Model loaded in {cold_start_seconds:.2f}s.")
+    return _model
+
+
+def _encode_remote(texts: list) -> np.ndarray:
+    import requests
+    response = requests.post(f"{EMBEDDING_SERVICE_URL}/encode", json={"texts": texts},
+                             timeout=EMBEDDING_SERVICE_TIMEOUT)
+    response.raise_for_status()
+    return np.asarray(response.json()["embeddings"], dtype=np.float32)
+
+
+def encode(texts, batch_size: int = 64) -> np.ndarray:
+    """
+    Embeds one string (returns a 1-d array) or a list of strings (returns a 2-d array).
+
+    Uses the shared embedding service when EMBEDDING_SERVICE_URL is set, otherwise
+    the lazily loaded in-process model.
+    """
+    single = isinstance(texts, str)
+    batch = [texts] if single else list(texts)
+    if EMBEDDING_SERVICE_URL:
+        embeddings = _encode_remote(batch)
+    else:
+        embeddings = get_model().encode(batch, batch_size=batch_size)
+    return embeddings[0] if single else embeddings
+
+
+def embedding_stats() -> dict:
+    """Reports where embeddings are computed and what the model cold start cost."""
+    return {
+        "backend": "service" if EMBEDDING_SERVICE_URL else "local",
+        "service_url": EMBEDDING_SERVICE_URL,
+        "model": MODEL_NAME,
+        "loaded": _model is not None,
+        "cold_start_seconds": cold_start_seconds,
+    }
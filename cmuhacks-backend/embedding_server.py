@@ -0,0 +1,38 @@
+# A single embedding worker shared by every Flask worker.
+#
+# Run it once per host with `python embedding_server.py` and point the web and
+# ingestion processes at it with EMBEDDING_SERVICE_URL=http://127.0.0.1:5050,
+# so the ~100MB model is loaded once instead of once per gunicorn worker.
+import os
+
+from flask import Flask, request, jsonify
+
+import embedding_model
+
+app = Flask(__name__)
+
+
+@app.route('/encode', methods=['POST'])
+def encode_endpoint():
+    """
+    Expects JSON: {"texts": ["first text", "second text", ...]}
+    Returns: {"embeddings": [[0.01, ...], ...]}
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('texts'), list):
+        return jsonify({"error": "Request body must contain a list of 'texts'"}), 400
+    embeddings = embedding_model.get_model().encode(data['texts'], batch_size=64)
+    return jsonify({"embeddings": embeddings.tolist()})
+
+
+@app.route('/health')
+def health():
+    return jsonify(embedding_model.embedding_stats())
+
+
+if __name__ == '__main__':
+    # Always encode in-process here, even if the environment points at a service.
+    embedding_model.EMBEDDING_SERVICE_URL = None
+    embedding_model.get_model()
+    print(f"Embedding worker ready (cold start {embedding_model.cold_start_seconds:.2f}s).")
+    app.run(host='127.0.0.1', port=int(os.environ.get("EMBEDDING_SERVICE_PORT", "5050")), threaded=True)
@@ -1,23 +1,25 @@
-from flask import Flask, request, jsonify, redirect, url_for, render_template, session, flash
+from flask import Flask, Response, request, jsonify, redirect, url_for, render_template, session, flash, g, stream_with_context
+import json
 import numpy as np
-import requests
 import os
-from ai_summarizer import define_unclear_terms
-from database_handler import recommend_random, get_article_vector, get_db_connection, get_user_vector, add_user_to_db, add_paper, get_paper_body, recommend, update_user, get_paper_title, recommend_page, get_early_paper_summary, get_complete_paper_summary
+import time
+from database_handler import recommend_random, get_article_vector, get_db_connection, get_user_vector, add_user_to_db, add_paper, get_paper_body, recommend, get_paper_title, recommend_page, recommend_page_for_user, recommend_feed_after, get_early_paper_summary, get_complete_paper_summary, get_papers, FEED_FIELDS, PAPER_FIELDS, get_paper_cache_stats, HNSW_MAX_EF_SEARCH, IVFFLAT_MAX_PROBES
 import psycopg2
-from flask_apscheduler import APScheduler
-from daily_update_papers import get_recent_top
+from embedding_model import embedding_stats
+from interaction_events import record_event, queue_stats
+from reranker import rerank_stats
+from schema import ensure_schema_on_startup
 # from psycopg.rows import dict_row
 from flask_cors import CORS
 from passlib.context import CryptContext
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 class Config:
-    SCHEDULER_API_ENABLED = True
     SECRET_KEY = 'dev'
 app = Flask(__name__)
 CORS(app)
-scheduler = APScheduler()
 app.config.from_object(Config())
+# Recommendation queries read columns added by later migrations.
+ensure_schema_on_startup()
 # --- CONFIGURATION ---
 # IMPORTANT: Set this environment variable to your Hugging Face Space's URL.
 # For example: "https://your-username-your-space-name.hf.space"
@@ -37,11 +39,45 @@ def log_message(message):
     # 'a' opens the file in append mode
     with open('logs.txt', 'a') as log_file:
         log_file.write(f"{message}\n")
+def request_user_vector(user_id):
+    """
+    Returns a user's embedding, loading it from the database at most once per request.
+    """
+    cache = g.setdefault('user_vectors', {})
+    if user_id not in cache:
+        cache[user_id] = get_user_vector(user_id)
+    return cache[user_id]
+def request_article_vector(article_id):
+    """
+    Returns an article's embedding, loading it from the database at most once per request.
+    """
+    cache = g.setdefault('article_vectors', {})
+    if article_id not in cache:
+        cache[article_id] = get_article_vector(article_id)
+    return cache[article_id]
+# HTTP status for each "kind" of error the feed functions return; anything else is a 500.
+FEED_ERROR_STATUS = {"invalid_request": 400, "invalid_cursor": 400, "unknown_user": 404}
+def request_search_settings(data):
+    """
+    Reads the optional ANN tuning knobs of a feed request, clamped to what pgvector accepts.
+
+    Returns:
+        An (ef_search, probes) tuple, None for a knob that wasn't sent.
+        Raises ValueError if a knob is not a positive integer.
+    """
+    settings = []
+    for name, maximum in (("ef_search", HNSW_MAX_EF_SEARCH), ("probes", IVFFLAT_MAX_PROBES)):
+        value = data.get(name)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+            raise ValueError(f"'{name}' must be a positive integer")
+        settings.append(None if value is None else min(value, maximum))
+    return tuple(settings)
 # Helper function to call the Gradio API
 def call_gradio_api(endpoint: str, payload: dict):
     """
     Calls a specific endpoint on the Gradio API and returns the JSON response.
     """
+    import requests
     api_url = f"{HF_SPACE_URL}/run/{endpoint}"
     try:
         response = requests.post(api_url, json=payload)
@@ -51,13 +87,6 @@ def call_gradio_api(endpoint: str, payload: dict):
     except requests.exceptions.RequestException as e:
         print(f"Failed to call Gradio API: {e}")
         return {"error": f"Failed to call Gradio API: {e}"}, 500
-@scheduler.task('interval', id='my_job', seconds=30)
-def my_job():
-    log_message("attempting to run scheduled task")
-    papers, titles, summaries=get_recent_top('cs.AI')
-    for i in range(papers):
-        add_paper_raw(papers[i], titles[i], '<p>'+summaries[i]+'</p>')
-    log_message('This job is executed every 10 seconds.')
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -150,8 +179,62 @@ def prompt_about_text():
     data=request.get_json()
     if('text' not in data):
         return 'ts bad error'
-    ai_explanation=define_unclear_terms(data['text'])
+    # Stored definitions (and the paper's glossary) are tried first; Gemini is only
+    # loaded and called on a miss.
+    from glossary import define_term
+    from llm_retry import LLMUnavailableError, LLM_INTERACTIVE_MAX_ATTEMPTS
+    try:
+        ai_explanation=define_term(data['text'], data.get('paper_id'), max_attempts=LLM_INTERACTIVE_MAX_ATTEMPTS)
+    except LLMUnavailableError as e:
+        print(e)
+        return jsonify({'error': 'The explanation service is temporarily unavailable. Please try again shortly.'}), 503
     return jsonify({'explanation': ai_explanation})
+def sse_event(event: str, payload: dict) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+@app.route('/prompt_about_text/stream', methods=['POST'])
+def prompt_about_text_stream():
+    """
+    Streaming variant of /prompt_about_text, as server-sent events:
+      event: token  data: {"text": ...}        (repeated as Gemini produces the definition)
+      event: done   data: {"source": "storage"|"llm", "ttft_ms": ..., "total_ms": ...}
+      event: error  data: {"error": ...}
+    A stored definition arrives as a single token event.
+    """
+    data=request.get_json()
+    if not data or 'text' not in data:
+        return jsonify({'error': 'Missing text'}), 400
+    from glossary import define_term_stream, record_time_to_first_token
+    from llm_retry import LLMUnavailableError, LLM_INTERACTIVE_MAX_ATTEMPTS
+    text, paper_id = data['text'], data.get('paper_id')
+
+    def events():
+        start=time.perf_counter()
+        ttft=None
+        source=None
+        try:
+            for source, piece in define_term_stream(text, paper_id, max_attempts=LLM_INTERACTIVE_MAX_ATTEMPTS):
+                if not piece:
+                    continue
+                if ttft is None:
+                    ttft=time.perf_counter()-start
+                    record_time_to_first_token(source, ttft)
+                yield sse_event('token', {'text': piece})
+        except LLMUnavailableError as e:
+            print(e)
+            yield sse_event('error', {'error': 'The explanation service is temporarily unavailable. Please try again shortly.'})
+            return
+        except Exception as e:
+            print(f"Streaming definition failed: {e}")
+            yield sse_event('error', {'error': 'Sorry, an error occurred while generating the definition.'})
+            return
+        total=time.perf_counter()-start
+        print(f"Definition streamed from {source}: first token after {1000*(ttft or total):.0f}ms, done after {1000*total:.0f}ms.")
+        yield sse_event('done', {'source': source, 'ttft_ms': round(1000*(ttft or total)), 'total_ms': round(1000*total)})
+
+    # X-Accel-Buffering stops nginx from holding the stream back until it completes.
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 @app.route('/login_new', methods=['GET', 'POST'])
 def login_new():
     if request.method == 'POST':
@@ -223,20 +306,49 @@ def logout():
     session.pop('username', None)
 #    flash('You have been logged out.')
     return redirect(url_for('index'))
-@app.route('/wow')
-def my_job2():
-    log_message("attempting to run scheduled task")
-    papers, titles, summaries=get_recent_top('cs.AI')
-    papers=list(papers)
-    for i in range(len(papers)):
-        print(i)
-        add_paper_raw(papers[i],  titles[i], '<p>'+summaries[i]+'</p>')
-    return "success" 
-    log_message('This job is executed every 10 seconds.')
 @app.route('/')
 def index():
     print("AJH")
     return "Flask client for Hugging Face Recommender is running!"
+@app.route('/metrics/paper_cache')
+def paper_cache_metrics():
+    """
+    Reports hit/miss counters and occupancy of this worker's paper cache.
+    """
+    return jsonify(get_paper_cache_stats())
+@app.route('/metrics/embeddings')
+def embedding_metrics():
+    """
+    Reports whether this worker has loaded the embedding model and how long the cold start took.
+    """
+    return jsonify(embedding_stats())
+@app.route('/metrics/llm_cache')
+def llm_cache_metrics():
+    """
+    Reports hit/miss counters of the LLM response cache in this worker.
+    """
+    # Imported here so the web process only loads langchain when it is needed.
+    from llm_cache import llm_cache_stats
+    return jsonify(llm_cache_stats())
+@app.route('/metrics/definitions')
+def definition_metrics():
+    """
+    Reports how this worker answered highlight requests: stored definition, paper glossary or live LLM call.
+    """
+    from glossary import definition_stats
+    return jsonify(definition_stats())
+@app.route('/metrics/interaction_events')
+def interaction_event_metrics():
+    """
+    Reports the backlog of interaction events waiting to be folded into user profiles.
+    """
+    return jsonify(queue_stats())
+@app.route('/metrics/recommendations')
+def recommendation_metrics():
+    """
+    Reports the latency of each recommendation stage in this worker (candidate fetch, feature lookup, re-ranking).
+    """
+    return jsonify(rerank_stats())
 @app.route('/get_paper_body', methods=['POST'])
 def get_paper_body_():
     data=request.get_json()
@@ -319,26 +431,23 @@ def add_paper_raw(title, title_real, paper_body):
 @app.route('/update_user_profile', methods=['POST'])
 def update_user_endpoint():
     """
-    Endpoint to update a user's profile vector.
+    Records that a user read (or liked) a paper.
     Expects JSON: {
-        "history": [[[0.1, ...], 1], [[0.2, ...], 0]],
-        "gamma": 0.8
+        "user": 1,
+        "article": 42,
+        "action": "read" | "like"   (optional, defaults to "read")
     }
+    The event is only appended to the interaction log; the user's profile vector is
+    updated shortly after by the interaction_events.py consumer.
     """
     data = request.get_json()
     if not data or "user" not in data or 'article' not in data:
         return jsonify({"error": "Missing data in request body"}), 400
-    
-    # Gamma is optional, defaults to 0.8 on the Gradio side
-    gamma = data.get("gamma", 0.8)
-    
-    payload = {"data": [get_user_vector(data['user']), get_article_vector(data['article']), gamma]}
-    result = update_user(data['user'], get_user_vector(data['user']), get_article_vector(data['article']), gamma)
-
-    if "data" in result:
-        return jsonify({"user_vector": result})
-    else:
-        return jsonify(result)
+    try:
+        record_event(data['user'], data['article'], data.get('action', 'read'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "queued"}), 202
 @app.route('/get_random', methods=['POST'])
 def get_random_endpoint():
     """
@@ -354,7 +463,7 @@ def get_random_endpoint():
         
     payload = {"data": [data]} # The API wrapper expects the whole dict
 
-    result = recommend_random(get_user_vector(data['id']), [])
+    result = recommend_random(request_user_vector(data['id']), data.get('categories', []))
     print(result)
     return jsonify({"recommendations": result})
 
@@ -373,7 +482,7 @@ def get_recommendations_endpoint():
         
     payload = {"data": [data]} # The API wrapper expects the whole dict
 
-    result = recommend(get_user_vector(data['id']), [])
+    result = recommend(request_user_vector(data['id']), data.get('categories', []))
     return jsonify({"recommendations": result})
     if "data" in result:
         print({"recommendations": result})
@@ -391,19 +500,73 @@ def get_recommendations_page_endpoint():
     """
     data = request.get_json()
     print(data)
-    print(data['id'])
-    print(get_user_vector(data['id']))
     if not data or "id" not in data or 'page' not in data or 'batch_size' not in data:
         return jsonify({"error": "Request body must contain 'embedding' and 'categories'"}), 400
         
     payload = {"data": [data]} # The API wrapper expects the whole dict
     print(data['id'])
-    print(get_user_vector(data['id']))
-    result = recommend_page(get_user_vector(data['id']), [], data['page']*data['batch_size'], data['page']*data['batch_size']+data['batch_size'])
+    # The user's embedding is looked up inside the SQL query, not fetched here.
+    result = recommend_page_for_user(data['id'], data.get('categories', []), data['page']*data['batch_size'], data['page']*data['batch_size']+data['batch_size'])
     return jsonify({"recommendations": result})
+@app.route('/get_feed', methods=['POST'])
+def get_feed_endpoint():
+    """
+    Endpoint to get a fully hydrated page of the feed in one round trip.
+    Expects JSON: {
+        "id": 1,
+        "batch_size": 10,
+        "cursor": null,      (the "next_cursor" of the previous page; omit or null for the first page)
+        "fields": ["id", "title", "early_summary", "arxiv_link"]   (optional)
+        "ef_search": 100, "probes": 10   (optional ANN index tuning for this query, capped at pgvector's limits)
+        "categories": ["cs.LG", ...] or [1, 0, 1, ...]   (optional preferred categories for re-ranking)
+    }
+    Returns: {"papers": [{"id": ..., "title": ..., "early_summary": ..., "arxiv_link": ...}, ...],
+              "next_cursor": "..." or null once the feed is exhausted}
+
+    Legacy clients may send "page" instead of "cursor" to get OFFSET-based pages.
+    """
+    data = request.get_json()
+    if not data or "id" not in data or 'batch_size' not in data:
+        return jsonify({"error": "Request body must contain 'id' and 'batch_size'"}), 400
+    fields = data.get('fields', FEED_FIELDS)
+    if not isinstance(fields, list) or any(f not in PAPER_FIELDS for f in fields):
+        return jsonify({"error": f"'fields' must be a list drawn from {sorted(PAPER_FIELDS)}"}), 400
+    try:
+        ef_search, probes = request_search_settings(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if 'page' in data and 'cursor' not in data:
+        start = data['page']*data['batch_size']
+        result = recommend_page_for_user(data['id'], data.get('categories', []), start, start+data['batch_size'], fields=fields,
+                                         ef_search=ef_search, probes=probes)
+        if isinstance(result, dict):
+            return jsonify(result), FEED_ERROR_STATUS.get(result.get("kind"), 500)
+        return jsonify({"papers": result})
+
+    result = recommend_feed_after(data['id'], data.get('categories', []), data['batch_size'], data.get('cursor'), fields=fields,
+                                  ef_search=ef_search, probes=probes)
+    if isinstance(result, dict):
+        return jsonify(result), FEED_ERROR_STATUS.get(result.get("kind"), 500)
+    papers, next_cursor = result
+    return jsonify({"papers": papers, "next_cursor": next_cursor})
+@app.route('/get_papers', methods=['POST'])
+def get_papers_endpoint():
+    """
+    Endpoint to hydrate several papers at once.
+    Expects JSON: {"ids": [1, 2, 3], "fields": ["id", "title"] (optional)}
+    """
+    data = request.get_json()
+    if not data or "ids" not in data or not isinstance(data['ids'], list):
+        return jsonify({"error": "Request body must contain a list of 'ids'"}), 400
+    fields = data.get('fields', FEED_FIELDS)
+    if not isinstance(fields, list) or any(f not in PAPER_FIELDS for f in fields):
+        return jsonify({"error": f"'fields' must be a list drawn from {sorted(PAPER_FIELDS)}"}), 400
+    result = get_papers(data['ids'], fields)
+    if result is None:
+        return jsonify({"error": "Error fetching papers"}), 500
+    return jsonify({"papers": result})
 
 if __name__ == '__main__':
     # Use port 5001 to avoid conflicts with other apps
-    scheduler.init_app(app)
-    scheduler.start()
     app.run(host='0.0.0.0', port=5000, debug=True, use_reload=False)
@@ -0,0 +1,186 @@
+import os
+import re
+import sys
+import threading
+
+from db_pool import get_pool
+
+# --- Configuration ---
+# Terms extracted and defined per paper by the ingestion-time glossary job.
+GLOSSARY_TERMS_PER_PAPER = int(os.environ.get("GLOSSARY_TERMS_PER_PAPER", "15"))
+# Highlights longer than this are not stored as definitions (they are sentences, not terms).
+MAX_TERM_CHARS = 200
+# term_definitions.paper_id for definitions that don't depend on the paper.
+ANY_PAPER = 0
+
+_stats_lock = threading.Lock()
+_stats = {"exact": 0, "glossary": 0, "generated": 0}
+# Time to first token of streamed definitions: (count, total seconds) for each source.
+_ttft = {"storage": [0, 0.0], "llm": [0, 0.0]}
+
+
+def normalize_term(text: str) -> str:
+    """Lower-cases a highlight, collapses whitespace and trims surrounding punctuation."""
+    text = " ".join(text.lower().split())
+    return text.strip(".,;:!?\"'()[]{}“”‘’")
+
+
+def _count(kind: str):
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def lookup_definition(text: str, paper_id: int = None):
+    """
+    Looks a highlight up in the definition store, without calling the LLM.
+
+    In order of preference: a definition stored for exactly this text (the paper's
+    own glossary first, then definitions for any paper), then the longest term of
+    the paper's glossary that appears as whole words in the highlight.
+
+    Returns:
+        (definition, term) or (None, None) on a miss.
+    """
+    term = normalize_term(text)
+    if not term:
+        return None, None
+    paper_id = int(paper_id) if paper_id else ANY_PAPER
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT term, paper_id, definition FROM term_definitions
+                   WHERE (term = %s AND paper_id IN (%s, %s)) OR (paper_id = %s AND source = 'glossary')""",
+                (term[:MAX_TERM_CHARS], paper_id, ANY_PAPER, paper_id)
+            )
+            rows = cur.fetchall()
+    exact = sorted((row for row in rows if row[0] == term), key=lambda row: row[1] != paper_id)
+    if exact:
+        _count("exact")
+        return exact[0][2], exact[0][0]
+    contained = [row for row in rows if re.search(r"(?<!\w)" + re.escape(row[0]) + r"(?!\w)", term)]
+    if contained:
+        _count("glossary")
+        best = max(contained, key=lambda row: len(row[0]))
+        return best[2], best[0]
+    return None, None
+
+
+def store_definitions(definitions: list, paper_id: int = None, source: str = "highlight"):
+    """
+    Saves (term, definition) pairs. Existing definitions for the same term and paper are kept.
+
+    Args:
+        paper_id: The paper the definitions were written for, or None if they don't depend on one.
+        source: 'highlight' (generated for a reader's highlight) or 'glossary' (ingestion job).
+    """
+    rows = [(normalize_term(term), int(paper_id) if paper_id else ANY_PAPER, definition, source)
+            for term, definition in definitions
+            if normalize_term(term) and len(normalize_term(term)) <= MAX_TERM_CHARS and definition]
+    if not rows:
+        return
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """INSERT INTO term_definitions (term, paper_id, definition, source) VALUES (%s, %s, %s, %s)
+                   ON CONFLICT (term, paper_id) DO NOTHING""",
+                rows
+            )
+
+
+def define_term(text: str, paper_id: int = None, max_attempts: int = None) -> str:
+    """
+    Returns a definition for a highlighted snippet: from storage when possible,
+    otherwise generated by ai_summarizer.define_unclear_terms and stored for next time.
+
+    Raises:
+        llm_retry.LLMUnavailableError: The definition had to be generated and Gemini is unavailable.
+    """
+    definition, _ = lookup_definition(text, paper_id)
+    if definition is not None:
+        return definition
+    # Imported on a miss only, so serving stored definitions never loads langchain.
+    from ai_summarizer import define_unclear_terms
+    from llm_retry import LLM_MAX_ATTEMPTS
+    definition = define_unclear_terms(text, max_attempts=max_attempts or LLM_MAX_ATTEMPTS)
+    _count("generated")
+    # The prompt only sees the snippet, so the definition holds for any paper.
+    store_definitions([(text, definition)])
+    return definition
+
+
+def define_term_stream(text: str, paper_id: int = None, max_attempts: int = None):
+    """
+    Streaming version of define_term. Yields ('storage' or 'llm', piece) tuples: a
+    stored definition arrives as a single piece, a generated one token by token
+    as Gemini produces it, and is stored once complete.
+    """
+    definition, _ = lookup_definition(text, paper_id)
+    if definition is not None:
+        yield "storage", definition
+        return
+    from ai_summarizer import stream_unclear_terms
+    from llm_retry import LLM_MAX_ATTEMPTS
+    parts = []
+    for piece in stream_unclear_terms(text, max_attempts=max_attempts or LLM_MAX_ATTEMPTS):
+        parts.append(piece)
+        yield "llm", piece
+    _count("generated")
+    store_definitions([(text, "".join(parts))])
+
+
+def record_time_to_first_token(source: str, seconds: float):
+    with _stats_lock:
+        _ttft[source][0] += 1
+        _ttft[source][1] += seconds
+
+
+def build_glossary(paper_id: int, summary: str, max_terms: int = GLOSSARY_TERMS_PER_PAPER) -> int:
+    """
+    Pre-defines the technical terms of one paper's summary, which is the text readers
+    highlight. Meant to run at ingestion. Returns the number of terms stored.
+    """
+    from ai_summarizer import extract_glossary
+    terms = extract_glossary(summary, max_terms)
+    store_definitions(terms, paper_id, source="glossary")
+    return len(terms)
+
+
+def papers_without_glossary(limit: int = None) -> list:
+    """(id, html_string) of papers that have no glossary entries yet, newest first."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT p.id, p.html_string FROM papers p
+                   WHERE NOT EXISTS (SELECT 1 FROM term_definitions t WHERE t.paper_id = p.id AND t.source = 'glossary')
+                   ORDER BY p.id DESC LIMIT %s""",
+                (limit,)
+            )
+            return cur.fetchall()
+
+
+def definition_stats() -> dict:
+    """How highlight requests in this process were answered: exact match, paper glossary, or a new LLM call."""
+    with _stats_lock:
+        stats = dict(_stats)
+        ttft = {source: {"count": count, "avg_ms": 1000 * seconds / count if count else None}
+                for source, (count, seconds) in _ttft.items()}
+    total = sum(stats.values())
+    stats["served_from_storage"] = (stats["exact"] + stats["glossary"]) / total if total else 0.0
+    stats["time_to_first_token"] = ttft
+    return stats
+
+
+if __name__ == '__main__':
+    # Usage: python glossary.py backfill [limit]
+    # Builds glossaries for papers ingested before the glossary job existed.
+    command = sys.argv[1] if len(sys.argv) > 1 else "backfill"
+    if command != "backfill":
+        print(f"Unknown command: {command}")
+        sys.exit(1)
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    for paper_id, html in papers_without_glossary(limit):
+        try:
+            count = build_glossary(paper_id, re.sub(r"<[^>]+>", "", html or ""))
+            print(f"Paper {paper_id}: {count} terms.")
+        except Exception as e:
+            print(f"Paper {paper_id}: glossary failed: {e}")
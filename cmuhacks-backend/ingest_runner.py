@@ -0,0 +1,188 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import glossary
+import ingestion_ledger
+from db_pool import get_pool
+from llm_cache import llm_cache_stats
+from pdf_pipeline import shutdown_extract_pool
+from daily_update_papers import embedding_text, fetch_recent, process_recent_papers
+from database_handler import add_papers
+from schema import ensure_schema_on_startup, maintain_paper_embedding_index
+
+# --- Configuration ---
+DEFAULT_CATEGORIES = os.environ.get("INGEST_CATEGORIES", "cs.AI").split(",")
+# Categories processed at the same time. LLM calls are additionally capped
+# process-wide by daily_update_papers.INGEST_LLM_CONCURRENCY.
+INGEST_MAX_PARALLEL = int(os.environ.get("INGEST_MAX_PARALLEL", "2"))
+# Finished summaries stored per add_papers call (one encode batch, one INSERT).
+INGEST_STORE_BATCH_SIZE = int(os.environ.get("INGEST_STORE_BATCH_SIZE", "8"))
+# Key for pg_try_advisory_lock; any constant shared by all runners works.
+INGEST_LOCK_KEY = 7_301_642
+
+
+class IngestionLock:
+    """
+    A Postgres session-level advisory lock held for the whole run, so a runner
+    never overlaps with a previous run that is still going, on any host.
+    """
+
+    def __init__(self, key: int = INGEST_LOCK_KEY):
+        self.key = key
+        self._conn = None
+
+    def acquire(self) -> bool:
+        self._conn = get_pool().getconn()
+        with self._conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+            acquired = cur.fetchone()[0]
+        self._conn.commit()
+        if not acquired:
+            get_pool().putconn(self._conn)
+            self._conn = None
+        return acquired
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (self.key,))
+            self._conn.commit()
+            get_pool().putconn(self._conn)
+        except Exception:
+            # Closing the session releases the lock too.
+            get_pool().putconn(self._conn, discard=True)
+        self._conn = None
+
+
+def dedupe_cross_listed(papers_by_category: dict) -> dict:
+    """
+    Keeps each arXiv paper in only the first category (in the given order) that
+    listed it, so cross-listed papers are downloaded and summarized once.
+    """
+    seen = set()
+    deduped = {}
+    for category, papers in papers_by_category.items():
+        deduped[category] = []
+        for paper in papers:
+            arxiv_id = ingestion_ledger.parse_entry_id(paper.entry_id)[0]
+            if arxiv_id in seen:
+                continue
+            seen.add(arxiv_id)
+            deduped[category].append(paper)
+    return deduped
+
+
+def ingest_category(category: str, papers: list, store_batch_size: int = INGEST_STORE_BATCH_SIZE):
+    """
+    Processes and stores one category's papers. Summaries are stored in chunks of
+    `store_batch_size` as they finish, so a slow or failing paper doesn't hold back
+    the others and each chunk is embedded and inserted in one batch.
+    Returns the new paper ids.
+    """
+    paper_ids = []
+    ready = []
+
+    def flush():
+        chunk = ready[:]
+        ready.clear()
+        if not chunk:
+            return
+        entry_ids = [paper.entry_id for paper, _ in chunk]
+        try:
+            # A new version of an ingested paper overwrites its row instead of adding a duplicate.
+            existing = ingestion_ledger.stored_paper_ids([paper for paper, _ in chunk])
+            added = add_papers([{'embedding_text': embedding_text(paper), 'title': paper.title,
+                                 'paper_body': '<p>'+summary+'</p>', 'arxiv_link': paper.pdf_url,
+                                 'categories': paper.categories, 'published': paper.published,
+                                 'author_prestige': getattr(paper, 'author_prestige', None),
+                                 'paper_id': existing.get(paper.entry_id)}
+                                for paper, summary in chunk])
+        except Exception as e:
+            added = f"Failed to store {len(chunk)} papers: {e}"
+        if not isinstance(added, list):
+            ingestion_ledger.record(entry_ids, 'failed')
+            print(f"[{category}] {added}")
+            return
+        ingestion_ledger.record(entry_ids, 'done', paper_ids=added)
+        paper_ids.extend(added)
+        print(f"[{category}] stored {len(added)} papers.")
+        for paper_id, (_, summary) in zip(added, chunk):
+            try:
+                # Pre-define the summary's jargon so reader highlights are served from storage.
+                glossary.build_glossary(paper_id, summary)
+            except Exception as e:
+                print(f"[{category}] glossary failed for paper {paper_id}: {e}")
+
+    def store(paper, summary):
+        ready.append((paper, summary))
+        if len(ready) >= store_batch_size:
+            flush()
+
+    try:
+        process_recent_papers(papers, on_summary=store)
+    finally:
+        flush()
+    return paper_ids
+
+
+def run_ingestion(categories: list = DEFAULT_CATEGORIES, max_parallel: int = INGEST_MAX_PARALLEL):
+    """
+    Ingests the recent top papers of several arXiv categories.
+
+    Categories are fetched, de-duplicated against each other, then processed
+    concurrently (at most `max_parallel` at a time). The whole run holds an
+    advisory lock; if another run still holds it, this one returns immediately.
+
+    Returns:
+        A dict mapping each category to the ids of the papers it added, or None if
+        another run was in progress.
+    """
+    lock = IngestionLock()
+    if not lock.acquire():
+        print("Another ingestion run is still in progress; skipping this one.")
+        return None
+    started = time.perf_counter()
+    results = {}
+    ensure_schema_on_startup()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            fetched = dict(zip(categories, pool.map(fetch_recent, categories)))
+            deduped = dedupe_cross_listed(fetched)
+            total_fetched = sum(len(papers) for papers in fetched.values())
+            total_unique = sum(len(papers) for papers in deduped.values())
+            print(f"Fetched {total_fetched} papers across {len(categories)} categories, {total_unique} unique.")
+
+            futures = {pool.submit(ingest_category, category, papers): category
+                       for category, papers in deduped.items() if papers}
+            for future in as_completed(futures):
+                category = futures[future]
+                try:
+                    results[category] = future.result()
+                    print(f"[{category}] added {len(results[category])} papers.")
+                except Exception as e:
+                    results[category] = []
+                    print(f"[{category}] ingestion failed: {e}")
+        if any(results.values()):
+            # New rows may call for a bigger IVFFlat index or fresher planner stats.
+            maintain_paper_embedding_index()
+    finally:
+        shutdown_extract_pool()
+        lock.release()
+    print(f"Ingestion finished in {time.perf_counter() - started:.1f}s.")
+    llm_stats = llm_cache_stats()
+    print(f"LLM cache: {llm_stats['hits']} hits, {llm_stats['misses']} misses ({llm_stats['hit_rate']:.0%} hit rate).")
+    return results
+
+
+if __name__ == '__main__':
+    # Usage: python ingest_runner.py cs.AI cs.LG cs.CL [--max-parallel 2]
+    # Meant to be run from cron / a systemd timer, not inside the web process.
+    parser = argparse.ArgumentParser(description="Ingest recent arXiv papers for several categories.")
+    parser.add_argument("categories", nargs="*", default=DEFAULT_CATEGORIES)
+    parser.add_argument("--max-parallel", type=int, default=INGEST_MAX_PARALLEL)
+    args = parser.parse_args()
+    run_ingestion(args.categories, args.max_parallel)
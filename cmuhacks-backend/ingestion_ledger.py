@@ -0,0 +1,129 @@
+import hashlib
+import re
+
+from db_pool import get_pool
+
+# Statuses after which a paper version is never reprocessed.
+TERMINAL_STATUSES = ("done", "skipped")
+# A paper version that keeps failing is given up on after this many attempts.
+MAX_ATTEMPTS = 3
+
+ENTRY_ID_PATTERN = re.compile(r"abs/(.+?)(?:v(\d+))?$")
+
+
+def parse_entry_id(entry_id: str):
+    """
+    Splits an arXiv entry id such as 'http://arxiv.org/abs/2401.01234v2' into ('2401.01234', 2).
+    """
+    match = ENTRY_ID_PATTERN.search(entry_id)
+    if not match:
+        return entry_id, 1
+    return match.group(1), int(match.group(2) or 1)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _ledger_rows(arxiv_ids: list) -> dict:
+    if not arxiv_ids:
+        return {}
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT arxiv_id, version, status, content_hash, attempts FROM ingestion_ledger WHERE arxiv_id = ANY(%s)",
+                (list(arxiv_ids),)
+            )
+            return {row[0]: row[1:] for row in cur.fetchall()}
+
+
+def stored_paper_ids(papers: list) -> dict:
+    """
+    Maps the entry id of each paper that already has a row in `papers` (an earlier
+    version was ingested) to that row's id, so a new version overwrites it.
+    """
+    arxiv_ids = {parse_entry_id(paper.entry_id)[0]: paper.entry_id for paper in papers}
+    if not arxiv_ids:
+        return {}
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT arxiv_id, paper_id FROM ingestion_ledger WHERE arxiv_id = ANY(%s) AND paper_id IS NOT NULL",
+                        (list(arxiv_ids),))
+            return {arxiv_ids[arxiv_id]: paper_id for arxiv_id, paper_id in cur.fetchall()}
+
+
+def filter_new_papers(papers: list) -> list:
+    """
+    Drops papers whose current version has already been ingested (or deliberately
+    skipped, or failed too often), using one query against the ledger.
+
+    Args:
+        papers: arxiv.Result objects straight from the search.
+
+    Returns:
+        The papers that are new, or a newer version of something already seen.
+    """
+    parsed = [parse_entry_id(paper.entry_id) for paper in papers]
+    rows = _ledger_rows([arxiv_id for arxiv_id, _ in parsed])
+    fresh = []
+    for paper, (arxiv_id, version) in zip(papers, parsed):
+        row = rows.get(arxiv_id)
+        if row is not None:
+            seen_version, status, _, attempts = row
+            if seen_version > version:
+                continue
+            if seen_version == version and (status in TERMINAL_STATUSES or attempts >= MAX_ATTEMPTS):
+                continue
+        fresh.append(paper)
+    print(f"Ingestion ledger: {len(fresh)} of {len(papers)} fetched papers are new or updated.")
+    return fresh
+
+
+def unchanged_papers(papers: list, texts: list) -> set:
+    """
+    Returns the indices of papers whose extracted text hashes to the same content as an
+    already-ingested version (e.g. a new arXiv version that only changed metadata).
+    """
+    rows = _ledger_rows([parse_entry_id(paper.entry_id)[0] for paper in papers])
+    unchanged = set()
+    for i, (paper, text) in enumerate(zip(papers, texts)):
+        row = rows.get(parse_entry_id(paper.entry_id)[0])
+        if row is not None and row[1] == "done" and row[2] == content_hash(text):
+            unchanged.add(i)
+    return unchanged
+
+
+def record(entry_ids: list, status: str, content_hashes: list = None, paper_ids: list = None):
+    """
+    Upserts the ledger rows for several papers at once.
+
+    Args:
+        entry_ids: arXiv entry ids (with version suffix).
+        status: 'pending', 'skipped', 'failed' or 'done'.
+        content_hashes: Optional content hashes aligned with `entry_ids`; kept if omitted.
+        paper_ids: Optional papers.id values aligned with `entry_ids`; kept if omitted.
+    """
+    if not entry_ids:
+        return
+    content_hashes = content_hashes or [None] * len(entry_ids)
+    paper_ids = paper_ids or [None] * len(entry_ids)
+    rows = []
+    for entry_id, digest, paper_id in zip(entry_ids, content_hashes, paper_ids):
+        arxiv_id, version = parse_entry_id(entry_id)
+        rows.append((arxiv_id, version, status, digest, paper_id, 1 if status == "failed" else 0))
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """INSERT INTO ingestion_ledger (arxiv_id, version, status, content_hash, paper_id, attempts)
+                   VALUES (%s, %s, %s, %s, %s, %s)
+                   ON CONFLICT (arxiv_id) DO UPDATE SET
+                       status = EXCLUDED.status,
+                       content_hash = COALESCE(EXCLUDED.content_hash, ingestion_ledger.content_hash),
+                       paper_id = COALESCE(EXCLUDED.paper_id, ingestion_ledger.paper_id),
+                       attempts = CASE WHEN ingestion_ledger.version = EXCLUDED.version
+                                       THEN ingestion_ledger.attempts + EXCLUDED.attempts
+                                       ELSE EXCLUDED.attempts END,
+                       version = EXCLUDED.version,
+                       updated_at = now()""",
+                rows
+            )
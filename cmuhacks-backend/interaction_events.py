@@ -0,0 +1,204 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from db_pool import get_pool
+
+# --- Configuration ---
+# Weight of the existing profile each time an interaction is folded in.
+# Every event applies `profile = normalize(decay * profile + weight * paper)`:
+# database_handler.update_user, the consumer (fold_events) and profile_recompute
+# all use this one rule, so they agree on the profile for the same history.
+PROFILE_DECAY = float(os.environ.get("PROFILE_DECAY", "0.8"))
+# How much each kind of interaction pulls the profile towards the paper.
+EVENT_WEIGHTS = {
+    "read": float(os.environ.get("READ_WEIGHT", "1.0")),
+    "like": float(os.environ.get("LIKE_WEIGHT", "2.0")),
+}
+# Events claimed per transaction, and the pause between polls when the log is empty.
+EVENT_BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", "1000"))
+EVENT_POLL_SECONDS = float(os.environ.get("EVENT_POLL_SECONDS", "2"))
+EMBEDDING_DIM = 384
+# Advisory lock key shared with profile_recompute: consumers hold it shared, a full
+# recomputation holds it exclusively so no events are folded while it rewrites profiles.
+PROFILE_LOCK_KEY = 1001
+
+
+def record_event(user_id: int, paper_id: int, kind: str = "read"):
+    """
+    Appends one interaction to the event log. This is all the request path does;
+    the profile itself is updated later by the consumer.
+    """
+    if kind not in EVENT_WEIGHTS:
+        raise ValueError(f"Unknown interaction kind: {kind}")
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO interaction_events (user_id, paper_id, kind) VALUES (%s, %s, %s)",
+                        (int(user_id), int(paper_id), kind))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scales every row to unit L2 norm; all-zero rows are left as they are."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def fold_events(current: np.ndarray, user_index: np.ndarray, paper_vectors: np.ndarray,
+                weights: np.ndarray, decay: float = PROFILE_DECAY, paper_rows: np.ndarray = None) -> np.ndarray:
+    """
+    Applies `profile = normalize(decay * profile + weight * paper)` for every event,
+    in log order, for all users at once (see PROFILE_DECAY).
+
+    The normalization makes each step depend on the previous one, so a user's events
+    are folded one after the other. But the n-th events of different users are
+    independent: each round folds every user's n-th event with one array operation,
+    so the number of rounds is the largest number of events of a single user.
+
+    Args:
+        current: (users, dim) current profiles; zero rows for users without one.
+        user_index: (events,) row of `current` each event belongs to, events in log order.
+        paper_vectors: (events, dim) embedding of each event's paper, or (papers, dim)
+            embeddings looked up through `paper_rows`.
+        weights: (events,) weight of each event.
+        paper_rows: Optional (events,) row of `paper_vectors` for each event.
+
+    Returns:
+        The (users, dim) updated profiles, each of unit length (or zero).
+    """
+    # Position of each event among the same user's events (0 for the user's oldest).
+    order = np.argsort(user_index, kind="stable")
+    sorted_users = user_index[order]
+    group_start = np.searchsorted(sorted_users, sorted_users, side="left")
+    position = np.empty_like(user_index)
+    position[order] = np.arange(len(user_index)) - group_start
+    by_position = np.argsort(position, kind="stable")
+    bounds = np.cumsum(np.bincount(position, minlength=1))
+
+    updated = np.array(current, dtype=np.float32)
+    for events in np.split(by_position, bounds[:-1]):
+        users = user_index[events]
+        vectors = paper_vectors[events if paper_rows is None else paper_rows[events]]
+        updated[users] = normalize_rows(decay * updated[users] + weights[events][:, None] * vectors)
+    return updated
+
+
+def consume_batch(batch_size: int = EVENT_BATCH_SIZE) -> int:
+    """
+    Claims the users behind the oldest unprocessed events, folds up to `batch_size`
+    of their pending events into their profiles and marks them processed, all in
+    one transaction.
+
+    Claims are per user: the user rows are locked FOR UPDATE SKIP LOCKED first, and
+    only then are those users' pending events read, in log order. So several
+    consumers can run at once without blocking each other, one user's events are
+    never split between two concurrent batches (which could fold them out of
+    order), and each user's row is written once per batch.
+    While profile_recompute is rewriting every profile the batch is skipped.
+
+    Returns:
+        The number of events processed.
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock_shared(%s)", (PROFILE_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                return 0
+            cur.execute(
+                """SELECT DISTINCT user_id FROM (
+                       SELECT user_id FROM interaction_events
+                       WHERE processed_at IS NULL ORDER BY id LIMIT %s) oldest""",
+                (batch_size,)
+            )
+            pending_users = [row[0] for row in cur.fetchall()]
+            if not pending_users:
+                return 0
+            cur.execute("SELECT id, embedding FROM users WHERE id = ANY(%s) ORDER BY id FOR UPDATE SKIP LOCKED",
+                        (pending_users,))
+            stored = dict(cur.fetchall())
+            # Events of deleted users are marked processed; nobody will ever claim them.
+            cur.execute(
+                """UPDATE interaction_events e SET processed_at = now()
+                   WHERE e.processed_at IS NULL AND e.user_id = ANY(%s)
+                     AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = e.user_id)""",
+                (pending_users,)
+            )
+            dropped = cur.rowcount
+            if not stored:
+                return dropped
+            cur.execute(
+                """SELECT e.id, e.user_id, e.kind, p.embedding
+                   FROM interaction_events e LEFT JOIN papers p ON p.id = e.paper_id
+                   WHERE e.processed_at IS NULL AND e.user_id = ANY(%s)
+                   ORDER BY e.id
+                   LIMIT %s""",
+                (list(stored), batch_size)
+            )
+            events = cur.fetchall()
+            if not events:
+                return dropped
+            event_ids = [event[0] for event in events]
+            # Events for deleted papers are marked processed without touching the profile.
+            events = [event for event in events if event[3] is not None]
+
+            if events:
+                user_ids = sorted({event[1] for event in events})
+                row_of = {user_id: i for i, user_id in enumerate(user_ids)}
+                current = np.zeros((len(user_ids), EMBEDDING_DIM), dtype=np.float32)
+                for user_id, row in row_of.items():
+                    if stored[user_id] is not None:
+                        current[row] = stored[user_id]
+                updated = fold_events(
+                    current,
+                    np.array([row_of[event[1]] for event in events]),
+                    np.array([event[3] for event in events], dtype=np.float32),
+                    np.array([EVENT_WEIGHTS.get(event[2], 1.0) for event in events], dtype=np.float32),
+                )
+                execute_values(
+                    cur,
+                    """UPDATE users SET embedding = data.embedding::vector
+                       FROM (VALUES %s) AS data (id, embedding) WHERE users.id = data.id""",
+                    [(user_id, updated[row].tolist()) for user_id, row in row_of.items()],
+                    page_size=len(row_of),
+                )
+            cur.execute("UPDATE interaction_events SET processed_at = now() WHERE id = ANY(%s)", (event_ids,))
+    return dropped + len(event_ids)
+
+
+def queue_stats() -> dict:
+    """Backlog of the event log: unprocessed events and the age of the oldest one."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""SELECT count(*), EXTRACT(EPOCH FROM now() - min(created_at))
+                           FROM interaction_events WHERE processed_at IS NULL""")
+            pending, oldest_seconds = cur.fetchone()
+    return {"pending": pending, "oldest_pending_seconds": float(oldest_seconds) if oldest_seconds else 0.0}
+
+
+def run_consumer(batch_size: int = EVENT_BATCH_SIZE, poll_seconds: float = EVENT_POLL_SECONDS, once: bool = False):
+    """Processes the event log until interrupted (or until it is empty, with `once`)."""
+    while True:
+        start = time.perf_counter()
+        try:
+            processed = consume_batch(batch_size)
+        except Exception as e:
+            print(f"Interaction event batch failed: {e}")
+            processed = 0
+        if processed:
+            print(f"Folded {processed} interaction events in {1000 * (time.perf_counter() - start):.0f}ms.")
+            continue
+        if once:
+            return
+        time.sleep(poll_seconds)
+
+
+if __name__ == '__main__':
+    # Usage: python interaction_events.py [--once] [--batch-size N]
+    # Runs next to the web workers; several consumers can run at once.
+    parser = argparse.ArgumentParser(description="Fold interaction events into user profiles.")
+    parser.add_argument("--once", action="store_true", help="Exit once the log has been drained.")
+    parser.add_argument("--batch-size", type=int, default=EVENT_BATCH_SIZE)
+    args = parser.parse_args()
+    run_consumer(args.batch_size, once=args.once)
@@ -0,0 +1,78 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Directory holding the on-disk caches used by the ingestion jobs. Defaults to
+# cache/ next to this file, whatever directory the jobs are started from.
+CACHE_DIR = os.path.abspath(os.environ.get("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")))
+
+
+class PersistentCache:
+    """
+    A small persistent key/value cache backed by a local SQLite file.
+
+    Values are stored as JSON with an optional per-entry TTL, so the cache
+    survives restarts and crashes of the ingestion jobs. Safe to share
+    between threads of one process; SQLite's own locking covers several processes.
+    """
+
+    def __init__(self, name: str, default_ttl: float = None, cache_dir: str = CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"{name}.sqlite3")
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default=None):
+        """Returns the stored value for `key`, or `default` if it is missing or expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < time.time()):
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def set(self, key: str, value, ttl: float = None):
+        """Stores a JSON-serializable value. `ttl` (seconds) overrides the default; None means no expiry."""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries and returns how many were removed."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?",
+                                     (time.time(),))
+            self._conn.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from kv_cache import PersistentCache
+from llm_retry import LLM_MAX_ATTEMPTS, breaker, call_with_retry, batch_with_retry
+from rate_limit import TokenBucket
+
+# --- Configuration ---
+# Set LLM_CACHE_ENABLED=0 to always call the model (e.g. when tuning prompts by hand).
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+# Responses are keyed by their exact prompt and model, so they never go stale on
+# their own; the TTL only bounds the size of the cache file.
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+# Model requests per minute (and burst) shared by every chain in this process,
+# however many papers or categories are being processed concurrently.
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "5"))
+# Most requests one chain.batch call keeps in flight.
+LLM_BATCH_CONCURRENCY = int(os.environ.get("LLM_BATCH_CONCURRENCY", "8"))
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+_llm_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE / 60, LLM_BURST)
+
+
+def _cache():
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = PersistentCache("llm_responses", default_ttl=LLM_CACHE_TTL)
+    return _llm_cache
+
+
+def _model_id(llm_instance) -> dict:
+    return {
+        "class": type(llm_instance).__name__,
+        "model": getattr(llm_instance, "model", None),
+        "temperature": getattr(llm_instance, "temperature", None),
+    }
+
+
+def _throttle(inputs):
+    _llm_bucket.acquire()
+    return inputs
+
+
+def build_chain(prompt, llm_instance):
+    """
+    `prompt | llm_instance | StrOutputParser()`, with every model request (including
+    each item of a batch) first taking a token from the shared rate limiter.
+    """
+    return RunnableLambda(_throttle) | prompt | llm_instance | StrOutputParser()
+
+
+def _invoke(chain, inputs: dict, max_attempts: int) -> str:
+    return call_with_retry(lambda: chain.invoke(inputs), on_rate_limited=_llm_bucket.pause, max_attempts=max_attempts)
+
+
+def _batch(chain, inputs_list: list, config: dict) -> list:
+    return batch_with_retry(lambda items: chain.batch(items, config=config, return_exceptions=True),
+                            inputs_list, on_rate_limited=_llm_bucket.pause)
+
+
+def cache_key(prompt, llm_instance, inputs: dict) -> str:
+    """
+    Content address of one LLM call: a hash of the prompt template's messages,
+    the model (name and temperature) and the input variables.
+    """
+    template = [(type(message).__name__, getattr(getattr(message, "prompt", None), "template", repr(message)))
+                for message in prompt.messages]
+    payload = json.dumps({"template": template, "model": _model_id(llm_instance), "inputs": inputs},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_invoke(prompt, llm_instance, inputs: dict, max_attempts: int = LLM_MAX_ATTEMPTS, cache: bool = True) -> str:
+    """
+    Runs `prompt | llm_instance | StrOutputParser()` on `inputs`, returning the
+    stored response instead when the same call has been made before.
+
+    Only deterministic calls (a temperature-0 model) should be cached; pass
+    `cache=False` for sampled generations and for judgements that must be re-made
+    on a retry, or every retry replays the stored response.
+
+    Model requests are retried with backoff and guarded by the circuit breaker in
+    llm_retry; a rate-limit error also pauses the shared rate limiter.
+
+    Raises:
+        llm_retry.LLMUnavailableError: The provider kept failing or the breaker is open.
+    """
+    if not (LLM_CACHE_ENABLED and cache):
+        return _invoke(build_chain(prompt, llm_instance), inputs, max_attempts)
+    store = _cache()
+    key = cache_key(prompt, llm_instance, inputs)
+    cached = store.get(key)
+    if cached is not None:
+        return cached
+    result = _invoke(build_chain(prompt, llm_instance), inputs, max_attempts)
+    store.set(key, result)
+    return result
+
+
+def cached_batch(prompt, llm_instance, inputs_list: list) -> list:
+    """
+    Batch version of cached_invoke: only the inputs without a stored response are
+    sent to the model, in a single chain.batch call (at most LLM_BATCH_CONCURRENCY
+    requests in flight). Results keep the input order; an input that failed gets
+    its exception in place of a response (see llm_retry.batch_with_retry).
+    """
+    chain = build_chain(prompt, llm_instance)
+    config = {"max_concurrency": LLM_BATCH_CONCURRENCY}
+    if not LLM_CACHE_ENABLED:
+        return _batch(chain, inputs_list, config)
+    cache = _cache()
+    keys = [cache_key(prompt, llm_instance, inputs) for inputs in inputs_list]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        for i, result in zip(missing, _batch(chain, [inputs_list[i] for i in missing], config)):
+            if not isinstance(result, Exception):
+                cache.set(keys[i], result)
+            results[i] = result
+    return results
+
+
+def cached_stream(prompt, llm_instance, inputs: dict, max_attempts: int = LLM_MAX_ATTEMPTS):
+    """
+    Streaming version of cached_invoke: yields the response in pieces as the model
+    produces them (a stored response comes out as one piece), then stores the full text.
+
+    Only the wait for the first piece is retried; an error after text has been
+    yielded propagates to the caller.
+    """
+    key = cache_key(prompt, llm_instance, inputs) if LLM_CACHE_ENABLED else None
+    if key is not None:
+        cached = _cache().get(key)
+        if cached is not None:
+            yield cached
+            return
+    chain = build_chain(prompt, llm_instance)
+
+    def start_stream():
+        stream = iter(chain.stream(inputs))
+        return stream, next(stream, "")
+
+    stream, first = call_with_retry(start_stream, on_rate_limited=_llm_bucket.pause, max_attempts=max_attempts)
+    parts = [first]
+    yield first
+    for piece in stream:
+        parts.append(piece)
+        yield piece
+    if key is not None:
+        _cache().set(key, "".join(parts))
+
+
+def llm_cache_stats() -> dict:
+    """Hit/miss counters for this process, the number of stored responses and the circuit breaker state."""
+    return dict(_cache().stats(), enabled=LLM_CACHE_ENABLED, breaker=breaker.stats())
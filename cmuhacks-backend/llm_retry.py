@@ -0,0 +1,221 @@
+import os
+import random
+import threading
+import time
+
+# --- Configuration ---
+# Attempts per LLM call (the first try included) before giving up.
+LLM_MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", "5"))
+# Attempts for calls made while a user waits on the response (web requests).
+LLM_INTERACTIVE_MAX_ATTEMPTS = int(os.environ.get("LLM_INTERACTIVE_MAX_ATTEMPTS", "2"))
+# First backoff delays in seconds, doubled on every further attempt up to LLM_BACKOFF_MAX.
+# Quota errors start higher: retrying them quickly only burns more quota.
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "2"))
+LLM_RATE_LIMIT_BACKOFF_BASE = float(os.environ.get("LLM_RATE_LIMIT_BACKOFF_BASE", "10"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "120"))
+# After this many consecutive failed calls the breaker opens, and every call fails
+# immediately for LLM_BREAKER_COOLDOWN seconds before one trial call is let through.
+LLM_BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "120"))
+
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+# Which error of a partly failed batch decides how it is handled.
+ERROR_PRIORITY = {PERMANENT: 0, RATE_LIMITED: 1, TRANSIENT: 2}
+
+# Exception class names (anywhere in the MRO) from google.api_core, httpx, requests
+# and the standard library, matched by name so this module doesn't import any of them.
+RATE_LIMIT_ERRORS = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+TRANSIENT_ERRORS = {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+                    "BadGateway", "Aborted", "ServerError", "TimeoutException", "Timeout", "TimeoutError",
+                    "ConnectError", "ConnectionError", "RemoteProtocolError"}
+RATE_LIMIT_MARKERS = ("429", "resource exhausted", "resource_exhausted", "quota", "rate limit")
+TRANSIENT_MARKERS = ("500", "502", "503", "504", "unavailable", "deadline exceeded", "timed out", "overloaded")
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when an LLM call is given up on: retries ran out, or the circuit breaker is open."""
+
+
+def classify_error(error: Exception) -> str:
+    """Sorts an exception from an LLM call into RATE_LIMITED, TRANSIENT or PERMANENT."""
+    names = {cls.__name__ for cls in type(error).__mro__}
+    code = getattr(error, "code", None)
+    if names & RATE_LIMIT_ERRORS or code == 429:
+        return RATE_LIMITED
+    if names & TRANSIENT_ERRORS or (isinstance(code, int) and code >= 500):
+        return TRANSIENT
+    # langchain_google_genai re-raises some provider errors with only the message kept.
+    message = str(error).lower()
+    if any(marker in message for marker in RATE_LIMIT_MARKERS):
+        return RATE_LIMITED
+    if any(marker in message for marker in TRANSIENT_MARKERS):
+        return TRANSIENT
+    return PERMANENT
+
+
+def backoff_delay(attempt: int, kind: str) -> float:
+    """Exponential backoff with jitter: a random delay between half and all of base * 2**attempt."""
+    base = LLM_RATE_LIMIT_BACKOFF_BASE if kind == RATE_LIMITED else LLM_BACKOFF_BASE
+    delay = min(LLM_BACKOFF_MAX, base * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    """
+    Fails LLM calls fast while the provider looks down, instead of letting every
+    worker sit through its full retry schedule.
+
+    closed -> open after `threshold` consecutive failures; open -> half-open after
+    `cooldown` seconds, when a single trial call is allowed; the trial's outcome
+    closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            failed_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if failed_trial or (self._opened_at is None and self._failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                print(f"⚡ LLM circuit breaker open for {self.cooldown:.0f}s after {self._failures} failures.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self._failures}
+
+
+# One breaker per process: every chain talks to the same provider.
+breaker = CircuitBreaker()
+
+
+def _check_breaker(description: str):
+    if not breaker.allow():
+        raise LLMUnavailableError(f"{description}: LLM provider unavailable (circuit breaker open)")
+
+
+def _handle_failure(error: Exception, attempt: int, max_attempts: int, description: str, on_rate_limited=None) -> float:
+    """
+    Records a failed attempt and returns how long to wait before the next one.
+    Re-raises permanent errors, and raises LLMUnavailableError once attempts run out.
+    """
+    kind = classify_error(error)
+    if kind == PERMANENT:
+        # A bad request fails the same way every time. The provider did answer, though.
+        breaker.record_success()
+        raise error
+    breaker.record_failure()
+    if attempt + 1 >= max_attempts:
+        raise LLMUnavailableError(f"{description}: gave up after {max_attempts} attempts ({error})") from error
+    delay = backoff_delay(attempt, kind)
+    if kind == RATE_LIMITED and on_rate_limited is not None:
+        on_rate_limited(delay)
+    print(f"⏳ {description} failed ({kind}: {error}); retry {attempt + 1}/{max_attempts - 1} in {delay:.1f}s")
+    return delay
+
+
+def call_with_retry(call, description: str = "LLM call", on_rate_limited=None, max_attempts: int = LLM_MAX_ATTEMPTS):
+    """
+    Runs `call()` under the retry policy and the shared circuit breaker.
+
+    Args:
+        call: Zero-argument function making one LLM request.
+        on_rate_limited: Optional callback(delay) run on a rate-limit error, e.g. to
+            pause a shared rate limiter so other threads back off too.
+        max_attempts: Attempts before giving up, the first one included.
+
+    Raises:
+        LLMUnavailableError: Retries ran out or the breaker is open.
+        Exception: The original error, if it was classified as permanent.
+    """
+    for attempt in range(max_attempts):
+        _check_breaker(description)
+        try:
+            result = call()
+        except Exception as e:
+            time.sleep(_handle_failure(e, attempt, max_attempts, description, on_rate_limited))
+            continue
+        breaker.record_success()
+        return result
+
+
+def batch_with_retry(run_batch, inputs_list: list, description: str = "LLM batch", on_rate_limited=None) -> list:
+    """
+    Batch version of call_with_retry. `run_batch(inputs)` must return one result or
+    exception per input (e.g. chain.batch(inputs, return_exceptions=True)); only the
+    inputs that failed transiently are sent again.
+
+    Returns:
+        One entry per input, in order: its result, or the exception it failed with
+        (the original error if it was permanent, LLMUnavailableError if retries ran
+        out or the breaker is open). One bad input never fails the others.
+    """
+    results = [None] * len(inputs_list)
+    pending = list(range(len(inputs_list)))
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        if not breaker.allow():
+            error = LLMUnavailableError(f"{description}: LLM provider unavailable (circuit breaker open)")
+            for i in pending:
+                results[i] = error
+            return results
+        outcomes = run_batch([inputs_list[i] for i in pending])
+        failed = []
+        for i, outcome in zip(pending, outcomes):
+            results[i] = outcome
+            # A permanent error fails the same way every time, so it is kept as the result.
+            if isinstance(outcome, Exception) and classify_error(outcome) != PERMANENT:
+                failed.append((i, outcome))
+        if len(failed) < len(pending):
+            # Part of the batch was answered, so the provider is up.
+            breaker.record_success()
+        if not failed:
+            return results
+        pending = [i for i, _ in failed]
+        # One failure per round for the breaker and the backoff, using the most telling error.
+        error = min((error for _, error in failed), key=lambda error: ERROR_PRIORITY[classify_error(error)])
+        try:
+            delay = _handle_failure(error, attempt, LLM_MAX_ATTEMPTS, f"{description} ({len(pending)} items)", on_rate_limited)
+        except LLMUnavailableError as gave_up:
+            for i in pending:
+                results[i] = gave_up
+            return results
+        time.sleep(delay)
+    return results
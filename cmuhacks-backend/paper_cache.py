@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# --- Configuration ---
+PAPER_CACHE_MAX_BYTES = int(os.environ.get("PAPER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PAPER_CACHE_TTL = float(os.environ.get("PAPER_CACHE_TTL", "3600"))
+
+
+def estimate_size(value) -> int:
+    """Approximates the memory held by a cached value, in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        # CPython stores most paper text as 1 byte per character; utf-8 length is a close upper bound.
+        return len(value.encode("utf-8")) + 49
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ByteLRUCache:
+    """
+    A thread-safe LRU cache bounded by the total size of its values (in bytes)
+    rather than by the number of entries, with a per-entry time-to-live.
+    """
+
+    def __init__(self, max_bytes: int = PAPER_CACHE_MAX_BYTES, ttl: float = PAPER_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, expires_at); ordered from least to most recently used.
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores `value`, evicting least recently used entries until it fits."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # Never let one huge paper flush the whole cache.
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drops `key` from the cache if present."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current occupancy for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+
+# Process-wide cache of paper rows, keyed by str(paper id).
+paper_rows = ByteLRUCache()
@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+
+# --- Configuration ---
+# Downloads are I/O bound, so a handful of threads keeps the network busy.
+DOWNLOAD_WORKERS = int(os.environ.get("PDF_DOWNLOAD_WORKERS", "4"))
+# Text extraction is CPU bound; PyMuPDF holds the GIL, so it runs in processes.
+EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Upper bound on PDFs downloaded but not yet extracted (and on extractions in flight).
+# Each PDF is deleted once extracted, so this keeps memory and disk use flat
+# regardless of how many papers are queued.
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PDF_PIPELINE_QUEUE_SIZE", "8"))
+
+_DONE = object()
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+
+def get_extract_pool(workers: int = EXTRACT_WORKERS) -> ProcessPoolExecutor:
+    """
+    The process pool PDFs are extracted in, created on first use and shared by every
+    pipeline run in this process. Spawned workers re-import __main__ (and with it
+    langchain etc.), so they are started once rather than once per category.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # 'spawn' keeps worker processes free of the parent's threads and open sockets.
+            context = multiprocessing.get_context("spawn")
+            _extract_pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context)
+        return _extract_pool
+
+
+def shutdown_extract_pool():
+    """Stops the shared extraction workers; the next pipeline run starts new ones."""
+    global _extract_pool
+    with _extract_pool_lock:
+        pool, _extract_pool = _extract_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _remove_pdf(pdf_path: str):
+    try:
+        os.remove(pdf_path)
+    except OSError as e:
+        print(f"   ⚠️ Could not delete {pdf_path}: {e}")
+
+
+def extract_pdf_text(index: int, pdf_path: str):
+    """
+    Extracts the full text of a PDF. Runs inside a worker process.
+
+    Returns:
+        (index, text, seconds spent extracting)
+    """
+    start = time.perf_counter()
+    doc = fitz.open(pdf_path)
+    try:
+        # Join the text from all pages into a single string.
+        text = "".join(page.get_text("text") for page in doc)
+    finally:
+        doc.close()
+    return index, text, time.perf_counter() - start
+
+
+class PipelineStats:
+    """Per-stage counters for one pipeline run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.downloaded = 0
+        self.download_seconds = 0.0
+        self.download_failures = 0
+        self.extracted = 0
+        self.extract_seconds = 0.0
+        self.extract_failures = 0
+        # Time download threads spent blocked because extraction was behind.
+        self.backpressure_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def add(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> dict:
+        return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+
+    def report(self):
+        print(f"   ⏱️ PDF pipeline: {self.downloaded} downloaded in {self.download_seconds:.1f}s of download time "
+              f"({self.download_failures} failed), {self.extracted} extracted in {self.extract_seconds:.1f}s of "
+              f"CPU time ({self.extract_failures} failed), {self.backpressure_seconds:.1f}s back-pressure, "
+              f"{self.wall_seconds:.1f}s wall clock.")
+
+
+def stream_paper_texts(papers: list, pdf_dir: str, stats: PipelineStats = None,
+                       download_workers: int = DOWNLOAD_WORKERS, extract_workers: int = EXTRACT_WORKERS,
+                       queue_size: int = PIPELINE_QUEUE_SIZE):
+    """
+    Downloads and extracts the text of arXiv papers as a two-stage streaming pipeline.
+
+    Download threads feed a bounded queue; PDFs are handed from it to the shared
+    process pool (see get_extract_pool) for PyMuPDF extraction, with at most
+    `queue_size` extractions in flight. Results are yielded as soon as each paper
+    is done, in completion order. Every PDF is deleted once it has been extracted.
+
+    Args:
+        papers: arxiv.Result objects to process.
+        pdf_dir: Directory the PDFs are downloaded into.
+        stats: Optional PipelineStats to accumulate per-stage timings into.
+        extract_workers: Size of the extraction pool, if this run creates it.
+
+    Yields:
+        (index into `papers`, extracted text) for every paper that succeeded.
+    """
+    stats = stats or PipelineStats()
+    started = time.perf_counter()
+    todo = queue.Queue()
+    for item in enumerate(papers):
+        todo.put(item)
+    downloaded = queue.Queue(maxsize=queue_size)
+
+    def downloader():
+        while True:
+            try:
+                index, paper = todo.get_nowait()
+            except queue.Empty:
+                break
+            start = time.perf_counter()
+            try:
+                # The download function saves the file and returns the path.
+                pdf_path = paper.download_pdf(dirpath=pdf_dir)
+            except Exception as e:
+                print(f"   ❌ An error occurred downloading paper {paper.entry_id}: {e}")
+                stats.add(download_failures=1)
+                continue
+            stats.add(downloaded=1, download_seconds=time.perf_counter() - start)
+            print(f"   ✅ PDF downloaded to: {pdf_path}")
+            start = time.perf_counter()
+            downloaded.put((index, pdf_path))
+            stats.add(backpressure_seconds=time.perf_counter() - start)
+        downloaded.put(_DONE)
+
+    threads = [threading.Thread(target=downloader, daemon=True) for _ in range(max(1, download_workers))]
+    for thread in threads:
+        thread.start()
+
+    pool = get_extract_pool(extract_workers)
+    finished_downloaders = 0
+    pending = {}
+    try:
+        while finished_downloaders < len(threads) or pending:
+            # Hand downloaded PDFs to the pool, blocking only when there is nothing else to wait for.
+            while finished_downloaders < len(threads) and len(pending) < queue_size:
+                try:
+                    item = downloaded.get(block=not pending)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished_downloaders += 1
+                    continue
+                index, pdf_path = item
+                pending[pool.submit(extract_pdf_text, index, pdf_path)] = (index, pdf_path)
+            if not pending:
+                continue
+            done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, pdf_path = pending.pop(future)
+                _remove_pdf(pdf_path)
+                try:
+                    _, text, seconds = future.result()
+                except Exception as e:
+                    print(f"   ❌ An error occurred extracting paper {papers[index].entry_id}: {e}")
+                    stats.add(extract_failures=1)
+                    if isinstance(e, BrokenProcessPool):
+                        # A crashed worker breaks the whole pool; the next run gets a new one.
+                        shutdown_extract_pool()
+                    continue
+                stats.add(extracted=1, extract_seconds=seconds)
+                yield index, text
+    except BrokenProcessPool:
+        shutdown_extract_pool()
+        raise
+    finally:
+        # Only left over when the caller stops early or the pool broke.
+        for future, (_, pdf_path) in pending.items():
+            future.cancel()
+            _remove_pdf(pdf_path)
+    stats.wall_seconds = time.perf_counter() - started
+    stats.report()
@@ -0,0 +1,121 @@
+import argparse
+import io
+import time
+
+import numpy as np
+from db_pool import get_pool
+from interaction_events import EMBEDDING_DIM, EVENT_WEIGHTS, PROFILE_DECAY, PROFILE_LOCK_KEY, fold_events
+
+# Rows fetched per round trip when streaming the interaction history.
+HISTORY_FETCH_SIZE = 100_000
+
+
+def compute_profiles(user_rows: np.ndarray, paper_rows: np.ndarray, weights: np.ndarray, num_users: int,
+                     paper_vectors: np.ndarray, gamma: float = PROFILE_DECAY) -> np.ndarray:
+    """
+    All users' profiles at once, folding their whole history into empty profiles with
+    interaction_events.fold_events, the rule the consumer and update_user apply too.
+
+    Events must be in chronological order within each user. Paper vectors are looked
+    up per round, so the (events, dim) matrix of event embeddings is never built.
+    """
+    empty = np.zeros((num_users, paper_vectors.shape[1]), dtype=np.float32)
+    return fold_events(empty, user_rows, paper_vectors, weights, gamma, paper_rows=paper_rows)
+
+
+def copy_payload(user_ids: np.ndarray, profiles: np.ndarray) -> io.BytesIO:
+    """
+    COPY ... (FORMAT binary) stream of (id integer, embedding vector) rows, built with
+    one structured array instead of formatting millions of floats as text. pgvector's
+    binary vector is int16 dim, int16 unused, then the float4 values, all big-endian.
+    """
+    dim = profiles.shape[1]
+    row = np.dtype([("fields", ">i2"), ("id_size", ">i4"), ("id", ">i4"),
+                    ("vector_size", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("values", ">f4", (dim,))])
+    rows = np.zeros(len(user_ids), dtype=row)
+    rows["fields"] = 2
+    rows["id_size"] = 4
+    rows["id"] = user_ids
+    rows["vector_size"] = 4 + 4 * dim
+    rows["dim"] = dim
+    rows["values"] = profiles
+    # Signature, flags and header extension length, the rows, then the -1 trailer.
+    return io.BytesIO(b"PGCOPY\n\xff\r\n\x00" + bytes(8) + rows.tobytes() + b"\xff\xff")
+
+
+def _load_papers(cur):
+    cur.execute("SELECT id, embedding FROM papers WHERE embedding IS NOT NULL ORDER BY id")
+    rows = cur.fetchall()
+    paper_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    vectors = np.array([row[1] for row in rows], dtype=np.float32).reshape(len(rows), EMBEDDING_DIM)
+    return paper_ids, vectors
+
+
+def _load_history(conn):
+    """(user_id, kind, paper_id) of every processed event, grouped by user in log order."""
+    user_ids, kinds, paper_ids = [], [], []
+    # A named (server-side) cursor streams the history instead of loading it all at once.
+    with conn.cursor(name="profile_history") as cur:
+        cur.itersize = HISTORY_FETCH_SIZE
+        cur.execute("""SELECT user_id, kind, paper_id FROM interaction_events
+                       WHERE processed_at IS NOT NULL ORDER BY user_id, id""")
+        for user_id, kind, paper_id in cur:
+            user_ids.append(user_id)
+            kinds.append(kind)
+            paper_ids.append(paper_id)
+    return np.array(user_ids, dtype=np.int64), kinds, np.array(paper_ids, dtype=np.int64)
+
+
+def recompute_all_profiles(gamma: float = PROFILE_DECAY, weights: dict = None) -> dict:
+    """
+    Rebuilds every user's embedding from their full read/like history and writes
+    them back with one bulk UPDATE.
+
+    Runs in a single transaction holding PROFILE_LOCK_KEY exclusively, so the
+    interaction_events consumer pauses meanwhile and resumes on top of the new profiles.
+    Users without any history keep their current embedding.
+
+    Returns:
+        Per-stage timings in seconds and the number of users and events processed.
+    """
+    weights = weights or EVENT_WEIGHTS
+    timings = {}
+    start = time.perf_counter()
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (PROFILE_LOCK_KEY,))
+            paper_ids, paper_vectors = _load_papers(cur)
+        event_users, event_kinds, event_papers = _load_history(conn)
+        timings["load"] = time.perf_counter() - start
+        if not len(paper_ids) or not len(event_users):
+            return {"users": 0, "events": 0, "seconds": timings}
+
+        stage = time.perf_counter()
+        # Events for papers that no longer exist are dropped.
+        paper_rows = np.searchsorted(paper_ids, event_papers)
+        known = (paper_rows < len(paper_ids)) & (paper_ids[np.minimum(paper_rows, len(paper_ids) - 1)] == event_papers)
+        user_ids, user_rows = np.unique(event_users[known], return_inverse=True)
+        event_weights = np.array([weights.get(kind, 1.0) for kind in event_kinds], dtype=np.float32)[known]
+        profiles = compute_profiles(user_rows, paper_rows[known], event_weights, len(user_ids), paper_vectors, gamma)
+        timings["compute"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE recomputed_profiles (id INTEGER PRIMARY KEY, embedding vector({EMBEDDING_DIM})) ON COMMIT DROP")
+            cur.copy_expert("COPY recomputed_profiles (id, embedding) FROM STDIN WITH (FORMAT binary)", copy_payload(user_ids, profiles))
+            cur.execute("UPDATE users SET embedding = r.embedding FROM recomputed_profiles r WHERE users.id = r.id")
+            updated = cur.rowcount
+        timings["write"] = time.perf_counter() - stage
+    timings["total"] = time.perf_counter() - start
+    return {"users": updated, "events": int(known.sum()), "seconds": timings}
+
+
+if __name__ == '__main__':
+    # Usage: python profile_recompute.py [--gamma 0.8] [--like-weight 2.0] [--read-weight 1.0]
+    # Meant to run periodically (e.g. nightly) or after changing the profile weights.
+    parser = argparse.ArgumentParser(description="Recompute all user embeddings from their interaction history.")
+    parser.add_argument("--gamma", type=float, default=PROFILE_DECAY)
+    parser.add_argument("--read-weight", type=float, default=EVENT_WEIGHTS["read"])
+    parser.add_argument("--like-weight", type=float, default=EVENT_WEIGHTS["like"])
+    args = parser.parse_args()
+    print(recompute_all_profiles(args.gamma, {"read": args.read_weight, "like": args.like_weight}))
@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """A thread-safe token bucket: `acquire` blocks until a request may be sent."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        # No request is let through before this time (set by `pause`).
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._not_before:
+                    wait = self._not_before - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Holds every request back for `seconds` (used after a 429), then refills from
+        empty. Pauses overlap instead of adding up, so N requests hitting a 429 at
+        once still pause the bucket for `seconds`, not N times as long.
+        """
+        with self._lock:
+            deadline = time.monotonic() + seconds
+            if deadline > self._not_before:
+                self._not_before = deadline
+                self._tokens = min(self._tokens, 0)
+                self._updated = deadline
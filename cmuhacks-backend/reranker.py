@@ -0,0 +1,196 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from db_pool import get_pool
+from ingestion_ledger import parse_entry_id
+
+# --- Configuration ---
+# Candidates fetched from the vector index per re-ranked list (the over-fetch factor
+# is RERANK_CANDIDATES / page size). Offset pages are re-ranked in blocks of this size.
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "100"))
+# Weights of the blended score. Every feature is in [0, 1]; similarity alone (the
+# other weights at 0) reproduces the plain nearest-neighbour order.
+RERANK_WEIGHTS = {
+    "similarity": float(os.environ.get("RERANK_SIMILARITY_WEIGHT", "1.0")),
+    "category": float(os.environ.get("RERANK_CATEGORY_WEIGHT", "0.3")),
+    "recency": float(os.environ.get("RERANK_RECENCY_WEIGHT", "0.15")),
+    "prestige": float(os.environ.get("RERANK_PRESTIGE_WEIGHT", "0.1")),
+}
+# A paper's recency score halves every this many days after its arXiv publication.
+RECENCY_HALF_LIFE_DAYS = float(os.environ.get("RECENCY_HALF_LIFE_DAYS", "30"))
+# Author prestige (daily_update_papers.compute_author_prestige) at which the prestige score is 0.5.
+PRESTIGE_SCALE = float(os.environ.get("PRESTIGE_SCALE", "50"))
+# arXiv categories behind the bits of papers.categories and of users' category
+# preferences. Append only: existing rows are indexed by position.
+CATEGORY_VOCABULARY = os.environ.get(
+    "CATEGORY_VOCABULARY", "cs.AI,cs.LG,cs.CL,cs.CV,cs.RO,cs.IR,cs.NE,cs.CR,cs.HC,stat.ML").split(",")
+
+# SQL for the features a candidate row carries after its distance, in the order rerank_rows expects.
+FEATURE_COLUMNS = "categories, EXTRACT(EPOCH FROM published_at), author_prestige"
+
+_stats_lock = threading.Lock()
+# Latency of each re-ranking stage in this process: [count, total seconds, max seconds].
+_stage_stats = {}
+
+
+def category_bits(arxiv_categories) -> list:
+    """0/1 list over CATEGORY_VOCABULARY for a paper's arXiv categories (e.g. ['cs.LG', 'stat.ML'])."""
+    present = set(arxiv_categories or [])
+    return [1 if category in present else 0 for category in CATEGORY_VOCABULARY]
+
+
+def preference_vector(category_preferences) -> np.ndarray:
+    """
+    A user's category preferences as weights in [0, 1] over CATEGORY_VOCABULARY.
+    Accepts a 0/1 (or weight) list aligned with the vocabulary, or arXiv category names.
+    """
+    preferences = list(category_preferences or [])
+    if preferences and all(isinstance(p, str) for p in preferences):
+        preferences = category_bits(preferences)
+    vector = np.zeros(len(CATEGORY_VOCABULARY), dtype=np.float32)
+    size = min(len(preferences), len(vector))
+    vector[:size] = np.clip(np.asarray(preferences[:size], dtype=np.float32), 0, 1)
+    return vector
+
+
+def _floats(values) -> np.ndarray:
+    """Column of nullable numbers as float64, NULL as NaN."""
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+
+def _category_matrix(rows) -> np.ndarray:
+    matrix = np.zeros((len(rows), len(CATEGORY_VOCABULARY)), dtype=np.float32)
+    for i, bits in enumerate(rows):
+        if bits:
+            bits = bits[:len(CATEGORY_VOCABULARY)]
+            matrix[i, :len(bits)] = bits
+    return matrix
+
+
+def score_candidates(distances, categories, published, prestige, category_preferences,
+                     weights: dict = None, now: float = None) -> np.ndarray:
+    """
+    Blended score of a batch of candidates, higher is better:
+
+        similarity  1 - cosine distance to the user's embedding
+        category    share of the paper's categories the user prefers
+        recency     0.5 ** (age in days / RECENCY_HALF_LIFE_DAYS)
+        prestige    prestige / (prestige + PRESTIGE_SCALE)
+
+    Missing values (no user embedding, no publication date or prestige recorded)
+    score 0 for that feature.
+
+    Args:
+        distances: (n,) cosine distances.
+        categories: n category bit lists (papers.categories).
+        published: (n,) publication times in epoch seconds.
+        prestige: (n,) author prestige values.
+    """
+    weights = weights or RERANK_WEIGHTS
+    now = time.time() if now is None else now
+    similarity = 1.0 - _floats(distances)
+    bits = _category_matrix(categories)
+    category = (bits @ preference_vector(category_preferences)) / np.maximum(bits.sum(axis=1), 1)
+    age_days = np.maximum(now - _floats(published), 0) / 86400
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    prestige = _floats(prestige)
+    prestige = prestige / (prestige + PRESTIGE_SCALE)
+    features = {"similarity": similarity, "category": category, "recency": recency, "prestige": prestige}
+    return sum(weights.get(name, 0.0) * np.nan_to_num(np.maximum(values, 0)) for name, values in features.items())
+
+
+def rerank_rows(rows: list, category_preferences, block_size: int = None, weights: dict = None) -> list:
+    """
+    Re-orders candidate rows by score_candidates.
+
+    Each row must end with (distance, categories, published epoch, prestige), i.e.
+    `embedding <=> q` followed by FEATURE_COLUMNS, and the rows must come in
+    nearest-neighbour order. With `block_size`, every consecutive block of that many
+    rows is re-ranked on its own, so offset pages stay consistent with each other.
+    Ties keep the nearest-neighbour order.
+    """
+    if not rows:
+        return []
+    with timed_stage("score"):
+        columns = list(zip(*(row[-4:] for row in rows)))
+        scores = score_candidates(*columns, category_preferences, weights=weights)
+        block_size = block_size or len(rows)
+        block = np.arange(len(rows)) // block_size
+        order = np.lexsort((-scores, block))
+    return [rows[i] for i in order]
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Adds the duration of the block to the latency stats of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with _stats_lock:
+            stats = _stage_stats.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+
+def rerank_stats() -> dict:
+    """Per-stage latency of recommendation requests in this process, plus the current settings."""
+    with _stats_lock:
+        stages = {stage: {"count": count, "avg_ms": 1000 * total / count, "max_ms": 1000 * longest}
+                  for stage, (count, total, longest) in _stage_stats.items()}
+    return {"stages": stages, "candidates": RERANK_CANDIDATES, "weights": RERANK_WEIGHTS}
+
+
+def paper_features(ids: list) -> dict:
+    """{id: (categories, published epoch, prestige)} for papers scored outside a pgvector query."""
+    if not ids:
+        return {}
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT id, {FEATURE_COLUMNS} FROM papers WHERE id = ANY(%s)", (list(ids),))
+            return {row[0]: row[1:] for row in cur.fetchall()}
+
+
+def backfill_paper_metadata(batch_size: int = 100) -> int:
+    """
+    Replaces the placeholder category bits of papers ingested before categories were
+    recorded, and fills in their publication date, from arXiv. Papers are matched
+    through the ingestion ledger; author prestige is left empty (it needs the
+    Semantic Scholar lookup). Returns the number of papers updated.
+    """
+    import arxiv
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""SELECT l.arxiv_id, l.paper_id FROM ingestion_ledger l JOIN papers p ON p.id = l.paper_id
+                           WHERE p.published_at IS NULL""")
+            pending = dict(cur.fetchall())
+    client = arxiv.Client()
+    arxiv_ids = list(pending)
+    updated = 0
+    for start in range(0, len(arxiv_ids), batch_size):
+        batch = arxiv_ids[start:start + batch_size]
+        results = client.results(arxiv.Search(id_list=batch, max_results=len(batch)))
+        rows = [(category_bits(result.categories), result.published, pending[parse_entry_id(result.entry_id)[0]])
+                for result in results if parse_entry_id(result.entry_id)[0] in pending]
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany("UPDATE papers SET categories = %s, published_at = %s WHERE id = %s", rows)
+        updated += len(rows)
+        print(f"Backfilled {updated} of {len(arxiv_ids)} papers.")
+    return updated
+
+
+if __name__ == '__main__':
+    # Usage: python reranker.py backfill
+    command = sys.argv[1] if len(sys.argv) > 1 else "backfill"
+    if command != "backfill":
+        print(f"Unknown command: {command}")
+        sys.exit(1)
+    backfill_paper_metadata()
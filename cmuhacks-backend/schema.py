@@ -0,0 +1,260 @@
+import math
+import os
+import re
+import sys
+
+from db_pool import get_pool
+
+# --- ANN index configuration ---
+# 'hnsw' gives the best recall/latency trade-off and needs no retraining as
+# the table grows; 'ivfflat' builds faster and uses less memory, but its list
+# count has to follow the row count.
+PAPER_INDEX_METHOD = os.environ.get("PAPER_INDEX_METHOD", "hnsw")
+PAPER_INDEX_NAME = "papers_embedding_cosine_idx"
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "64"))
+# Default per-query search breadth. Higher = better recall, slower queries.
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "40"))
+IVFFLAT_PROBES = int(os.environ.get("IVFFLAT_PROBES", "10"))
+# pgvector >= 0.8 can keep scanning the HNSW graph when a WHERE clause filters
+# out candidates ('relaxed_order' or 'strict_order'). The keyset feed filters out
+# everything closer than its cursor, so without it an HNSW scan stops after
+# ef_search candidates and the feed ends there. Leave unset on older servers.
+HNSW_ITERATIVE_SCAN = os.environ.get("HNSW_ITERATIVE_SCAN")
+# An IVFFlat index is rebuilt once the ideal list count drifts this far from the built one.
+IVFFLAT_REBUILD_RATIO = 2.0
+# Whether the web app and the ingestion runner run ensure_schema when they start.
+ENSURE_SCHEMA_ON_STARTUP = os.environ.get("ENSURE_SCHEMA_ON_STARTUP", "1") == "1"
+# Key for pg_advisory_lock, so processes starting together migrate one at a time.
+SCHEMA_LOCK_KEY = 7_301_643
+
+
+# Supporting tables, created by ensure_schema. Every statement must be idempotent.
+TABLE_DDL = [
+    # One row per arXiv paper the ingestion jobs have seen, so re-runs skip
+    # papers that were already processed (see ingestion_ledger.py).
+    """CREATE TABLE IF NOT EXISTS ingestion_ledger (
+        arxiv_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        content_hash TEXT,
+        paper_id INTEGER,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )""",
+    # Stored definitions for highlighted terms (see glossary.py). paper_id 0 means
+    # the definition doesn't depend on the paper; 'glossary' rows are pre-defined
+    # per paper at ingestion, 'highlight' rows are saved from live requests.
+    """CREATE TABLE IF NOT EXISTS term_definitions (
+        term TEXT NOT NULL,
+        paper_id INTEGER NOT NULL DEFAULT 0,
+        definition TEXT NOT NULL,
+        source TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (term, paper_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS term_definitions_paper_idx ON term_definitions (paper_id) WHERE source = 'glossary'",
+    # Append-only log of reads and likes. /update_user_profile only inserts here;
+    # interaction_events.py folds pending events into users.embedding in batches.
+    # Processed events are kept as the users' interaction history.
+    """CREATE TABLE IF NOT EXISTS interaction_events (
+        id BIGSERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        paper_id INTEGER NOT NULL,
+        kind TEXT NOT NULL DEFAULT 'read',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        processed_at TIMESTAMPTZ
+    )""",
+    "CREATE INDEX IF NOT EXISTS interaction_events_pending_idx ON interaction_events (id) WHERE processed_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS interaction_events_user_idx ON interaction_events (user_id, id)",
+    # Re-ranking features of each paper (see reranker.py), next to the arXiv category
+    # bits in papers.categories. NULL for papers ingested before they were recorded.
+    "ALTER TABLE papers ADD COLUMN IF NOT EXISTS published_at TIMESTAMPTZ",
+    "ALTER TABLE papers ADD COLUMN IF NOT EXISTS author_prestige REAL",
+    # When a paper's embedding was last overwritten (a new arXiv version), so
+    # vector_index.LocalVectorIndex.refresh can pick up changed rows, not just new ones.
+    "ALTER TABLE papers ADD COLUMN IF NOT EXISTS embedding_updated_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS papers_embedding_updated_at_idx ON papers (embedding_updated_at)",
+]
+
+
+def ivfflat_lists_for(row_count: int) -> int:
+    """pgvector's recommended list count: rows / 1000 up to 1M rows, sqrt(rows) after."""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def _index_ddl(method: str, row_count: int, name: str = PAPER_INDEX_NAME, concurrently: bool = False) -> str:
+    how = "CONCURRENTLY " if concurrently else ""
+    if method == "hnsw":
+        return (f"CREATE INDEX {how}IF NOT EXISTS {name} ON papers USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})")
+    if method == "ivfflat":
+        return (f"CREATE INDEX {how}IF NOT EXISTS {name} ON papers USING ivfflat (embedding vector_cosine_ops) "
+                f"WITH (lists = {ivfflat_lists_for(row_count)})")
+    raise ValueError(f"Unknown index method: {method}")
+
+
+def _run_autocommit(statements: list):
+    """Runs statements outside a transaction (required by CREATE/REINDEX ... CONCURRENTLY)."""
+    with get_pool().connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in statements:
+                    print(f"  -> {statement}")
+                    cur.execute(statement)
+        finally:
+            conn.autocommit = False
+
+
+def _current_index():
+    """(definition, valid) of the ANN index on papers, or None if there is none."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""SELECT pg_get_indexdef(c.oid), i.indisvalid
+                           FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+                           WHERE c.relname = %s AND i.indrelid = 'papers'::regclass""",
+                        (PAPER_INDEX_NAME,))
+            row = cur.fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def _paper_count() -> int:
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM papers")
+            return cur.fetchone()[0]
+
+
+def ensure_schema():
+    """
+    Creates the pgvector extension, the supporting tables and the ANN index on
+    papers.embedding if they are missing. Safe to run repeatedly.
+    """
+    _run_autocommit(["CREATE EXTENSION IF NOT EXISTS vector"] + TABLE_DDL)
+    ensure_paper_embedding_index()
+
+
+def ensure_schema_on_startup():
+    """
+    Runs ensure_schema when a process starts (unless ENSURE_SCHEMA_ON_STARTUP is off),
+    so queries that read the newer columns never meet an unmigrated database.
+    Processes starting at the same time take turns through an advisory lock.
+    A failure is reported, not raised; `python schema.py migrate` retries it.
+    """
+    if not ENSURE_SCHEMA_ON_STARTUP:
+        return
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_LOCK_KEY,))
+            try:
+                ensure_schema()
+            finally:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (SCHEMA_LOCK_KEY,))
+                conn.commit()
+    except Exception as e:
+        print(f"Schema migration failed, run `python schema.py migrate`: {e}")
+
+
+def ensure_paper_embedding_index(method: str = PAPER_INDEX_METHOD):
+    """
+    Builds the cosine ANN index on papers.embedding without blocking writers, if it doesn't exist.
+
+    A CREATE INDEX CONCURRENTLY that failed leaves an invalid index behind, which
+    queries never use; it is dropped and built again.
+    """
+    index = _current_index()
+    if index is not None and index[1]:
+        return
+    statements = []
+    if index is not None:
+        print(f"Dropping invalid index {PAPER_INDEX_NAME}...")
+        statements.append(f"DROP INDEX CONCURRENTLY IF EXISTS {PAPER_INDEX_NAME}")
+    print(f"Creating {method} index on papers.embedding...")
+    _run_autocommit(statements + [_index_ddl(method, _paper_count(), concurrently=True)])
+
+
+def maintain_paper_embedding_index(method: str = PAPER_INDEX_METHOD, force_reindex: bool = False):
+    """
+    Keeps the ANN index healthy as the papers table grows. Meant to run after each ingestion.
+
+    - Creates the index if it is missing or invalid.
+    - For IVFFlat, rebuilds it when the table has grown (or shrunk) enough that the
+      list count no longer matches, since IVFFlat centroids are fixed at build time.
+    - For HNSW, the graph is maintained on insert, so only statistics are refreshed
+      unless `force_reindex` is set.
+
+    The rebuild builds a replacement index concurrently, then swaps the names in one
+    transaction and only then drops the old index, so there is always a valid ANN
+    index to serve recommendations.
+    """
+    index = _current_index()
+    if index is None or not index[1]:
+        ensure_paper_embedding_index(method)
+        return
+    index_def = index[0]
+    row_count = _paper_count()
+    built_method = "hnsw" if "USING hnsw" in index_def else "ivfflat"
+    rebuild = force_reindex or built_method != method
+    if not rebuild and built_method == "ivfflat":
+        match = re.search(r"lists\s*=\s*'?(\d+)", index_def)
+        built_lists = int(match.group(1)) if match else 1
+        wanted_lists = ivfflat_lists_for(row_count)
+        ratio = max(wanted_lists, built_lists) / max(1, min(wanted_lists, built_lists))
+        rebuild = ratio >= IVFFLAT_REBUILD_RATIO
+        print(f"IVFFlat index has {built_lists} lists, {wanted_lists} wanted for {row_count} rows.")
+
+    statements = []
+    if rebuild:
+        tmp_name, old_name = PAPER_INDEX_NAME + "_new", PAPER_INDEX_NAME + "_old"
+        print(f"Rebuilding {method} index on papers.embedding ({row_count} rows)...")
+        statements += [
+            # Leftovers of an interrupted rebuild.
+            f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}",
+            _index_ddl(method, row_count, name=tmp_name, concurrently=True),
+            # Both renames go in one query string, which Postgres runs as one transaction.
+            f"ALTER INDEX {PAPER_INDEX_NAME} RENAME TO {old_name}; ALTER INDEX {tmp_name} RENAME TO {PAPER_INDEX_NAME}",
+            f"DROP INDEX CONCURRENTLY {old_name}",
+        ]
+    statements.append("ANALYZE papers")
+    _run_autocommit(statements)
+
+
+def apply_search_settings(cur, ef_search: int = None, probes: int = None, strict_order: bool = False):
+    """
+    Sets the ANN search breadth for the current transaction only (SET LOCAL), so
+    pooled connections never leak per-query settings to the next request.
+
+    Args:
+        cur: A cursor on the connection that will run the nearest-neighbour query.
+        ef_search: HNSW candidate list size. Defaults to HNSW_EF_SEARCH.
+        probes: Number of IVFFlat lists to scan. Defaults to IVFFLAT_PROBES.
+        strict_order: Run an enabled HNSW iterative scan in 'strict_order' mode, for
+            queries that rely on rows coming back in exact distance order.
+    """
+    if PAPER_INDEX_METHOD == "hnsw":
+        cur.execute("SET LOCAL hnsw.ef_search = %s", (int(ef_search or HNSW_EF_SEARCH),))
+        if HNSW_ITERATIVE_SCAN:
+            mode = "strict_order" if strict_order else HNSW_ITERATIVE_SCAN
+            cur.execute("SET LOCAL hnsw.iterative_scan = %s", (mode,))
+    else:
+        cur.execute("SET LOCAL ivfflat.probes = %s", (int(probes or IVFFLAT_PROBES),))
+
+
+if __name__ == '__main__':
+    # Usage: python schema.py [migrate|maintain|reindex]
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        ensure_schema()
+    elif command == "maintain":
+        maintain_paper_embedding_index()
+    elif command == "reindex":
+        maintain_paper_embedding_index(force_reindex=True)
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
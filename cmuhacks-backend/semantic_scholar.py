@@ -0,0 +1,108 @@
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from kv_cache import PersistentCache
+from rate_limit import TokenBucket
+
+# --- Configuration ---
+API_URL = 'https://api.semanticscholar.org/graph/v1/author/search'
+S2_API_KEY = os.environ.get("S2_API_KEY")
+# Sustained request rate and burst size shared by every lookup in this process.
+S2_RATE_PER_SECOND = float(os.environ.get("S2_RATE_PER_SECOND", "1"))
+S2_BURST = int(os.environ.get("S2_BURST", "1"))
+S2_MAX_WORKERS = int(os.environ.get("S2_MAX_WORKERS", "4"))
+S2_MAX_RETRIES = 5
+# Author metrics move slowly; re-check found authors weekly and unknown names daily.
+AUTHOR_CACHE_TTL = 7 * 24 * 3600
+AUTHOR_MISS_TTL = 24 * 3600
+
+
+_bucket = TokenBucket(S2_RATE_PER_SECOND, S2_BURST)
+_author_cache = None
+_author_cache_lock = threading.Lock()
+
+
+def _cache():
+    global _author_cache
+    if _author_cache is None:
+        with _author_cache_lock:
+            if _author_cache is None:
+                _author_cache = PersistentCache("author_prestige", default_ttl=AUTHOR_CACHE_TTL)
+    return _author_cache
+
+
+def _cache_key(author_name: str) -> str:
+    return " ".join(author_name.lower().split())
+
+
+def fetch_author(author_name: str):
+    """
+    Looks an author up on Semantic Scholar, retrying with exponential backoff on
+    HTTP 429 and 5xx responses.
+
+    Returns:
+        A dict with 'name', 'hIndex', 'citationCount' and 'url' for the best match,
+        or None if Semantic Scholar has no profile for the name.
+    """
+    headers = {'x-api-key': S2_API_KEY} if S2_API_KEY else {}
+    params = {'query': author_name, 'fields': 'name,hIndex,citationCount,url'}
+    for attempt in range(S2_MAX_RETRIES):
+        _bucket.acquire()
+        response = requests.get(API_URL, params=params, headers=headers, timeout=30)
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+            delay += random.uniform(0, 1)
+            print(f"     ⏳ Semantic Scholar returned {response.status_code} for {author_name}; retrying in {delay:.1f}s")
+            # The next acquire() waits out the pause, for this and every other lookup.
+            _bucket.pause(delay)
+            continue
+        response.raise_for_status()
+        data = response.json()
+        # The API returns a list of potential authors. We'll take the first one.
+        # This is a "best guess" as names can be ambiguous.
+        if data.get('data'):
+            return data['data'][0]
+        return None
+    raise requests.exceptions.RetryError(f"Gave up on {author_name} after {S2_MAX_RETRIES} attempts")
+
+
+def get_author_profile(author_name: str):
+    """Returns the cached Semantic Scholar profile for an author, fetching it on a cache miss."""
+    cache = _cache()
+    key = _cache_key(author_name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached.get('profile')
+    profile = fetch_author(author_name)
+    cache.set(key, {'profile': profile}, ttl=AUTHOR_CACHE_TTL if profile else AUTHOR_MISS_TTL)
+    return profile
+
+
+def get_author_profiles(author_names: list, max_workers: int = S2_MAX_WORKERS) -> dict:
+    """
+    Looks up many authors concurrently (bounded by `max_workers` and the shared token bucket).
+    Each distinct name is fetched at most once, and cached names are not fetched at all.
+
+    Returns:
+        A dict mapping each name to its profile dict, or None if it was not found or the lookup failed.
+    """
+    names = list(dict.fromkeys(author_names))
+
+    def lookup(name):
+        try:
+            return name, get_author_profile(name)
+        except Exception as e:
+            print(f"     ❗️ An error occurred while calling the API for {name}: {e}\n")
+            return name, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(lookup, names))
+
+
+def author_cache_stats() -> dict:
+    return _cache().stats()
@@ -0,0 +1,150 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# The backend modules import each other as top-level modules (`from db_pool import get_pool`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The Gemini clients are built at import time and refuse to start without a key;
+# no test talks to the API.
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+# Importing the Flask app must not try to migrate a database.
+os.environ.setdefault("ENSURE_SCHEMA_ON_STARTUP", "0")
+
+# Set TEST_DATABASE_URL to a disposable Postgres database with pgvector to run the
+# tests marked `needs_db`; they are skipped otherwise.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+needs_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+class FakeCursor:
+    """
+    Records every statement and answers fetches from a script: `responses` is a
+    list of (sql substring, rows) pairs, the first pair whose substring appears in
+    the last executed statement supplies fetchall/fetchone.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = responses or []
+        self.executed = []
+        self.rowcount = 0
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        self._rows = next((list(rows) for marker, rows in self.responses if marker in sql), [])
+        self.rowcount = len(self._rows)
+
+    def executemany(self, sql, rows):
+        for row in rows:
+            self.execute(sql, row)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self.cursor_obj = cursor
+        self.closed = 0
+
+    def cursor(self, name=None):
+        return self.cursor_obj
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """Stands in for db_pool.get_pool(): every connection shares one scripted FakeCursor."""
+
+    def __init__(self, responses=None):
+        self.cursor = FakeCursor(responses)
+        self.returned = []
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self.cursor)
+
+    def getconn(self):
+        return FakeConnection(self.cursor)
+
+    def putconn(self, conn, discard=False):
+        self.returned.append((conn, discard))
+
+    def statements(self, marker: str = "") -> list:
+        return [(sql, params) for sql, params in self.cursor.executed if marker in sql]
+
+
+@pytest.fixture
+def fake_pool():
+    """Factory: fake_pool(module, responses) patches `module.get_pool` with a FakePool and returns it."""
+    patches = []
+
+    def install(module, responses=None):
+        pool = FakePool(responses)
+        patches.append((module, module.get_pool))
+        module.get_pool = lambda: pool
+        return pool
+
+    yield install
+    for module, original in reversed(patches):
+        module.get_pool = original
+
+
+@pytest.fixture
+def pg_papers():
+    """
+    Factory for a TEST_DATABASE_URL connection whose temporary `papers` and `users`
+    tables (they shadow real ones for the session) hold the given vectors, with an
+    HNSW index on papers.embedding. Call it with {paper_id: vector} and the user's vector.
+    """
+    import psycopg2
+    from pgvector.psycopg2 import register_vector
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+
+    def load(papers: dict, user_vector, user_id: int = 1):
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            conn.commit()
+            register_vector(conn)
+            cur.execute("CREATE TEMP TABLE papers (id INTEGER PRIMARY KEY, title TEXT, html_string TEXT, "
+                        "arxiv_link TEXT, liked_count INTEGER DEFAULT 0, embedding vector(384), "
+                        "categories INTEGER[], published_at TIMESTAMPTZ, author_prestige REAL)")
+            cur.execute("CREATE TEMP TABLE users (id INTEGER PRIMARY KEY, embedding vector(384))")
+            execute_values(cur, "INSERT INTO papers (id, title, embedding) VALUES %s",
+                           [(paper_id, f"paper {paper_id}", vector) for paper_id, vector in papers.items()])
+            cur.execute("INSERT INTO users (id, embedding) VALUES (%s, %s)", (user_id, user_vector))
+            cur.execute("CREATE INDEX ON papers USING hnsw (embedding vector_cosine_ops)")
+            cur.execute("ANALYZE papers")
+        conn.commit()
+        return conn
+
+    yield load
+    conn.close()
+
+
+@pytest.fixture
+def client():
+    """A Flask test client for flask_app."""
+    import flask_app
+    flask_app.app.config["TESTING"] = True
+    return flask_app.app.test_client()
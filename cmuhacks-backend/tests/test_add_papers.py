@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import database_handler
+import vector_index
+from vector_index import LocalVectorIndex
+
+
+def paper(title, paper_id=None):
+    return {"embedding_text": title, "title": title, "paper_body": f"<p>{title}</p>",
+            "arxiv_link": f"https://arxiv.org/pdf/{title}", "categories": ["cs.LG"], "paper_id": paper_id}
+
+
+@pytest.fixture
+def store(fake_pool, monkeypatch):
+    """add_papers against a FakePool; `stored` holds the ids an UPDATE finds."""
+    fake_pool(database_handler)
+    calls = {"stored": {7}, "statements": [], "next_id": 100}
+
+    def fake_execute_values(cur, sql, rows, template=None, page_size=None, fetch=False):
+        calls["statements"].append((sql.split()[0], rows))
+        if sql.startswith("UPDATE"):
+            return [(row[0],) for row in rows if row[0] in calls["stored"]]
+        ids = list(range(calls["next_id"], calls["next_id"] + len(rows)))
+        calls["next_id"] += len(rows)
+        return [(paper_id,) for paper_id in ids]
+
+    monkeypatch.setattr(database_handler, "execute_values", fake_execute_values)
+    monkeypatch.setattr(database_handler, "encode",
+                        lambda texts, batch_size=64: np.eye(len(texts), 384, dtype=np.float32))
+    invalidated = []
+    monkeypatch.setattr(database_handler, "invalidate_paper", invalidated.append)
+    calls["invalidated"] = invalidated
+    index = LocalVectorIndex()
+    index.add(7, np.ones(384, dtype=np.float32))
+    monkeypatch.setattr(database_handler, "get_local_index", lambda: index)
+    calls["index"] = index
+    return calls
+
+
+def test_new_version_overwrites_the_stored_row(store):
+    ids = database_handler.add_papers([paper("fresh"), paper("revised", paper_id=7)])
+    assert ids == [100, 7]
+    kinds = [kind for kind, _ in store["statements"]]
+    assert kinds == ["UPDATE", "INSERT"]
+    update_rows = store["statements"][0][1]
+    assert [row[0] for row in update_rows] == [7]
+    assert sorted(store["invalidated"]) == [7, 100]
+    # The local index replaced paper 7's vector instead of adding a second row for it.
+    assert len(store["index"]) == 2
+    assert store["index"].search(np.eye(1, 384, 1)[0], 1)[0][0] == 7
+
+
+def test_deleted_row_is_inserted_again(store):
+    ids = database_handler.add_papers([paper("revised", paper_id=8)])
+    assert ids == [100]
+    assert [kind for kind, _ in store["statements"]] == ["UPDATE", "INSERT"]
+
+
+def test_batch_is_encoded_and_inserted_at_once(store, monkeypatch):
+    encoded = []
+
+    def fake_encode(texts, batch_size=64):
+        encoded.append(list(texts))
+        return np.eye(len(texts), 384, dtype=np.float32)
+
+    monkeypatch.setattr(database_handler, "encode", fake_encode)
+    batch = [paper("a"), paper("b"), {**paper("no text"), "embedding_text": ""}, paper("c")]
+    assert database_handler.add_papers(batch) == [100, 101, 102]
+    assert encoded == [["a", "b", "c"]]
+    (kind, rows), = store["statements"]
+    assert kind == "INSERT" and [row[0] for row in rows] == ["a", "b", "c"]
+
+
+def test_refresh_picks_up_rows_overwritten_by_another_process(fake_pool):
+    old, new, added = np.eye(3, 384, dtype=np.float32)
+    fake_pool(vector_index, [("SELECT now()", [("t0",)]), ("FROM papers", [(1, old), (2, old)])])
+    index = LocalVectorIndex()
+    index.load()
+
+    # Paper 2 got a new version elsewhere and paper 3 was inserted.
+    pool = fake_pool(vector_index, [("SELECT now()", [("t1",)]), ("FROM papers", [(2, new), (3, added)])])
+    assert index.refresh() == 2
+    sql, params = pool.cursor.executed[-1]
+    assert "embedding_updated_at >" in sql and params[:2] == (2, "t0")
+    assert [paper_id for paper_id, _ in index.search(new, 1)] == [2]
+    assert len(index) == 3
+    assert index._fetched_at == "t1"
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import ai_summarizer
+import daily_update_papers
+import ingestion_ledger
+
+
+def test_a_failed_pre_summary_only_fails_its_paper(monkeypatch):
+    papers = [SimpleNamespace(entry_id=f"http://arxiv.org/abs/2401.0000{i}v1", title=f"T{i}", summary="abstract",
+                              pdf_url=f"pdf{i}") for i in range(3)]
+    texts = ["short", "long broken", "long fine"]
+    recorded = []
+    monkeypatch.setattr(ingestion_ledger, "filter_new_papers", lambda papers: papers)
+    monkeypatch.setattr(ingestion_ledger, "unchanged_papers", lambda papers, texts: set())
+    monkeypatch.setattr(ingestion_ledger, "record", lambda ids, status, *args: recorded.append((list(ids), status)))
+    monkeypatch.setattr(daily_update_papers, "get_top_papers_from_authors", lambda papers: (papers, texts))
+    monkeypatch.setattr(ai_summarizer, "count_tokens", lambda text, llm: 10**6 if text.startswith("long") else 1)
+    monkeypatch.setattr(ai_summarizer, "chunk_text", lambda text, limit: [text])
+
+    def cached_batch(prompt, llm, inputs_list):
+        return [ValueError("blocked") if "broken" in str(inputs) else "condensed" for inputs in inputs_list]
+
+    monkeypatch.setattr(ai_summarizer, "cached_batch", cached_batch)
+    summarized = []
+    monkeypatch.setattr(daily_update_papers, "summarize_with_budget",
+                        lambda text, condensed_text=None: summarized.append((text, condensed_text)) or f"summary of {text}")
+
+    _, titles, _, summaries, _ = daily_update_papers.process_recent_papers(papers)
+
+    assert titles == ["T0", "T2"]
+    assert sorted(summarized) == [("long fine", "condensed"), ("short", "short")]
+    assert ([papers[1].entry_id], "failed") in recorded
+    assert not any(status == "failed" and papers[1].entry_id not in ids for ids, status in recorded)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, PoolExhaustedError
+
+
+class StubConnection:
+    def __init__(self):
+        self.closed = 0
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(db_pool.psycopg2, "connect", lambda **kwargs: StubConnection())
+    monkeypatch.setattr(db_pool, "register_vector", lambda conn: None)
+    return ConnectionPool({}, max_size=2, idle_timeout=60, checkout_timeout=0.05)
+
+
+def test_checkout_after_idle_eviction(pool, monkeypatch):
+    first = pool.getconn()
+    pool.putconn(first)
+    # Jump past the idle timeout so the next checkout evicts the idle connection.
+    now = time.monotonic()
+    monkeypatch.setattr(db_pool.time, "monotonic", lambda: now + 120)
+    second = pool.getconn()
+    assert first.closed
+    assert second is not first
+    assert pool.stats["evicted"] == 1
+    pool.putconn(second)
+    third = pool.getconn()
+    fourth = pool.getconn()
+    with pytest.raises(PoolExhaustedError):
+        pool.getconn()
+    pool.putconn(third)
+    pool.putconn(fourth)
+
+
+def test_closeall_keeps_the_size_bound(pool):
+    conns = [pool.getconn(), pool.getconn()]
+    for conn in conns:
+        pool.putconn(conn)
+    pool.closeall()
+    assert all(conn.closed for conn in conns)
+    held = [pool.getconn(), pool.getconn()]
+    with pytest.raises(PoolExhaustedError):
+        pool.getconn()
+    for conn in held:
+        pool.putconn(conn)
+
+
+def test_connection_context_reuses_connections(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert pool.stats == {"opened": 1, "reused": 1, "evicted": 0, "failed_health_checks": 0}
+
+
+def test_counters_add_up_under_concurrent_checkouts(monkeypatch):
+    monkeypatch.setattr(db_pool.psycopg2, "connect", lambda **kwargs: StubConnection())
+    monkeypatch.setattr(db_pool, "register_vector", lambda conn: None)
+    pool = ConnectionPool({}, max_size=4, idle_timeout=60, checkout_timeout=5)
+
+    def worker():
+        for _ in range(500):
+            with pool.connection():
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.stats["opened"] + pool.stats["reused"] == 8 * 500
@@ -0,0 +1,46 @@
+import json
+
+import ai_summarizer
+import glossary
+from llm_retry import LLMUnavailableError
+
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n")
+        parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+def test_definition_is_streamed_token_by_token(client, monkeypatch):
+    monkeypatch.setattr(glossary, "define_term_stream",
+                        lambda text, paper_id=None, max_attempts=None: iter([("llm", "A "), ("llm", ""), ("llm", "thing.")]))
+    response = client.post("/prompt_about_text/stream", json={"text": "widget"})
+    assert response.mimetype == "text/event-stream"
+    received = events(response)
+    assert received[:2] == [("token", {"text": "A "}), ("token", {"text": "thing."})]
+    assert received[2][0] == "done" and received[2][1]["source"] == "llm"
+
+
+def test_unavailable_llm_ends_the_stream_with_an_error(client, monkeypatch):
+    def failing(text, paper_id=None, max_attempts=None):
+        raise LLMUnavailableError("breaker open")
+        yield
+
+    monkeypatch.setattr(glossary, "define_term_stream", failing)
+    (event, payload), = events(client.post("/prompt_about_text/stream", json={"text": "widget"}))
+    assert event == "error" and "temporarily unavailable" in payload["error"]
+
+
+def test_streamed_definition_is_stored_once_complete(fake_pool, monkeypatch):
+    pool = fake_pool(glossary)
+    monkeypatch.setattr(ai_summarizer, "stream_unclear_terms", lambda text, max_attempts=None: iter(["A ", "thing."]))
+    assert list(glossary.define_term_stream("Widget")) == [("llm", "A "), ("llm", "thing.")]
+    (_, stored), = pool.statements("INSERT INTO term_definitions")
+    assert stored[2] == "A thing."
+
+
+def test_stored_definition_arrives_as_one_piece(fake_pool):
+    fake_pool(glossary, [("FROM term_definitions", [("widget", 0, "A stored thing.")])])
+    assert list(glossary.define_term_stream("widget")) == [("storage", "A stored thing.")]
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+import embedding_model
+
+
+def test_importing_the_app_does_not_load_the_model():
+    code = "import database_handler, embedding_model, sys; print('sentence_transformers' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(embedding_model.__file__)), check=True)
+    assert result.stdout.strip().endswith("False")
+
+
+def test_model_is_loaded_once_across_threads(monkeypatch):
+    loads = []
+
+    class SentenceTransformer:
+        def __init__(self, name):
+            loads.append(name)
+            time.sleep(0.05)
+
+        def encode(self, texts, batch_size=64):
+            return np.ones((len(texts), 384), dtype=np.float32)
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=SentenceTransformer))
+    monkeypatch.setattr(embedding_model, "_model", None)
+    monkeypatch.setattr(embedding_model, "EMBEDDING_SERVICE_URL", None)
+    threads = [threading.Thread(target=embedding_model.get_model) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [embedding_model.MODEL_NAME]
+    assert embedding_model.encode("one text").shape == (384,)
+    assert embedding_model.encode(["a", "b"]).shape == (2, 384)
+    assert embedding_model.embedding_stats()["loaded"]
+
+
+def test_service_backend_skips_the_local_model(monkeypatch):
+    monkeypatch.setattr(embedding_model, "_model", None)
+    monkeypatch.setattr(embedding_model, "EMBEDDING_SERVICE_URL", "http://127.0.0.1:5050")
+    monkeypatch.setattr(embedding_model, "_encode_remote", lambda texts: np.zeros((len(texts), 384), dtype=np.float32))
+    assert embedding_model.encode(["a", "b", "c"]).shape == (3, 384)
+    assert embedding_model._model is None
+    assert embedding_model.embedding_stats()["backend"] == "service"
@@ -0,0 +1,56 @@
+import flask_app
+import database_handler
+
+
+def test_get_papers_keeps_the_requested_order_in_one_query(fake_pool):
+    pool = fake_pool(database_handler, [("FROM papers", [(2, "second"), (1, "first")])])
+    papers = database_handler.get_papers([1, 3, 2], ["title"])
+    assert papers == [{"id": 1, "title": "first"}, {"id": 2, "title": "second"}]
+    (sql, params), = pool.cursor.executed
+    assert sql == "SELECT id AS id, title AS title FROM papers WHERE id = ANY(%s)"
+    assert params == ([1, 3, 2],)
+
+
+def test_feed_returns_hydrated_papers_and_the_next_cursor(client, monkeypatch):
+    calls = []
+
+    def fake_feed(user_id, categories, batch_size, cursor, fields=None, ef_search=None, probes=None):
+        calls.append((user_id, batch_size, cursor, fields))
+        return [{"id": 4, "title": "A paper"}], "next"
+
+    monkeypatch.setattr(flask_app, "recommend_feed_after", fake_feed)
+    response = client.post("/get_feed", json={"id": 1, "batch_size": 1, "fields": ["id", "title"]})
+    assert response.status_code == 200
+    assert response.get_json() == {"papers": [{"id": 4, "title": "A paper"}], "next_cursor": "next"}
+    assert calls == [(1, 1, None, ["id", "title"])]
+
+
+def test_feed_rejects_unknown_fields(client):
+    response = client.post("/get_feed", json={"id": 1, "batch_size": 1, "fields": ["password"]})
+    assert response.status_code == 400
+
+
+def test_feed_clamps_search_settings_and_rejects_bad_ones(client, monkeypatch):
+    calls = []
+
+    def fake_feed(user_id, categories, batch_size, cursor, fields=None, ef_search=None, probes=None):
+        calls.append((ef_search, probes))
+        return [], None
+
+    monkeypatch.setattr(flask_app, "recommend_feed_after", fake_feed)
+    response = client.post("/get_feed", json={"id": 1, "batch_size": 1, "ef_search": 10**9, "probes": 5})
+    assert response.status_code == 200
+    assert calls == [(flask_app.HNSW_MAX_EF_SEARCH, 5)]
+    for bad in ({"ef_search": -1}, {"probes": "10; RESET ALL"}, {"ef_search": 2.5}, {"probes": True}):
+        response = client.post("/get_feed", json={"id": 1, "batch_size": 1, **bad})
+        assert response.status_code == 400
+    assert len(calls) == 1
+
+
+def test_feed_maps_error_kinds_to_statuses(client, monkeypatch):
+    monkeypatch.setattr(flask_app, "recommend_feed_after",
+                        lambda *args, **kwargs: {"error": "Error during recommendation: cursor closed", "kind": "database"})
+    assert client.post("/get_feed", json={"id": 1, "batch_size": 1}).status_code == 500
+    monkeypatch.setattr(flask_app, "recommend_feed_after", database_handler.recommend_feed_after)
+    response = client.post("/get_feed", json={"id": 1, "batch_size": 1, "cursor": "not-a-cursor"})
+    assert response.status_code == 400 and response.get_json()["kind"] == "invalid_cursor"
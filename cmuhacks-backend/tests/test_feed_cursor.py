@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import database_handler
+from conftest import needs_db
+from database_handler import decode_feed_cursor, encode_feed_cursor, next_feed_position
+from vector_index import LocalVectorIndex
+
+
+def test_cursor_round_trip():
+    cursor = encode_feed_cursor(0.25, [4, 9])
+    assert decode_feed_cursor(cursor) == (0.25, [4, 9])
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_feed_cursor("not-a-cursor")
+
+
+def test_position_keeps_every_id_at_the_last_distance():
+    hits = [(1, 0.1), (2, 0.3), (3, 0.3)]
+    assert next_feed_position(hits) == (0.3, [2, 3])
+    # A page made only of ties carries over the ids the previous cursor had already seen.
+    assert next_feed_position([(5, 0.3)], after=(0.3, [2, 3])) == (0.3, [2, 3, 5])
+
+
+def test_feed_query_orders_by_distance_only():
+    sql, params = database_handler._feed_query("id AS id", 1, 10, after=(0.3, [2, 3]))
+    assert sql.endswith("ORDER BY embedding <=> (SELECT embedding FROM users WHERE id = %s) LIMIT %s")
+    assert ">= %s AND NOT (id = ANY(%s))" in sql
+    assert params == [1, 1, 0.3, [2, 3], 1, 10]
+
+
+def test_local_keyset_pages_return_ties_exactly_once():
+    index = LocalVectorIndex()
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(4, 384)).astype(np.float32)
+    # Papers 10-14 share one vector, so five papers tie across page boundaries.
+    for paper_id, row in zip([1, 2, 3, 4, 10, 11, 12, 13, 14], [0, 1, 2, 3, 0, 0, 0, 0, 0]):
+        index.add(paper_id, vectors[row])
+    query = vectors[0]
+    seen, after = [], None
+    while True:
+        hits = index.search(query, 2, after=after)
+        if not hits:
+            break
+        seen += hits
+        after = next_feed_position(hits, after)
+    assert sorted(paper_id for paper_id, _ in seen) == [1, 2, 3, 4, 10, 11, 12, 13, 14]
+    distances = [distance for _, distance in seen]
+    assert distances == sorted(distances)
+
+
+@needs_db
+def test_feed_page_uses_the_hnsw_index(pg_papers):
+    rng = np.random.default_rng(0)
+    papers = {paper_id: rng.normal(size=384).astype(np.float32) for paper_id in range(1, 201)}
+    conn = pg_papers(papers, rng.normal(size=384).astype(np.float32))
+    sql, params = database_handler._feed_query("id AS id", 1, 10, after=(0.5, [3]))
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN " + sql, params)
+        plan = "\n".join(row[0] for row in cur.fetchall())
+    conn.rollback()
+    assert "Index Scan using papers_embedding_idx" in plan
+    assert "Sort" not in plan.split("Index Scan")[0]
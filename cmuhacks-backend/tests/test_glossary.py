@@ -0,0 +1,38 @@
+import ai_summarizer
+import glossary
+
+ROWS = [
+    ("gradient descent", 0, "Generic definition."),
+    ("gradient descent", 5, "Definition written for paper 5."),
+    ("transformer", 5, "A neural network built on attention."),
+    ("attention", 5, "Weighting inputs by relevance."),
+]
+
+
+def test_exact_definition_prefers_the_papers_own(fake_pool):
+    fake_pool(glossary, [("FROM term_definitions", ROWS)])
+    assert glossary.lookup_definition("Gradient  descent.", 5) == ("Definition written for paper 5.", "gradient descent")
+
+
+def test_longest_glossary_term_inside_the_highlight(fake_pool):
+    fake_pool(glossary, [("FROM term_definitions", ROWS[2:])])
+    definition, term = glossary.lookup_definition("the transformer uses attention", 5)
+    assert term == "transformer"
+    assert glossary.lookup_definition("transformers everywhere", 5) == (None, None)
+
+
+def test_miss_is_generated_once_and_stored(fake_pool, monkeypatch):
+    pool = fake_pool(glossary)
+    calls = []
+    monkeypatch.setattr(ai_summarizer, "define_unclear_terms",
+                        lambda text, max_attempts=None: calls.append(text) or "A definition.")
+    assert glossary.define_term("Backpropagation", 5) == "A definition."
+    assert calls == ["Backpropagation"]
+    (_, stored), = pool.statements("INSERT INTO term_definitions")
+    assert stored == ("backpropagation", glossary.ANY_PAPER, "A definition.", "highlight")
+
+
+def test_sentences_are_not_stored_as_terms(fake_pool):
+    pool = fake_pool(glossary)
+    glossary.store_definitions([("x" * (glossary.MAX_TERM_CHARS + 1), "too long"), ("  ", "blank")])
+    assert pool.cursor.executed == []
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+import bench_imports
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ["ai_summarizer", "daily_update_papers", "langchain_google_genai", "arxiv", "fitz", "sentence_transformers"]
+
+
+def test_web_worker_boot_skips_ingestion_and_llm_imports():
+    code = f"import flask_app, sys; print([m for m in {DEFERRED!r} if m in sys.modules])"
+    env = {**os.environ, "ENSURE_SCHEMA_ON_STARTUP": "0"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=HERE, env=env, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_import_benchmark_reports_direct_imports():
+    total, children = bench_imports.measure("profile_recompute")
+    assert total > 0
+    assert "interaction_events" in [name for _, name in children]
+    assert bench_imports.measure("no_such_module")[0] is None
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import pytest
+
+import ingest_runner
+
+
+def arxiv_paper(n):
+    return SimpleNamespace(entry_id=f"http://arxiv.org/abs/2401.0000{n}v1", title=f"paper {n}",
+                           summary="", authors=[], pdf_url=f"https://arxiv.org/pdf/2401.0000{n}v1",
+                           categories=["cs.AI"], published=None)
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    calls = {"add_papers": [], "ledger": [], "fail": False}
+
+    def fake_add_papers(papers):
+        calls["add_papers"].append([paper["title"] for paper in papers])
+        if calls["fail"]:
+            raise RuntimeError("encoder crashed")
+        start = 100 + sum(len(batch) for batch in calls["add_papers"][:-1])
+        return list(range(start, start + len(papers)))
+
+    def fake_process(papers, on_summary=None):
+        for paper in papers:
+            on_summary(paper, f"summary of {paper.title}")
+
+    monkeypatch.setattr(ingest_runner, "add_papers", fake_add_papers)
+    monkeypatch.setattr(ingest_runner, "process_recent_papers", fake_process)
+    monkeypatch.setattr(ingest_runner, "embedding_text", lambda paper: paper.title)
+    monkeypatch.setattr(ingest_runner.ingestion_ledger, "stored_paper_ids", lambda papers: {})
+    monkeypatch.setattr(ingest_runner.ingestion_ledger, "record",
+                        lambda entry_ids, status, content_hashes=None, paper_ids=None:
+                        calls["ledger"].append((status, len(entry_ids))))
+    monkeypatch.setattr(ingest_runner.glossary, "build_glossary", lambda paper_id, summary: None)
+    return calls
+
+
+def test_summaries_are_stored_in_chunks(runner):
+    ids = ingest_runner.ingest_category("cs.AI", [arxiv_paper(n) for n in range(5)], store_batch_size=2)
+    assert [len(batch) for batch in runner["add_papers"]] == [2, 2, 1]
+    assert ids == [100, 101, 102, 103, 104]
+    assert runner["ledger"] == [("done", 2), ("done", 2), ("done", 1)]
+
+
+def test_store_failure_marks_the_chunk_failed(runner):
+    runner["fail"] = True
+    ids = ingest_runner.ingest_category("cs.AI", [arxiv_paper(n) for n in range(3)], store_batch_size=2)
+    assert ids == []
+    assert runner["ledger"] == [("failed", 2), ("failed", 1)]
+
+
+def test_cross_listed_papers_stay_in_the_first_category():
+    shared = arxiv_paper(1)
+    revised = SimpleNamespace(**{**vars(shared), "entry_id": shared.entry_id.replace("v1", "v2")})
+    deduped = ingest_runner.dedupe_cross_listed({"cs.AI": [arxiv_paper(0), shared],
+                                                 "cs.LG": [revised, arxiv_paper(2)]})
+    assert [paper.title for paper in deduped["cs.AI"]] == ["paper 0", "paper 1"]
+    assert [paper.title for paper in deduped["cs.LG"]] == ["paper 2"]
+
+
+def test_run_is_skipped_while_another_holds_the_lock(fake_pool, monkeypatch):
+    pool = fake_pool(ingest_runner, [("pg_try_advisory_lock", [(False,)])])
+    monkeypatch.setattr(ingest_runner, "fetch_recent", lambda category: pytest.fail("fetched while locked"))
+    assert ingest_runner.run_ingestion(["cs.AI"]) is None
+    assert len(pool.returned) == 1
+
+
+def test_lock_is_released_and_its_connection_returned(fake_pool):
+    pool = fake_pool(ingest_runner, [("pg_try_advisory_lock", [(True,)])])
+    lock = ingest_runner.IngestionLock()
+    assert lock.acquire()
+    lock.release()
+    assert [sql for sql, _ in pool.cursor.executed] == ["SELECT pg_try_advisory_lock(%s)", "SELECT pg_advisory_unlock(%s)"]
+    assert pool.returned[0][1] is False
+
+
+def test_web_app_has_no_ingestion_trigger(client):
+    # Ingestion only runs as its own process (cron / systemd timer), never in a web worker.
+    assert client.get("/wow").status_code == 404
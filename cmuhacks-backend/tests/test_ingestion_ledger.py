@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+import ingestion_ledger
+
+
+def arxiv_paper(entry_id):
+    return SimpleNamespace(entry_id=f"http://arxiv.org/abs/{entry_id}")
+
+
+def test_parse_entry_id():
+    assert ingestion_ledger.parse_entry_id("http://arxiv.org/abs/2401.01234v2") == ("2401.01234", 2)
+    assert ingestion_ledger.parse_entry_id("http://arxiv.org/abs/2401.01234") == ("2401.01234", 1)
+
+
+def test_only_new_or_updated_papers_are_kept(fake_pool):
+    fake_pool(ingestion_ledger, [("FROM ingestion_ledger", [
+        ("2401.00001", 1, "done", "h", 0),
+        ("2401.00002", 1, "done", "h", 0),
+        ("2401.00003", 1, "failed", None, ingestion_ledger.MAX_ATTEMPTS),
+        ("2401.00004", 1, "failed", None, 1),
+    ])])
+    papers = [arxiv_paper("2401.00001v1"), arxiv_paper("2401.00002v2"), arxiv_paper("2401.00003v1"),
+              arxiv_paper("2401.00004v1"), arxiv_paper("2401.00005v1")]
+    fresh = ingestion_ledger.filter_new_papers(papers)
+    assert [paper.entry_id[-12:] for paper in fresh] == ["2401.00002v2", "2401.00004v1", "2401.00005v1"]
+
+
+def test_new_version_with_the_same_text_is_unchanged(fake_pool):
+    digest = ingestion_ledger.content_hash("same text")
+    fake_pool(ingestion_ledger, [("FROM ingestion_ledger", [("2401.00001", 1, "done", digest, 0)])])
+    papers = [arxiv_paper("2401.00001v2"), arxiv_paper("2401.00001v3")]
+    assert ingestion_ledger.unchanged_papers(papers, ["same text", "edited text"]) == {0}
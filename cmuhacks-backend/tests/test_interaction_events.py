@@ -0,0 +1,41 @@
+import numpy as np
+
+import interaction_events
+
+
+def test_batch_claims_users_before_their_events(fake_pool, monkeypatch):
+    read_paper, liked_paper = np.full(384, 1.0), np.full(384, 2.0)
+    pool = fake_pool(interaction_events, [
+        ("pg_try_advisory_xact_lock_shared", [(True,)]),
+        ("SELECT DISTINCT user_id", [(1,), (2,)]),
+        # User 2 is being folded by another consumer, so only user 1 is claimed.
+        ("FOR UPDATE SKIP LOCKED", [(1, None)]),
+        ("LEFT JOIN papers", [(10, 1, "read", read_paper), (12, 1, "like", liked_paper)]),
+    ])
+    written = []
+    monkeypatch.setattr(interaction_events, "execute_values",
+                        lambda cur, sql, rows, page_size=None: written.extend(rows))
+
+    assert interaction_events.consume_batch(100) == 2
+
+    statements = [(" ".join(sql.split()), params) for sql, params in pool.cursor.executed]
+    lock_at = next(i for i, (sql, _) in enumerate(statements) if "FOR UPDATE SKIP LOCKED" in sql)
+    events_at = next(i for i, (sql, _) in enumerate(statements) if "LEFT JOIN papers" in sql)
+    assert lock_at < events_at
+    events_sql, events_params = statements[events_at]
+    assert "e.user_id = ANY(%s) ORDER BY e.id" in events_sql
+    assert events_params == ([1], 100)
+
+    (user_id, profile), = written
+    assert user_id == 1
+    # Each event is folded in and the profile scaled back to unit length.
+    expected = read_paper / np.linalg.norm(read_paper)
+    expected = interaction_events.PROFILE_DECAY * expected + interaction_events.EVENT_WEIGHTS["like"] * liked_paper
+    np.testing.assert_allclose(profile, expected / np.linalg.norm(expected), rtol=1e-6)
+    assert statements[-1] == ("UPDATE interaction_events SET processed_at = now() WHERE id = ANY(%s)", ([10, 12],))
+
+
+def test_batch_is_skipped_during_a_recompute(fake_pool):
+    pool = fake_pool(interaction_events, [("pg_try_advisory_xact_lock_shared", [(False,)])])
+    assert interaction_events.consume_batch() == 0
+    assert len(pool.cursor.executed) == 1
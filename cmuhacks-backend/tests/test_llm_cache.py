@@ -0,0 +1,50 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate
+
+import llm_cache
+from kv_cache import PersistentCache
+
+PROMPT = ChatPromptTemplate.from_messages([("human", "Summarize: {text}")])
+
+
+class CountingModel(FakeListChatModel):
+    """Answers 'response 1', 'response 2', ... so every real call is visible."""
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        return f"response {self.calls}"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    store = PersistentCache("llm_responses", cache_dir=str(tmp_path))
+    monkeypatch.setattr(llm_cache, "_llm_cache", store)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    return store
+
+
+def test_repeated_call_is_served_from_the_cache(cache):
+    model = CountingModel(responses=[])
+    first = llm_cache.cached_invoke(PROMPT, model, {"text": "a paper"})
+    second = llm_cache.cached_invoke(PROMPT, model, {"text": "a paper"})
+    assert first == second == "response 1"
+    assert model.calls == 1
+    assert llm_cache.cached_invoke(PROMPT, model, {"text": "another paper"}) == "response 2"
+
+
+def test_uncached_call_samples_again(cache):
+    model = CountingModel(responses=[])
+    first = llm_cache.cached_invoke(PROMPT, model, {"text": "a paper"}, cache=False)
+    second = llm_cache.cached_invoke(PROMPT, model, {"text": "a paper"}, cache=False)
+    assert (first, second) == ("response 1", "response 2")
+    assert cache.get(llm_cache.cache_key(PROMPT, model, {"text": "a paper"})) is None
+
+
+def test_batch_only_sends_misses(cache):
+    model = CountingModel(responses=[])
+    llm_cache.cached_invoke(PROMPT, model, {"text": "b"})
+    results = llm_cache.cached_batch(PROMPT, model, [{"text": "a"}, {"text": "b"}, {"text": "c"}])
+    assert results[1] == "response 1"
+    assert model.calls == 3
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+import llm_retry
+from llm_retry import CircuitBreaker, LLMUnavailableError, classify_error
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(llm_retry, "breaker", CircuitBreaker(threshold=3, cooldown=60))
+    monkeypatch.setattr(llm_retry.time, "sleep", lambda seconds: None)
+
+
+def test_errors_are_classified_by_type_and_message():
+    assert classify_error(ResourceExhausted("quota")) == llm_retry.RATE_LIMITED
+    assert classify_error(ServiceUnavailable()) == llm_retry.TRANSIENT
+    assert classify_error(RuntimeError("503 model is overloaded")) == llm_retry.TRANSIENT
+    assert classify_error(RuntimeError("Error 429: Resource exhausted")) == llm_retry.RATE_LIMITED
+    assert classify_error(ValueError("invalid argument")) == llm_retry.PERMANENT
+
+
+def test_transient_errors_are_retried():
+    outcomes = [ServiceUnavailable(), ResourceExhausted(), "summary"]
+    paused = []
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert llm_retry.call_with_retry(call, on_rate_limited=paused.append) == "summary"
+    assert len(paused) == 1
+    assert llm_retry.breaker.state == "closed"
+
+
+def test_permanent_errors_are_raised_at_once():
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise ValueError("invalid argument")
+
+    with pytest.raises(ValueError):
+        llm_retry.call_with_retry(call)
+    assert len(calls) == 1
+
+
+def test_attempts_run_out():
+    with pytest.raises(LLMUnavailableError):
+        llm_retry.call_with_retry(lambda: (_ for _ in ()).throw(ServiceUnavailable()), max_attempts=2)
+
+
+def test_breaker_opens_then_lets_one_trial_through(monkeypatch):
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    now = time.monotonic()
+    monkeypatch.setattr(llm_retry.time, "monotonic", lambda: now + 61)
+    assert breaker.state == "half-open"
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_batch_only_resends_failed_inputs():
+    sent = []
+
+    def run_batch(inputs):
+        sent.append(list(inputs))
+        return [ServiceUnavailable() if x == "b" and len(sent) == 1 else x.upper() for x in inputs]
+
+    assert llm_retry.batch_with_retry(run_batch, ["a", "b", "c"]) == ["A", "B", "C"]
+    assert sent == [["a", "b", "c"], ["b"]]
+
+
+def test_batch_returns_an_exception_for_each_failed_input():
+    sent = []
+
+    def run_batch(inputs):
+        sent.append(list(inputs))
+        return [ValueError("invalid argument") if x == "a" else ServiceUnavailable() if x == "b" else x.upper()
+                for x in inputs]
+
+    results = llm_retry.batch_with_retry(run_batch, ["a", "b", "c"])
+    assert isinstance(results[0], ValueError)
+    assert isinstance(results[1], LLMUnavailableError)
+    assert results[2] == "C"
+    assert sent[0] == ["a", "b", "c"] and all(inputs == ["b"] for inputs in sent[1:])
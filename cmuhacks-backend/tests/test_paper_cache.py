@@ -0,0 +1,45 @@
+import time
+
+import database_handler
+import paper_cache
+from paper_cache import ByteLRUCache, estimate_size
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    row = ("title", "x" * 100)
+    cache = ByteLRUCache(max_bytes=2 * estimate_size(row), ttl=60)
+    cache.put("1", row)
+    cache.put("2", row)
+    cache.get("1")
+    cache.put("3", row)
+    assert cache.get("2") is None
+    assert cache.get("1") == row and cache.get("3") == row
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 2 * estimate_size(row)
+
+
+def test_oversized_values_are_not_cached():
+    cache = ByteLRUCache(max_bytes=100, ttl=60)
+    cache.put("1", "x" * 1000)
+    assert cache.get("1") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_entries_expire(monkeypatch):
+    cache = ByteLRUCache(max_bytes=10_000, ttl=60)
+    cache.put("1", "body")
+    now = time.monotonic()
+    monkeypatch.setattr(paper_cache.time, "monotonic", lambda: now + 61)
+    assert cache.get("1") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_paper_rows_are_read_once_until_invalidated(fake_pool, monkeypatch):
+    monkeypatch.setattr(database_handler, "paper_rows", ByteLRUCache())
+    pool = fake_pool(database_handler, [("FROM papers", [("Title", "<p>body</p>", "https://arxiv.org/pdf/1")])])
+    assert database_handler.get_paper_title(1) == database_handler.get_paper_title(1)
+    assert database_handler.get_paper_body(1) == ("<p>body</p>", "https://arxiv.org/pdf/1")
+    assert len(pool.cursor.executed) == 1
+    database_handler.invalidate_paper(1)
+    database_handler.get_paper_body(1)
+    assert len(pool.cursor.executed) == 2
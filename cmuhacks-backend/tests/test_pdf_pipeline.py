@@ -0,0 +1,53 @@
+import fitz
+
+import pdf_pipeline
+
+
+class Paper:
+    def __init__(self, entry_id, source):
+        self.entry_id = entry_id
+        self.source = source
+
+    def download_pdf(self, dirpath):
+        if self.source is None:
+            raise IOError("connection reset")
+        return str(self.source)
+
+
+def write_pdf(path, text):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def test_pipeline_yields_every_extracted_paper(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    papers = [Paper("a", write_pdf(tmp_path / "a.pdf", "first paper")),
+              Paper("b", None),
+              Paper("c", write_pdf(tmp_path / "c.pdf", "third paper")),
+              Paper("d", broken)]
+    stats = pdf_pipeline.PipelineStats()
+    results = dict(pdf_pipeline.stream_paper_texts(papers, str(tmp_path), stats,
+                                                   download_workers=2, extract_workers=1, queue_size=1))
+    assert sorted(results) == [0, 2]
+    assert "first paper" in results[0] and "third paper" in results[2]
+    # Every downloaded PDF is deleted once extracted, successfully or not.
+    assert list(tmp_path.iterdir()) == []
+    counts = stats.as_dict()
+    assert (counts["downloaded"], counts["download_failures"]) == (3, 1)
+    assert (counts["extracted"], counts["extract_failures"]) == (2, 1)
+
+
+def test_extraction_pool_is_shared_between_runs(tmp_path):
+    pdf_pipeline.shutdown_extract_pool()
+    for name in ("a", "b"):
+        paper = Paper(name, write_pdf(tmp_path / f"{name}.pdf", f"paper {name}"))
+        assert [text for _, text in pdf_pipeline.stream_paper_texts([paper], str(tmp_path), extract_workers=1)]
+        if name == "a":
+            pool = pdf_pipeline.get_extract_pool()
+    assert pdf_pipeline.get_extract_pool() is pool
+    pdf_pipeline.shutdown_extract_pool()
+    assert pdf_pipeline._extract_pool is None
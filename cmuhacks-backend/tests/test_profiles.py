@@ -0,0 +1,80 @@
+import struct
+
+import numpy as np
+
+import database_handler
+from interaction_events import EMBEDDING_DIM, PROFILE_DECAY, fold_events
+from profile_recompute import compute_profiles, copy_payload
+
+
+def history(seed=0, users=5, papers=20, events=60):
+    """Events grouped by user in log order, as profile_recompute loads them."""
+    rng = np.random.default_rng(seed)
+    user_rows = np.sort(rng.integers(0, users, events))
+    paper_rows = rng.integers(0, papers, events)
+    weights = rng.choice(np.array([1.0, 2.0], dtype=np.float32), events)
+    paper_vectors = rng.normal(size=(papers, EMBEDDING_DIM)).astype(np.float32)
+    return user_rows, paper_rows, weights, paper_vectors
+
+
+def test_recompute_equals_folding_the_same_history():
+    user_rows, paper_rows, weights, paper_vectors = history()
+    recomputed = compute_profiles(user_rows, paper_rows, weights, 5, paper_vectors)
+    np.testing.assert_allclose(np.linalg.norm(recomputed, axis=1), 1.0, rtol=1e-5)
+
+    # The consumer folds the log in batches of arbitrary size, in log order.
+    folded = np.zeros((5, EMBEDDING_DIM), dtype=np.float32)
+    for batch in np.array_split(np.arange(len(user_rows)), 7):
+        folded = fold_events(folded, user_rows[batch], paper_vectors[paper_rows[batch]], weights[batch])
+    np.testing.assert_allclose(folded, recomputed, rtol=1e-4, atol=1e-4)
+
+    # update_user applies the same rule one event at a time.
+    one_by_one = np.zeros((5, EMBEDDING_DIM), dtype=np.float32)
+    for user, paper, weight in zip(user_rows, paper_rows, weights):
+        profile = PROFILE_DECAY * one_by_one[user] + weight * paper_vectors[paper]
+        one_by_one[user] = profile / np.linalg.norm(profile)
+    np.testing.assert_allclose(one_by_one, recomputed, rtol=1e-4, atol=1e-4)
+
+
+def test_consumer_folds_an_interleaved_log_like_the_recompute():
+    user_rows, paper_rows, weights, paper_vectors = history(seed=1)
+    # Interleave the users in the log, each user's own events staying in order.
+    slots = np.random.default_rng(2).permutation(len(user_rows))
+    for user in range(5):
+        slots[user_rows == user] = np.sort(slots[user_rows == user])
+    log = np.argsort(slots)
+    folded = fold_events(np.zeros((5, EMBEDDING_DIM), dtype=np.float32), user_rows[log],
+                         paper_vectors, weights[log], paper_rows=paper_rows[log])
+    recomputed = compute_profiles(user_rows, paper_rows, weights, 5, paper_vectors)
+    np.testing.assert_allclose(folded, recomputed, rtol=1e-5, atol=1e-6)
+
+
+def test_update_user_stores_the_normalized_decayed_sum(fake_pool):
+    pool = fake_pool(database_handler)
+    current, new = np.full(EMBEDDING_DIM, 1.0), np.full(EMBEDDING_DIM, 0.5)
+    current[0] = 3.0
+    stored = database_handler.update_user(3, current, new, gamma=0.8)
+    expected = 0.8 * current + new
+    np.testing.assert_allclose(stored, expected / np.linalg.norm(expected), rtol=1e-5)
+    assert pool.cursor.executed[-1][1] == (stored, 3)
+
+
+def test_copy_payload_framing():
+    profiles = np.array([[1.0, -2.0, 0.5], [0.0, 3.0, 4.0]], dtype=np.float32)
+    payload = copy_payload(np.array([7, 9]), profiles).getvalue()
+    assert payload[:11] == b"PGCOPY\n\xff\r\n\x00"
+    assert struct.unpack(">ii", payload[11:19]) == (0, 0)
+    offset, rows = 19, []
+    while True:
+        (fields,) = struct.unpack_from(">h", payload, offset)
+        offset += 2
+        if fields == -1:
+            break
+        assert fields == 2
+        id_size, paper_id, vector_size, dim, unused = struct.unpack_from(">iiihh", payload, offset)
+        offset += 16
+        assert (id_size, vector_size, dim, unused) == (4, 4 + 4 * 3, 3, 0)
+        rows.append((paper_id, struct.unpack_from(">3f", payload, offset)))
+        offset += 12
+    assert offset == len(payload)
+    assert rows == [(7, (1.0, -2.0, 0.5)), (9, (0.0, 3.0, 4.0))]
@@ -0,0 +1,40 @@
+import rate_limit
+from rate_limit import TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_concurrent_pauses_overlap_instead_of_stacking(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    bucket = TokenBucket(rate=4, capacity=5)
+    # Five requests got a 429 at the same time.
+    for _ in range(5):
+        bucket.pause(2.0)
+    bucket.acquire()
+    # Two seconds of pause, then one token's worth of refill.
+    assert abs(clock.now - 102.25) < 1e-9
+
+
+def test_a_longer_pause_extends_a_shorter_one(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    bucket = TokenBucket(rate=4, capacity=5)
+    bucket.pause(5.0)
+    clock.now += 1.0
+    bucket.pause(1.0)
+    bucket.acquire()
+    assert abs(clock.now - 105.25) < 1e-9
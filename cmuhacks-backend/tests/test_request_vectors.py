@@ -0,0 +1,23 @@
+import flask_app
+
+
+def test_user_vector_is_loaded_once_per_request(monkeypatch):
+    loads = []
+    monkeypatch.setattr(flask_app, "get_user_vector", lambda user_id: loads.append(user_id) or [0.5] * 384)
+    with flask_app.app.test_request_context():
+        first = flask_app.request_user_vector(1)
+        assert flask_app.request_user_vector(1) is first
+        flask_app.request_user_vector(2)
+    assert loads == [1, 2]
+    with flask_app.app.test_request_context():
+        flask_app.request_user_vector(1)
+    assert loads == [1, 2, 1]
+
+
+def test_article_vector_is_loaded_once_per_request(monkeypatch):
+    loads = []
+    monkeypatch.setattr(flask_app, "get_article_vector", lambda article_id: loads.append(article_id) or [0.1] * 384)
+    with flask_app.app.test_request_context():
+        flask_app.request_article_vector(7)
+        flask_app.request_article_vector(7)
+    assert loads == [7]
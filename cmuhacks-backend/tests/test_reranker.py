@@ -0,0 +1,39 @@
+import numpy as np
+
+import reranker
+from reranker import category_bits, preference_vector, rerank_rows, score_candidates
+
+DAY = 86400.0
+NOW = 1_700_000_000.0
+
+
+def test_category_bits_follow_the_vocabulary():
+    bits = category_bits(["cs.LG", "math.CO"])
+    assert bits[reranker.CATEGORY_VOCABULARY.index("cs.LG")] == 1 and sum(bits) == 1
+    assert np.array_equal(preference_vector(["cs.LG"]), np.asarray(bits, dtype=np.float32))
+
+
+def test_scores_blend_similarity_category_recency_and_prestige():
+    weights = {"similarity": 1.0, "category": 0.5, "recency": 0.25, "prestige": 0.25}
+    lg = category_bits(["cs.LG"])
+    scores = score_candidates(
+        [0.2, 0.2, 0.2, 0.2],
+        [lg, category_bits(["cs.CV"]), None, None],
+        [None, None, NOW - reranker.RECENCY_HALF_LIFE_DAYS * DAY, None],
+        [None, None, None, reranker.PRESTIGE_SCALE],
+        ["cs.LG"], weights=weights, now=NOW)
+    np.testing.assert_allclose(scores, [0.8 + 0.5, 0.8, 0.8 + 0.125, 0.8 + 0.125])
+
+
+def test_rows_are_reranked_within_blocks():
+    lg = category_bits(["cs.LG"])
+    rows = [(1, 0.10, None, None, None), (2, 0.11, lg, None, None),
+            (3, 0.20, None, None, None), (4, 0.21, lg, None, None)]
+    assert [row[0] for row in rerank_rows(rows, ["cs.LG"])] == [2, 4, 1, 3]
+    # Each block of two is re-ordered on its own, so offset pages stay consistent.
+    assert [row[0] for row in rerank_rows(rows, ["cs.LG"], block_size=2)] == [2, 1, 4, 3]
+
+
+def test_missing_features_keep_the_nearest_neighbour_order():
+    rows = [(paper_id, distance, None, None, None) for paper_id, distance in [(5, 0.1), (3, 0.1), (9, 0.4)]]
+    assert [row[0] for row in rerank_rows(rows, [])] == [5, 3, 9]
@@ -0,0 +1,71 @@
+import schema
+
+
+def test_startup_migration_adds_the_feature_columns(fake_pool, monkeypatch):
+    monkeypatch.setattr(schema, "ENSURE_SCHEMA_ON_STARTUP", True)
+    pool = fake_pool(schema, [("indisvalid", [("CREATE INDEX papers_embedding_cosine_idx ...", True)])])
+    schema.ensure_schema_on_startup()
+    statements = [sql for sql, _ in pool.cursor.executed]
+    assert statements[0] == "SELECT pg_advisory_lock(%s)"
+    assert statements[-1] == "SELECT pg_advisory_unlock(%s)"
+    assert "ALTER TABLE papers ADD COLUMN IF NOT EXISTS published_at TIMESTAMPTZ" in statements
+    assert "ALTER TABLE papers ADD COLUMN IF NOT EXISTS author_prestige REAL" in statements
+
+
+def test_startup_migration_can_be_turned_off(fake_pool, monkeypatch):
+    monkeypatch.setattr(schema, "ENSURE_SCHEMA_ON_STARTUP", False)
+    pool = fake_pool(schema)
+    schema.ensure_schema_on_startup()
+    assert pool.cursor.executed == []
+
+
+def test_ivfflat_list_count_follows_the_row_count():
+    assert schema.ivfflat_lists_for(500) == 1
+    assert schema.ivfflat_lists_for(250_000) == 250
+    assert schema.ivfflat_lists_for(4_000_000) == 2000
+
+
+def test_index_ddl():
+    assert schema._index_ddl("hnsw", 0, concurrently=True) == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS papers_embedding_cosine_idx ON papers "
+        f"USING hnsw (embedding vector_cosine_ops) WITH (m = {schema.HNSW_M}, ef_construction = {schema.HNSW_EF_CONSTRUCTION})")
+    assert "WITH (lists = 50)" in schema._index_ddl("ivfflat", 50_000)
+
+
+def test_grown_ivfflat_index_is_rebuilt_and_swapped_in(fake_pool):
+    pool = fake_pool(schema, [("indisvalid", [("CREATE INDEX papers_embedding_cosine_idx ON public.papers "
+                                               "USING ivfflat (embedding vector_cosine_ops) WITH (lists='10')", True)]),
+                              ("count(*)", [(100_000,)])])
+    schema.maintain_paper_embedding_index("ivfflat")
+    statements = [sql for sql, _ in pool.cursor.executed]
+    assert "CREATE INDEX CONCURRENTLY IF NOT EXISTS papers_embedding_cosine_idx_new" in statements[-4]
+    # The old index is renamed away in the same transaction, and dropped only after the swap.
+    assert statements[-3:] == ["ALTER INDEX papers_embedding_cosine_idx RENAME TO papers_embedding_cosine_idx_old; "
+                               "ALTER INDEX papers_embedding_cosine_idx_new RENAME TO papers_embedding_cosine_idx",
+                               "DROP INDEX CONCURRENTLY papers_embedding_cosine_idx_old",
+                               "ANALYZE papers"]
+
+
+def test_invalid_index_is_dropped_and_rebuilt(fake_pool):
+    pool = fake_pool(schema, [("indisvalid", [("CREATE INDEX papers_embedding_cosine_idx ...", False)]),
+                              ("count(*)", [(1_000,)])])
+    schema.maintain_paper_embedding_index("hnsw")
+    statements = [sql for sql, _ in pool.cursor.executed]
+    assert statements[-2:] == ["DROP INDEX CONCURRENTLY IF EXISTS papers_embedding_cosine_idx",
+                               schema._index_ddl("hnsw", 1_000, concurrently=True)]
+
+
+def test_search_settings_are_transaction_local(monkeypatch):
+    class Cursor:
+        def __init__(self):
+            self.executed = []
+
+        def execute(self, sql, params=None):
+            self.executed.append((sql, params))
+
+    monkeypatch.setattr(schema, "PAPER_INDEX_METHOD", "hnsw")
+    monkeypatch.setattr(schema, "HNSW_ITERATIVE_SCAN", "relaxed_order")
+    cur = Cursor()
+    schema.apply_search_settings(cur, ef_search=200, strict_order=True)
+    assert cur.executed == [("SET LOCAL hnsw.ef_search = %s", (200,)),
+                            ("SET LOCAL hnsw.iterative_scan = %s", ("strict_order",))]
@@ -0,0 +1,62 @@
+import importlib
+import os
+import time
+
+import pytest
+
+import kv_cache
+import semantic_scholar
+
+
+class Response:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class RecordingBucket:
+    def __init__(self):
+        self.calls = []
+
+    def acquire(self):
+        self.calls.append("acquire")
+
+    def pause(self, seconds):
+        self.calls.append(("pause", seconds))
+
+
+def test_rate_limited_lookup_waits_only_through_the_bucket(monkeypatch):
+    responses = [Response(429, headers={"Retry-After": "3"}),
+                 Response(200, {"data": [{"name": "Ada Lovelace", "hIndex": 12}]})]
+    monkeypatch.setattr(semantic_scholar.requests, "get", lambda *args, **kwargs: responses.pop(0))
+    bucket = RecordingBucket()
+    monkeypatch.setattr(semantic_scholar, "_bucket", bucket)
+    monkeypatch.setattr(time, "sleep", lambda seconds: pytest.fail("fetch_author slept on its own"))
+
+    assert semantic_scholar.fetch_author("Ada Lovelace") == {"name": "Ada Lovelace", "hIndex": 12}
+    assert bucket.calls[0] == "acquire" and bucket.calls[2] == "acquire"
+    kind, delay = bucket.calls[1]
+    assert kind == "pause" and 3 <= delay <= 4
+
+
+@pytest.fixture
+def reload_kv_cache():
+    yield lambda: importlib.reload(kv_cache)
+    importlib.reload(kv_cache)
+
+
+def test_cache_dir_does_not_depend_on_the_working_directory(reload_kv_cache, monkeypatch, tmp_path):
+    monkeypatch.delenv("CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    module = reload_kv_cache()
+    assert module.CACHE_DIR == os.path.join(os.path.dirname(os.path.abspath(module.__file__)), "cache")
+
+    monkeypatch.setenv("CACHE_DIR", "relative/caches")
+    assert reload_kv_cache().CACHE_DIR == str(tmp_path / "relative" / "caches")
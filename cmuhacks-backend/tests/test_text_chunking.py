@@ -0,0 +1,51 @@
+import text_chunking
+from text_chunking import chunk_text
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_chunks_stay_under_the_limit_and_keep_the_text():
+    paragraphs = [" ".join(f"p{i}w{j}" for j in range(n)) for i, n in enumerate([5, 12, 3, 30, 8])]
+    # Paragraph 3 is too long on its own, so it is split on its sentences.
+    paragraphs[3] = ". ".join(" ".join(f"s{k}w{j}" for j in range(6)) for k in range(5)) + "."
+    chunks = chunk_text("\n\n".join(paragraphs), 20, count_tokens=words)
+    assert all(words(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == "\n\n".join(paragraphs).split()
+    assert chunks[0] == paragraphs[0] + "\n\n" + paragraphs[1]
+
+
+def test_each_paragraph_is_counted_once():
+    calls = []
+
+    def counting(text):
+        calls.append(text)
+        return words(text)
+
+    paragraphs = [f"paragraph {i} has six words" for i in range(200)]
+    chunk_text("\n\n".join(paragraphs), 50, count_tokens=counting)
+    assert len(calls) == len(paragraphs)
+
+
+def test_estimate_tokens_leaves_headroom(monkeypatch):
+    monkeypatch.setattr(text_chunking, "_encoding", lambda: None)
+    assert text_chunking.estimate_tokens("x" * 400) == int(100 * text_chunking.TOKEN_ESTIMATE_SCALE) + 1
+
+
+def test_unevenly_dense_sentences_are_cut_until_every_chunk_fits():
+    # Formula-like characters cost ten tokens each, so a window sized from the
+    # sentence's average density still overflows where they cluster.
+    def dense(text):
+        return len(text) + 9 * text.count("$")
+
+    sentence = "a" * 300 + "$" * 100 + "b" * 50
+    chunks = chunk_text("intro\n\n" + sentence, 100, count_tokens=dense)
+    assert all(dense(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks).replace(" ", "").replace("\n", "") == "intro" + sentence
+
+
+def test_every_chunk_is_within_the_estimated_limit():
+    text = "\n\n".join(["Short intro.", "x" * 5000, "https://example.org/" + "a1b2/" * 800, "The end."])
+    chunks = chunk_text(text, 200)
+    assert all(text_chunking.estimate_tokens(chunk) <= 200 for chunk in chunks)
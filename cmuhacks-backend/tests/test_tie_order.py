@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+import database_handler
+from conftest import needs_db
+from vector_index import LocalVectorIndex
+
+
+def fixture_papers():
+    """Twelve papers; 5, 8 and 11 share one embedding, and 3 and 9 another, so distances tie."""
+    rng = np.random.default_rng(7)
+    vectors = {paper_id: rng.normal(size=384).astype(np.float32) for paper_id in range(1, 13)}
+    vectors[8] = vectors[11] = vectors[5]
+    vectors[9] = vectors[3]
+    return vectors, vectors[5] + 0.1 * rng.normal(size=384).astype(np.float32)
+
+
+def local_order(papers, query, k):
+    index = LocalVectorIndex()
+    for paper_id, vector in papers.items():
+        index.add(paper_id, vector)
+    return [paper_id for paper_id, _ in index.search(query, k)]
+
+
+def test_sql_candidates_break_ties_like_the_local_index(fake_pool):
+    papers, query = fixture_papers()
+    unit = {paper_id: vector / np.linalg.norm(vector) for paper_id, vector in papers.items()}
+    q = query / np.linalg.norm(query)
+    distances = {paper_id: float(1.0 - vector @ q) for paper_id, vector in unit.items()}
+    # pgvector returns tied rows in whatever order the index visits them.
+    by_distance = sorted(papers, key=lambda paper_id: (distances[paper_id], -paper_id))
+    fake_pool(database_handler, [("ORDER BY embedding", [(paper_id, distances[paper_id], None, None, None)
+                                                         for paper_id in by_distance])])
+    page = database_handler._nearest_page("%s", (query,), 12, 0)
+    assert page == local_order(papers, query, 12)
+
+
+@needs_db
+def test_sql_and_local_pages_agree(pg_papers, monkeypatch):
+    papers, query = fixture_papers()
+    conn = pg_papers(papers, query)
+
+    class Pool:
+        @contextmanager
+        def connection(self):
+            yield conn
+
+    monkeypatch.setattr(database_handler, "get_pool", lambda: Pool())
+    sql_page = database_handler._nearest_page("(SELECT embedding FROM users WHERE id = %s)", (1,), 12, 0)
+    assert sql_page == local_order(papers, query, 12)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import ai_summarizer
+
+TOPICS = ["apples", "rockets", "tides"]
+PAPER = ("Apples grow on trees in orchards.\n\n"
+         "Rockets burn fuel to reach orbit.\n\n"
+         "Tides follow the moon around the earth.")
+SUMMARY = "\n".join(f"Paragraph {i} about the paper." for i in range(4))
+
+
+def topic_vectors(texts):
+    return np.array([[1.0 if topic in text.lower() else 0.0 for topic in TOPICS] + [0.1] for text in texts])
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    monkeypatch.setattr(ai_summarizer, "encode", topic_vectors)
+    monkeypatch.setattr(ai_summarizer.text_chunking, "chunk_text", lambda text, limit: text.split("\n\n"))
+    monkeypatch.setattr(ai_summarizer.text_chunking, "estimate_tokens", lambda text: len(text.split()))
+
+
+def test_retriever_keeps_the_best_matching_chunks_in_order(chunks):
+    retriever = ai_summarizer.ChunkRetriever(PAPER)
+    assert retriever.retrieve("They launched rockets.", token_budget=7) == "Rockets burn fuel to reach orbit."
+    both = retriever.retrieve("Tides and rockets.", token_budget=15)
+    assert both == "Rockets burn fuel to reach orbit.\n\n[...]\n\nTides follow the moon around the earth."
+
+
+@pytest.mark.parametrize("mode, expected", [("full", PAPER), ("condensed", "condensed text")])
+def test_verifiers_get_the_text_of_the_mode(chunks, monkeypatch, mode, expected):
+    references = []
+    monkeypatch.setattr(ai_summarizer, "generate_summary", lambda text, feedback: SUMMARY)
+    monkeypatch.setattr(ai_summarizer, "run_verifiers",
+                        lambda text, summary: references.append(text) or {"reflection": "OK", "readability": "OK"})
+    result = ai_summarizer.summarize_and_verify_paper(PAPER, verify_mode=mode, condensed_text="condensed text")
+    assert result == SUMMARY
+    assert references == [expected]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ai_summarizer.summarize_and_verify_paper(PAPER, verify_mode="vibes")
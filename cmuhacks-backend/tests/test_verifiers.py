@@ -0,0 +1,28 @@
+import threading
+import time
+
+import ai_summarizer
+
+
+def test_verifiers_run_concurrently(monkeypatch):
+    def slow_ok(*args):
+        time.sleep(0.2)
+        return "OK"
+
+    monkeypatch.setattr(ai_summarizer, "verify_reflection", slow_ok)
+    monkeypatch.setattr(ai_summarizer, "verify_readability", slow_ok)
+    start = time.perf_counter()
+    assert ai_summarizer.run_verifiers("paper", "summary") == {"reflection": "OK", "readability": "OK"}
+    assert time.perf_counter() - start < 0.35
+
+
+def test_first_failing_verdict_returns_without_waiting(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(ai_summarizer, "verify_reflection", lambda *args: release.wait(5) and "OK")
+    monkeypatch.setattr(ai_summarizer, "verify_readability", lambda summary: "Too much jargon.")
+    start = time.perf_counter()
+    try:
+        assert ai_summarizer.run_verifiers("paper", "summary") == {"readability": "Too much jargon."}
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
@@ -0,0 +1,110 @@
+import functools
+import os
+import re
+
+# --- Configuration ---
+# Tokens are estimated locally: with tiktoken's cl100k_base encoding when it is
+# available, else from the character count. Neither is Gemini's own tokenizer,
+# so estimates are multiplied by this factor (>1 leaves headroom under the limit).
+TOKEN_ESTIMATE_SCALE = float(os.environ.get("TOKEN_ESTIMATE_SCALE", "1.1"))
+# Average characters per token of English academic text, for the fallback estimator.
+CHARS_PER_TOKEN = 4.0
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or the encoding file could not be fetched.
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of `text` locally, without calling the model provider."""
+    encoding = _encoding()
+    if encoding is not None:
+        count = len(encoding.encode(text, disallowed_special=()))
+    else:
+        count = len(text) / CHARS_PER_TOKEN
+    return int(count * TOKEN_ESTIMATE_SCALE) + 1
+
+
+def _cut(text: str, tokens: int, token_limit: int, count_tokens) -> list:
+    """
+    Cuts text over `token_limit` into character windows sized from its average
+    tokens per character. Tokens are not spread evenly (formulas, URLs), so a window
+    still over the limit is cut again; every piece fits unless it is one character.
+    """
+    # At most 90% of the text, so each round makes progress even when it barely overflows.
+    window = max(1, min(int(len(text) * token_limit / tokens), len(text) * 9 // 10))
+    pieces = []
+    for start in range(0, len(text), window):
+        piece = text[start:start + window]
+        piece_tokens = count_tokens(piece)
+        if piece_tokens > token_limit and len(piece) > 1:
+            pieces.extend(_cut(piece, piece_tokens, token_limit, count_tokens))
+        else:
+            pieces.append((piece, piece_tokens))
+    return pieces
+
+
+def _split_oversized(text: str, token_limit: int, count_tokens) -> list:
+    """
+    Splits a single paragraph that exceeds `token_limit` on sentence boundaries,
+    cutting sentences that are still too long into character windows.
+    """
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence_tokens = count_tokens(sentence)
+        if sentence_tokens <= token_limit:
+            pieces.append((sentence, sentence_tokens))
+        else:
+            pieces.extend(_cut(sentence, sentence_tokens, token_limit, count_tokens))
+    return _pack(pieces, token_limit, " ")
+
+
+def _pack(pieces: list, token_limit: int, separator: str) -> list:
+    """
+    Greedily packs (text, tokens) pieces into chunks whose summed tokens stay
+    under `token_limit`. Returns (chunk, tokens) pairs.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens in pieces:
+        # Count one token for the separator between two pieces.
+        if current and current_tokens + 1 + tokens > token_limit:
+            chunks.append((separator.join(current).strip(), current_tokens))
+            current, current_tokens = [], 0
+        current_tokens += tokens + (1 if current else 0)
+        current.append(piece)
+    if current:
+        chunks.append((separator.join(current).strip(), current_tokens))
+    return [(chunk, tokens) for chunk, tokens in chunks if chunk]
+
+
+def chunk_text(text: str, token_limit: int, count_tokens=estimate_tokens) -> list:
+    """
+    Splits text into chunks of at most `token_limit` estimated tokens, keeping
+    paragraphs together where possible.
+
+    Each paragraph is tokenized once and the running total is summed, so the cost
+    is linear in the length of the text. Paragraphs longer than the limit on their
+    own are split on sentences (and, if needed, fixed-size windows).
+
+    Args:
+        count_tokens: Token counter applied to each paragraph; defaults to the local estimator.
+    """
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= token_limit:
+            pieces.append((paragraph, tokens))
+        else:
+            pieces.extend(_split_oversized(paragraph, token_limit, count_tokens))
+    return [chunk for chunk, _ in _pack(pieces, token_limit, "\n\n")]
@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from db_pool import get_pool
+
+# --- Configuration ---
+# 'exact' or 'approximate' turns the in-process index on; unset keeps every
+# recommendation on pgvector.
+LOCAL_VECTOR_INDEX = os.environ.get("LOCAL_VECTOR_INDEX", "").lower()
+# Rows inserted or overwritten by other processes are picked up at most this many seconds late.
+LOCAL_INDEX_REFRESH_SECONDS = float(os.environ.get("LOCAL_INDEX_REFRESH_SECONDS", "60"))
+# A refresh re-reads rows overwritten up to this many seconds before the previous one,
+# so a write whose transaction was still open then (its timestamp is its start) isn't missed.
+LOCAL_INDEX_UPDATE_SLACK_SECONDS = float(os.environ.get("LOCAL_INDEX_UPDATE_SLACK_SECONDS", "300"))
+# Approximate mode: number of coarse clusters scanned per query.
+LOCAL_INDEX_PROBES = int(os.environ.get("LOCAL_INDEX_PROBES", "8"))
+EMBEDDING_DIM = 384
+# Rows scored per matmul block in batched search, to bound temporary memory.
+SEARCH_BLOCK_ROWS = 65536
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """
+    An in-memory copy of papers.embedding for serving recommendations without
+    a pgvector query per scroll.
+
+    Embeddings are stored L2-normalized in one float32 matrix so cosine distance
+    is `1 - M @ q`. Exact mode scores every row (batched matmul) and orders by
+    (distance, id), the order database_handler sorts pgvector candidates into. Approximate
+    mode clusters the rows with spherical k-means and only scores the clusters
+    closest to the query (an IVF index), trading a little recall for speed.
+    """
+
+    def __init__(self, approximate: bool = False, probes: int = LOCAL_INDEX_PROBES):
+        self.approximate = approximate
+        self.probes = probes
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self._max_id = 0
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        # Database clock at the last load/refresh, to find rows overwritten since.
+        self._fetched_at = None
+        # IVF state (approximate mode only).
+        self._centroids = None
+        self._assignments = None
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --- Loading ---
+
+    def _fetch_rows(self, after_id: int, changed_since=None):
+        """
+        Rows with an id above `after_id`, plus rows whose embedding was overwritten
+        since `changed_since` (less the slack), and the database clock at the read.
+        """
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT now()")
+                fetched_at = cur.fetchone()[0]
+                if changed_since is None:
+                    cur.execute("SELECT id, embedding FROM papers WHERE id > %s AND embedding IS NOT NULL ORDER BY id",
+                                (after_id,))
+                else:
+                    cur.execute(
+                        """SELECT id, embedding FROM papers
+                           WHERE embedding IS NOT NULL
+                             AND (id > %s OR embedding_updated_at > %s - make_interval(secs => %s))
+                           ORDER BY id""",
+                        (after_id, changed_since, LOCAL_INDEX_UPDATE_SLACK_SECONDS)
+                    )
+                return cur.fetchall(), fetched_at
+
+    def load(self):
+        """(Re)loads every embedding from the papers table."""
+        rows, fetched_at = self._fetch_rows(0)
+        with self._lock:
+            self._ids = np.empty(0, dtype=np.int64)
+            self._vectors = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+            self._max_id = 0
+            self._centroids = None
+        self._append_rows(rows)
+        self._fetched_at = fetched_at
+        self._last_refresh = time.monotonic()
+        print(f"Local vector index loaded {len(self)} papers.")
+
+    def refresh(self):
+        """
+        Appends rows inserted since the last load/refresh (papers ids only ever grow)
+        and replaces the vectors of rows overwritten with a new version meanwhile.
+        """
+        max_id = self._max_id
+        rows, fetched_at = self._fetch_rows(max_id, self._fetched_at)
+        for paper_id, embedding in rows:
+            if paper_id <= max_id:
+                self._replace(paper_id, embedding)
+        self._append_rows([row for row in rows if row[0] > max_id])
+        self._fetched_at = fetched_at
+        self._last_refresh = time.monotonic()
+        return len(rows)
+
+    def refresh_if_stale(self, max_age: float = LOCAL_INDEX_REFRESH_SECONDS):
+        if time.monotonic() - self._last_refresh >= max_age:
+            self.refresh()
+
+    def add(self, paper_id: int, embedding):
+        """
+        Adds a freshly inserted paper, or replaces the vector of one whose row was
+        overwritten with a new version (called by add_paper(s) in this process).
+        """
+        if not self._replace(paper_id, embedding):
+            self._append_rows([(paper_id, embedding)])
+
+    def _replace(self, paper_id: int, embedding) -> bool:
+        """Overwrites the vector of a paper already in the index; False if it isn't."""
+        vector = _normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            # Ids are appended in increasing order, so the array stays sorted.
+            row = int(np.searchsorted(self._ids, paper_id))
+            if row == len(self._ids) or self._ids[row] != paper_id:
+                return False
+            # Written in place: a search running concurrently sees either version of this one row.
+            self._vectors[row] = vector
+            if self.approximate and self._centroids is not None:
+                self._assignments[row] = int(np.argmax(self._centroids @ vector))
+            return True
+
+    def _append_rows(self, rows):
+        if not rows:
+            return
+        ids = np.fromiter((pid for pid, _ in rows), dtype=np.int64, count=len(rows))
+        vectors = _normalize(np.asarray([np.asarray(vec, dtype=np.float32) for _, vec in rows], dtype=np.float32))
+        with self._lock:
+            # A concurrent refresh may already have appended some of these rows.
+            fresh = ids > self._max_id
+            if not fresh.any():
+                return
+            ids, vectors = ids[fresh], vectors[fresh]
+            self._ids = np.concatenate([self._ids, ids])
+            self._vectors = np.concatenate([self._vectors, vectors])
+            self._max_id = int(self._ids[-1])
+            if self.approximate:
+                if self._centroids is None or len(self._ids) >= 2 * self._trained_size:
+                    self._train()
+                else:
+                    new_assignments = np.argmax(vectors @ self._centroids.T, axis=1)
+                    self._assignments = np.concatenate([self._assignments, new_assignments])
+
+    # --- Approximate mode (IVF) ---
+
+    def _train(self, iterations: int = 10):
+        """Spherical k-means over the current rows. Caller holds the lock."""
+        n = len(self._ids)
+        n_lists = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        centroids = self._vectors[rng.choice(n, size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(self._vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, self._vectors)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self._centroids = centroids
+        self._assignments = np.argmax(self._vectors @ centroids.T, axis=1)
+        self._trained_size = n
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        """Row positions to score for `query`: all rows, or the rows of the nearest clusters."""
+        if not self.approximate or self._centroids is None:
+            return None
+        probes = min(self.probes, len(self._centroids))
+        nearest = np.argpartition(-(self._centroids @ query), probes - 1)[:probes]
+        return np.flatnonzero(np.isin(self._assignments, nearest))
+
+    # --- Search ---
+
+    def search(self, query_vector, k: int, offset: int = 0, after: tuple = None):
+        """
+        Returns up to `k` (paper_id, cosine_distance) pairs nearest to `query_vector`,
+        ordered by (distance, id).
+
+        Args:
+            query_vector: The 384-d query embedding (need not be normalized).
+            k: Number of results to return.
+            offset: Number of leading results to skip (LIMIT/OFFSET paging).
+            after: Optional (distance, ids) keyset position; only results at or beyond that
+                distance, other than the given ids, are returned.
+        """
+        with self._lock:
+            ids, vectors = self._ids, self._vectors
+            candidates = None
+            query = _normalize(np.asarray(query_vector, dtype=np.float32))
+            if self.approximate:
+                candidates = self._candidates(query)
+        if candidates is not None:
+            ids, vectors = ids[candidates], vectors[candidates]
+        if len(ids) == 0:
+            return []
+        distances = 1.0 - (vectors @ query).astype(np.float64)
+        if after is not None:
+            keep = (distances >= after[0]) & ~np.isin(ids, after[1])
+            ids, distances = ids[keep], distances[keep]
+        wanted = min(k + offset, len(ids))
+        if wanted == 0:
+            return []
+        # Partition on a slightly wider window so ties at the boundary are ordered by id.
+        if wanted < len(ids):
+            part = np.argpartition(distances, wanted - 1)[:wanted]
+            boundary = distances[part].max()
+            part = np.flatnonzero(distances <= boundary)
+        else:
+            part = np.arange(len(ids))
+        order = part[np.lexsort((ids[part], distances[part]))][offset:offset + k]
+        return [(int(ids[i]), float(distances[i])) for i in order]
+
+    def search_batch(self, query_vectors, k: int):
+        """
+        Exact top-`k` ids for many queries at once, scoring rows block by block with one matmul per block.
+
+        Returns:
+            A list (one per query) of lists of (paper_id, cosine_distance), ordered by (distance, id).
+        """
+        with self._lock:
+            ids, vectors = self._ids, self._vectors
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        if len(ids) == 0:
+            return [[] for _ in range(len(queries))]
+        k = min(k, len(ids))
+        best_d = np.full((len(queries), 0), np.inf)
+        best_i = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(ids), SEARCH_BLOCK_ROWS):
+            block_d = 1.0 - (queries @ vectors[start:start + SEARCH_BLOCK_ROWS].T).astype(np.float64)
+            block_i = np.broadcast_to(ids[start:start + SEARCH_BLOCK_ROWS], block_d.shape)
+            all_d = np.concatenate([best_d, block_d], axis=1)
+            all_i = np.concatenate([best_i, block_i], axis=1)
+            order = np.lexsort((all_i, all_d), axis=1)[:, :k]
+            best_d = np.take_along_axis(all_d, order, axis=1)
+            best_i = np.take_along_axis(all_i, order, axis=1)
+        return [[(int(i), float(d)) for i, d in zip(row_i, row_d)] for row_i, row_d in zip(best_i, best_d)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_local_index():
+    """
+    Returns the process-wide LocalVectorIndex when LOCAL_VECTOR_INDEX is set
+    ('exact' or 'approximate'), loading it on first use; otherwise None.
+    """
+    global _index
+    if LOCAL_VECTOR_INDEX not in ("exact", "approximate"):
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = LocalVectorIndex(approximate=LOCAL_VECTOR_INDEX == "approximate")
+                index.load()
+                _index = index
+    _index.refresh_if_stale()
+    return _index
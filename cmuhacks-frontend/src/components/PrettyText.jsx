@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import '../index.css'
 
 // This is the main component for our application.
@@ -8,7 +8,7 @@ export default function HighlightTextBox(props) {
   return (
     <div className="font-sans">
       <div className="w-full mx-auto">
-        <HighlightableText text={props.text} />
+        <HighlightableText text={props.text} paperId={props.paperId} />
       </div>
     </div>
   );
@@ -35,6 +35,59 @@ function HighlightableText(props) {
   const [touchStartIdx, setTouchStartIdx] = useState(null);
   const [touchEndIdx, setTouchEndIdx] = useState(null);
   const backendURL = process.env.BACKEND_URL;
+  // Incremented for every new highlight so a still-running stream can't write into a newer answer.
+  const requestIdRef = useRef(0);
+
+  /**
+   * Streams the definition of the selected text from the backend as server-sent
+   * events, showing each piece as soon as it arrives instead of waiting for the whole answer.
+   */
+  const streamDefinition = async (selected) => {
+    const requestId = ++requestIdRef.current;
+    const isCurrent = () => requestId === requestIdRef.current;
+    setIsLoading(true);
+    setApiResponse('');
+    try {
+      const response = await fetch(`${backendURL}/prompt_about_text/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text: selected, paper_id: props.paperId }),
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Network response was not ok, status: ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (isCurrent()) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        // Events are separated by a blank line; keep any incomplete one for the next read.
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const eventName = (raw.match(/^event: (.*)$/m) || [])[1];
+          const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+          if (!isCurrent()) break;
+          if (eventName === 'token') {
+            setIsLoading(false);
+            setApiResponse(prev => prev + data.text);
+          } else if (eventName === 'error') {
+            setApiResponse(data.error || 'Sorry, an error occurred while trying to get the analysis.');
+          } else if (eventName === 'done') {
+            console.log(`Definition from ${data.source}: first token after ${data.ttft_ms}ms, done after ${data.total_ms}ms`);
+          }
+        }
+      }
+      if (!isCurrent()) reader.cancel();
+    } catch (error) {
+      console.error('Failed to fetch analysis:', error);
+      if (isCurrent()) setApiResponse('Sorry, an error occurred while trying to get the analysis.');
+    } finally {
+      if (isCurrent()) setIsLoading(false);
+    }
+  };
 
   /**
    * This function is triggered when the user releases the mouse button
@@ -60,25 +113,7 @@ function HighlightableText(props) {
         return;
       }
       setHighlightedText(selectedTextMulti);
-      setIsLoading(true);
-      setApiResponse('');
-      try {
-        const response = await fetch(`${backendURL}/prompt_about_text`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ text: selectedTextMulti }),
-        });
-        if (!response.ok) {
-          throw new Error(`Network response was not ok, status: ${response.status}`);
-        }
-        const data = await response.json();
-        setApiResponse(data.explanation || 'The backend did not provide an analysis.');
-      } catch (error) {
-        console.error('Failed to fetch analysis:', error);
-        setApiResponse('Sorry, an error occurred while trying to get the analysis.');
-      } finally {
-        setIsLoading(false);
-      }
+      await streamDefinition(selectedTextMulti);
       return;
     }
 
@@ -112,34 +147,9 @@ function HighlightableText(props) {
     // We only proceed if the user has actually selected some text.
     if (selectedText) {
       setHighlightedText(selectedText);
-      setIsLoading(true);
-      setApiResponse(''); // Clear any previous response
       setIsDrawerOpen(true); // Open drawer on mobile when new selection happens
       setDrawerSnap('half'); // default snap when opening
-
-      try {
-        // NOTE: Replace '/api/prompt_about_text' with your actual backend endpoint.
-        const response = await fetch(`${backendURL}/prompt_about_text`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({ text: selectedText }),
-        });
-
-        if (!response.ok) {
-          throw new Error(`Network response was not ok, status: ${response.status}`);
-        }
-
-        const data = await response.json();
-        setApiResponse(data.explanation || 'The backend did not provide an analysis.');
-
-      } catch (error) {
-        console.error("Failed to fetch analysis:", error);
-        setApiResponse('Sorry, an error occurred while trying to get the analysis.');
-      } finally {
-        setIsLoading(false); // Stop loading regardless of outcome
-      }
+      await streamDefinition(selectedText);
     }
   };
 
@@ -197,25 +207,9 @@ function HighlightableText(props) {
   const fetchDefinitionFor = async (selected) => {
     if (!selected) return;
     setHighlightedText(selected);
-    setApiResponse('');
-    setIsLoading(true);
     setIsDrawerOpen(true);
     setDrawerSnap('half');
-    try {
-      const response = await fetch(`${backendURL}/prompt_about_text`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text: selected })
-      });
-      if (!response.ok) throw new Error(`Network response was not ok, status: ${response.status}`);
-      const data = await response.json();
-      setApiResponse(data.explanation || 'The backend did not provide an analysis.');
-    } catch (error) {
-      console.error('Failed to fetch analysis:', error);
-      setApiResponse('Sorry, an error occurred while trying to get the analysis.');
-    } finally {
-      setIsLoading(false);
-    }
+    await streamDefinition(selected);
   };
 
   // Touch selection handlers (mobile tap-drag)
@@ -71,13 +71,14 @@ export default function Digest() {
 
   // --- State Management ---
   const [feedData, setFeedData] = useState([]);
-  const [page, setPage] = useState(1);
+  // Opaque keyset cursor returned by /get_feed; null requests the first page.
+  const [cursor, setCursor] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [hasMore, setHasMore] = useState(true);
   const loadingRef = useRef(false);
   const [loaded, setLoaded] = useState(false);
   /**
-   * Fetches a batch of recommended paper IDs, then fetches the title for each ID concurrently.
+   * Fetches the next page of recommended papers (titles and summaries included) in a single request.
    */
   useEffect(() => {
     setLoaded(true);
@@ -98,36 +99,25 @@ export default function Digest() {
     setIsLoading(true);
 
     try {
-      // --- Step 1: Fetch a batch of recommended paper IDs ---
-      const recommendationsResponse = await fetch(`${backendURL}/get_feed_papers`, {
+      // --- Fetch a page of recommended papers, already hydrated with titles and summaries ---
+      const feedResponse = await fetch(`${backendURL}/get_feed`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({id: get_id_safe(),  page: page, batch_size: BATCH_SIZE }),
+        body: JSON.stringify({id: get_id_safe(), cursor: cursor, batch_size: BATCH_SIZE }),
       });
 
-      if (!recommendationsResponse.ok) {
-        throw new Error(`API error at /get_recommendations: ${recommendationsResponse.statusText}`);
+      if (!feedResponse.ok) {
+        throw new Error(`API error at /get_feed: ${feedResponse.statusText}`);
       }
 
-      const recommendationsData = await recommendationsResponse.json();
-      const paperPromises = recommendationsData.recommendations.map(id => {
-        return fetch(`${backendURL}/get_complete_summary`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ id: id }),
-        }).then(response => {
-          if (!response.ok) {
-            console.error(`Failed to fetch title for ID ${id}: ${response.statusText}`);
-            return null; // Return null for failed requests so Promise.all doesn't fail
-          }
-          // Assuming the response is JSON like { unique_id: '...', paper_title: '...' }
-          return response.json();
-    })});
-      const papers = await Promise.all(paperPromises);
-      const newPapers = papers.filter(paper => paper !== null); // Filter out failed requests
-      // Append new papers to the feed and increment the page
+      const feedJson = await feedResponse.json();
+      const newPapers = feedJson.papers;
+      // Append new papers to the feed and resume from the returned cursor next time
       setFeedData(prevData => [...prevData, ...newPapers]);
-      setPage(prevPage => prevPage + 1);
+      setCursor(feedJson.next_cursor);
+      if (!feedJson.next_cursor) {
+        setHasMore(false);
+      }
 
     } catch (error) {
      // console.log(recommendationsData)
@@ -137,7 +127,7 @@ export default function Digest() {
       loadingRef.current = false;
       setIsLoading(false);
     }
-  }, [page, hasMore]);
+  }, [cursor, hasMore]);
 
   // --- Effects ---
 
@@ -175,9 +165,9 @@ export default function Digest() {
             <FeedPapers
               key={i}
               //authors={paper.authors} 
-              title={paper.paper_title[0]}
-              id={paper.unique_id}
-              summary={paper.paper_title[1].substring(3, paper.paper_title[1].length - 4) || ""} // Provide a fallback for summary
+              title={paper.title}
+              id={paper.id}
+              summary={paper.early_summary || ""} // Provide a fallback for summary
               likes={10}
               //tags={paper.tags}
             />
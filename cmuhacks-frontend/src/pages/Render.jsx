@@ -118,7 +118,7 @@ export default function Render() {
       <NavBar />
 
       <section className="paper-section" style={{ padding: "2rem 3%", maxWidth: "100%", margin: 0, boxSizing: "border-box" }}>
-        <HighlightTextBox text={paper} />
+        <HighlightTextBox text={paper} paperId={unique_id} />
         {/* <h1 className="paper-title" style={{ fontSize: "2rem", fontWeight: "bold", marginBottom: "1rem" }}>
           {paper.title}
         </h1>